@@ -0,0 +1,255 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import yaml
+import os
+import sys
+import timeit
+import atexit
+from joblib import Parallel, delayed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from drills.result_cache import ResultCache
+from drills.evaluation_store import EvaluationStore
+from drills.surrogate import Surrogate, PrefilterStats, design_features
+from drills.executor import Executor, ExecutionError
+from drills.log_writer import LogWriter, log_path
+from baseline.common import ABCRunner, design_hash, logger
+
+data_file = sys.argv[1]
+
+with open(data_file, 'r') as f:
+    options = yaml.load(f, Loader=yaml.FullLoader)
+
+start = timeit.default_timer()
+
+optimizations = options['optimizations']
+iterations = options['iterations']
+beam_width = options['beam_width']
+library_file = options['mapping']['library_file']
+clock_period = options['mapping']['clock_period']
+objective = options.get('objective', 'area')
+
+# Create directory if not exists
+if not os.path.exists(options['output_dir']):
+    os.makedirs(options['output_dir'])
+
+# the log and the results are buffered and written by this process only, not by the parallel workers
+text_log = LogWriter(os.path.join(options['output_dir'], 'beam-search.log'), mode='a')
+results_log = LogWriter(log_path(os.path.join(options['output_dir'], 'results'), options.get('log_format', 'csv')), \
+    ['level', 'rank', 'sequence', 'delay', 'area'], header=False, mode='a')
+atexit.register(text_log.close)
+atexit.register(results_log.close)
+log = logger(text_log)
+
+# results of (design, optimization) pairs evaluated before are taken from the cache
+cache = None
+if options.get('result_cache'):
+    cache = ResultCache(options['result_cache'], options.get('result_cache_size', 100000))
+
+# every candidate evaluated is recorded in the evaluation store shared with other runs and DRiLLS sessions
+store = None
+if options.get('evaluation_store'):
+    store = EvaluationStore(options['evaluation_store'], 'beam search')
+    atexit.register(store.close)
+
+# every ABC run is killed after a timeout and retried; a candidate that still fails is dropped
+executor = Executor.from_params(options)
+runner = ABCRunner(executor, library_file, clock_period)
+
+# a surrogate QoR model predicts the effect of every optimization; only the top_m predicted for the design
+# of a beam entry by the objective are evaluated on it
+surrogate = None
+if (options.get('surrogate') or {}).get('model'):
+    surrogate = Surrogate.load(options['surrogate']['model'])
+    top_m = options['surrogate'].get('top_m', 3)
+    prefilter_stats = PrefilterStats(surrogate.metrics)
+
+def save_level(level, beam):
+    """
+    saves the sequences kept at a level to the results log
+    """
+    for rank, (sequence, _, delay, area) in enumerate(beam):
+        results_log.write([level, rank, '; '.join(sequence), delay, area])
+
+def score(entry):
+    """
+    the rank of a (sequence, design_file, delay, area) entry: the objective first, then the other metric
+    """
+    _, _, delay, area = entry
+    return (area, delay) if objective == 'area' else (delay, area)
+
+# results of (design contents, optimization) pairs evaluated in this run
+evaluated = {}
+abc_runs = 0
+# design contents -> (candidates, predictions) of the surrogate
+prefilters = {}
+
+def prefilter(level_dir, index, design_file):
+    """
+    the optimizations worth evaluating on the design of a beam entry, the predicted changes of its metrics
+    and the number of ABC runs computing its features (none for a design seen before)
+    """
+    global abc_runs
+    if not surrogate:
+        return optimizations, None, 0
+    key = design_hash(design_file)
+    if key in prefilters:
+        return prefilters[key] + (0,)
+    abc_runs += 1
+    try:
+        features, _ = design_features(design_file, os.path.join(level_dir, str(index), 'features'), 'yosys-abc', \
+            library_file, executor=executor)
+    except ExecutionError as e:
+        log('Surrogate: the features failed, evaluating every optimization: ' + str(e))
+        return optimizations, {}, 1
+    prefilters[key] = tuple(surrogate.prefilter(features, optimizations, objective, top_m))
+    return prefilters[key] + (1,)
+
+def expand(parallel, level_dir, beam):
+    """
+    evaluates every optimization on the design of every sequence in the beam. A child starts from the
+    netlist its parent wrote, so the shared prefix is never run again, and children of identical
+    designs are evaluated once. returns the (sequence, design_file, delay, area) of the children, but
+    those that failed
+    """
+    global abc_runs
+    children, misses, miss_sequences, screened = [], {}, {}, []
+    for index, (sequence, design_file, delay, area) in enumerate(beam):
+        candidates, predictions, feature_runs = prefilter(level_dir, index, design_file)
+        screened.append((candidates, predictions, feature_runs, {'delay': delay, 'area': area}))
+        for opt in candidates:
+            key = (design_hash(design_file), opt)
+            if key not in evaluated and cache:
+                cached = cache.get(runner.cache_key(design_file, opt), '.blif')
+                if cached:
+                    result, netlist = cached
+                    opt_dir = os.path.join(level_dir, str(index), opt).replace(' ', '_')
+                    if not os.path.exists(opt_dir):
+                        os.makedirs(opt_dir)
+                    opt_file = opt_dir + '/design.blif'
+                    with open(opt_file, 'wb') as f:
+                        f.write(netlist)
+                    evaluated[key] = (opt_file, result['delay'], result['area'])
+            if key not in evaluated and key not in misses:
+                misses[key] = (os.path.join(level_dir, str(index), opt), design_file, opt)
+                miss_sequences[key] = sequence + [opt]
+            children.append((sequence + [opt], key))
+
+    log('Evaluating ' + str(len(misses)) + ' of ' + str(len(children)) + ' candidates ..')
+    keys = list(misses)
+    abc_runs += len(keys)
+    # the candidates run concurrently: each is recorded with the wall time of the batch
+    batch_start = timeit.default_timer()
+    for key, result in zip(keys, parallel(delayed(runner.run_thread)(*misses[key]) for key in keys)):
+        evaluated[key] = result
+        if result[0] is None:
+            log('Optimization: ' + '; '.join(miss_sequences[key]) + ' failed, dropped')
+            continue
+        if store:
+            store.record(options['design_file'], library_file, runner.mapping, ['strash'] + miss_sequences[key], \
+                {'delay': result[1], 'area': result[2]}, seconds=timeit.default_timer() - batch_start)
+        if cache:
+            opt_file, delay, area = result
+            with open(opt_file, 'rb') as f:
+                cache.put(runner.cache_key(misses[key][1], key[1]), {'delay': delay, 'area': area}, f.read(), '.blif')
+
+    if surrogate:
+        # the relative changes of the metrics of the candidates let through, against those predicted
+        for (candidates, predictions, feature_runs, parent), (_, design_file, _, _) in zip(screened, beam):
+            actual = {}
+            for opt in candidates:
+                _, delay, area = evaluated[(design_hash(design_file), opt)]
+                if delay is None:
+                    continue
+                child = {'delay': delay, 'area': area}
+                actual[opt] = [child[metric] / parent[metric] - 1 for metric in surrogate.metrics]
+            prefilter_stats.record(len(optimizations), len(candidates), predictions, actual, feature_runs)
+
+    return [(sequence,) + evaluated[key] for sequence, key in children if evaluated[key][0] is not None]
+
+def warm_start(parallel):
+    """
+    the best known sequences of the store by the objective (with the library and mapping of the run), replayed on the design as (sequence, design_file,
+    delay, area) entries of the initial beam
+    """
+    results = store.best(options['design_file'], objective, limit=beam_width, library_file=library_file, \
+        mapping=runner.mapping)
+    sequences = [result['sequence'][1:] for result in results if len(result['sequence']) > 1]
+    entries = parallel(delayed(runner.run_thread)(os.path.join(options['output_dir'], 'warm-start', str(rank)), \
+        options['design_file'], '; '.join(sequence)) for rank, sequence in enumerate(sequences))
+    for sequence, (opt_file, delay, area) in zip(sequences, entries):
+        if opt_file is None:
+            continue
+        log('Warm start from a known sequence: ' + '; '.join(sequence) + ' -> delay: ' + str(delay) + \
+            ', area: ' + str(area))
+    return [(sequence,) + entry for sequence, entry in zip(sequences, entries) if entry[0] is not None]
+
+def select(children):
+    """
+    keeps the best beam_width children with distinct designs
+    """
+    beam, designs = [], set()
+    for child in sorted(children, key=score):
+        child_hash = design_hash(child[1])
+        if child_hash in designs:
+            continue
+        designs.add(child_hash)
+        beam.append(child)
+        if len(beam) == beam_width:
+            break
+    return beam
+
+# the beam starts with the design itself
+initial_dir = os.path.join(options['output_dir'], 'initial')
+with Parallel(n_jobs=options.get('jobs', -1)) as parallel:
+    design_file, delay, area = runner.run_thread(initial_dir, options['design_file'], 'strash')
+    abc_runs += 1
+    if design_file is None:
+        raise SystemExit('The design could not be evaluated')
+    beam = [([], design_file, delay, area)]
+    log('Initial design -> delay: ' + str(delay) + ', area: ' + str(area))
+    # the best known sequences of the design join the initial beam
+    if store and options.get('warm_start', False):
+        beam = select(beam + warm_start(parallel))
+    best = beam[0]
+    log()
+
+    # main optimizing iteration
+    for i in range(iterations):
+        # log
+        log('Level: ' + str(i+1))
+        log('-------------')
+
+        # create a directory for this level
+        level_dir = os.path.join(options['output_dir'], str(i))
+        if not os.path.exists(level_dir):
+            os.makedirs(level_dir)
+
+        children = expand(parallel, level_dir, beam)
+        if not children:
+            log('Every candidate failed, stopping')
+            break
+        beam = select(children)
+        save_level(i, beam)
+        for sequence, _, delay, area in beam:
+            log('Sequence: ' + '; '.join(sequence) + ' -> delay: ' + str(delay) + ', area: ' + str(area))
+        if score(beam[0]) < score(best):
+            best = beam[0]
+        log('================')
+        log()
+
+log('Best sequence: ' + '; '.join(best[0]) + ' -> delay: ' + str(best[2]) + ', area: ' + str(best[3]))
+log('Best design: ' + best[1])
+log('ABC runs: ' + str(abc_runs))
+if surrogate:
+    log(prefilter_stats.summary())
+
+stop = timeit.default_timer()
+
+log('Total Optimization Time: ' + str(stop - start))
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import re
+import hashlib
+from drills.result_cache import ResultCache
+from drills.executor import ExecutionError
+
+def extract_results(stats):
+    """
+    extracts area and delay from the printed stats on stdout
+    """
+    line = stats.decode("utf-8").split('\n')[-2].split(':')[-1].strip()
+
+    ob = re.search(r'Delay *= *[1-9]+.?[0-9]*', line)
+    delay = float(ob.group().split('=')[1].strip())
+    ob = re.search(r'Area *= *[1-9]+.?[0-9]*', line)
+    area = float(ob.group().split('=')[1].strip())
+    return delay, area
+
+def extract_print_stats(stats):
+    """
+    extracts area and delay from the stats printed by print_stats on stdout
+    """
+    line = stats.decode("utf-8").split('\n')[-2].split(':')[-1].strip()
+    ob = re.search(r'delay *= *[1-9]+.?[0-9]+', line)
+    delay = float(ob.group().split('=')[1].strip())
+    ob = re.search(r'area *= *[1-9]+.?[0-9]+', line)
+    area = float(ob.group().split('=')[1].strip())
+    return delay, area
+
+# the commands measuring a mapped design, and the function reading its delay and area from ABC's output
+MEASUREMENTS = {
+    'stime': ('topo; stime', extract_results),
+    'print_stats': ('print_stats', extract_print_stats),
+}
+
+# design hashes by (path, modification time, size), computed once per version of a file
+_design_hashes = {}
+
+def design_hash(design_file):
+    """
+    hashes the netlist without its comments, which hold the time ABC wrote it
+    """
+    stat = os.stat(design_file)
+    signature = (os.path.abspath(design_file), stat.st_mtime_ns, stat.st_size)
+    if signature not in _design_hashes:
+        with open(design_file, 'rb') as f:
+            lines = [line for line in f.read().split(b'\n') if not line.startswith(b'#')]
+        _design_hashes[signature] = hashlib.sha256(b'\n'.join(lines)).hexdigest()
+    return _design_hashes[signature]
+
+def logger(text_log):
+    """
+    returns a log function that prints a message and writes it to the text log
+    """
+    def log(message=''):
+        print(message)
+        text_log.write(message)
+    return log
+
+class ABCRunner:
+    """
+    Runs an optimization on a design with ABC through the executor, then maps it with the library
+    at the clock period and measures its delay and area, with topo; stime as the greedy and beam
+    search baselines do or with print_stats as simulated annealing does. Picklable, to run in the
+    joblib workers.
+    """
+    def __init__(self, executor, library_file, clock_period, measurement='stime'):
+        self.executor = executor
+        self.library_file = library_file
+        self.clock_period = clock_period
+        self.measurement = measurement
+        # the mapping, as the result cache and evaluation store describe it
+        self.mapping = 'map -D ' + str(clock_period) + '; ' + MEASUREMENTS[measurement][0]
+
+    def run_optimization(self, output_dir, optimization, design_file):
+        """
+        returns new_design_file, delay, area
+        """
+        output_dir = output_dir.replace(' ', '_')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        output_design_file = output_dir + '/design.blif'
+
+        abc_command = 'read ' + self.library_file + '; '
+        abc_command += 'read ' + design_file + '; '
+        abc_command += 'strash; '
+        abc_command += optimization + '; '
+        abc_command += 'write ' + output_design_file + '; '
+        abc_command += self.mapping + '; '
+
+        extract = MEASUREMENTS[self.measurement][1]
+        proc = self.executor.run(['yosys-abc','-c', abc_command], extract)
+        d, a = extract(proc)
+        return output_design_file, d, a
+
+    def run_thread(self, output_dir, design_file, opt):
+        """
+        returns (opt_file, delay, area), or (None, None, None) if ABC failed on every attempt
+        """
+        try:
+            return self.run_optimization(output_dir, opt, design_file)
+        except ExecutionError as e:
+            print(e)
+            return (None, None, None)
+
+    def cache_key(self, design_file, opt):
+        """
+        the result cache key of the optimization on the design, which is the same for the same netlist
+        written by ABC in another run
+        """
+        return ResultCache.key(design_file, self.library_file, self.mapping, ['strash', opt], design_hash(design_file))
@@ -8,16 +8,25 @@
 
 import yaml
 import os
-import subprocess
 import sys
 import timeit
 import re
+import atexit
 from joblib import Parallel, delayed
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from drills.result_cache import ResultCache
+from drills.evaluation_store import EvaluationStore
+from drills.surrogate import Surrogate, PrefilterStats, design_features
+from drills.abc_engine import ABCEngine, ABCEngineError
+from drills.executor import Executor, ExecutionError
+from drills.log_writer import LogWriter, log_path
+from baseline.common import ABCRunner, extract_results, logger
+
 data_file = sys.argv[1]
 
 with open(data_file, 'r') as f:
-    options = yaml.load(f)
+    options = yaml.load(f, Loader=yaml.FullLoader)
 
 start = timeit.default_timer()
 
@@ -32,53 +41,54 @@ post_mapping_optimizations = options['post_mapping_commands']
 if not os.path.exists(options['output_dir']):
     os.makedirs(options['output_dir'])
 
-def extract_results(stats):
-    """
-    extracts area and delay from the printed stats on stdout
-    """
-    line = stats.decode("utf-8").split('\n')[-2].split(':')[-1].strip()
-    
-    ob = re.search(r'Delay *= *[1-9]+.?[0-9]*', line)
-    delay = float(ob.group().split('=')[1].strip())
-    ob = re.search(r'Area *= *[1-9]+.?[0-9]*', line)
-    area = float(ob.group().split('=')[1].strip())
-    return delay, area
+# the log and the results are buffered and written by this process only, not by the parallel workers
+text_log = LogWriter(os.path.join(options['output_dir'], 'greedy.log'), mode='a')
+results_log = LogWriter(log_path(os.path.join(options['output_dir'], 'results'), options.get('log_format', 'csv')), \
+    ['iteration', 'optimization', 'delay', 'area'], header=False, mode='a')
+atexit.register(text_log.close)
+atexit.register(results_log.close)
+log = logger(text_log)
 
-def run_optimization(output_dir, optimization, design_file, library):
-    """
-    returns new_design_file, delay, area
-    """
-    output_dir = output_dir.replace(' ', '_')
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    output_design_file = output_dir + '/design.blif'
-    
-    abc_command = 'read ' + library + '; '
-    abc_command += 'read ' + design_file + '; '
-    abc_command += 'strash; '
-    abc_command += optimization + '; '
-    abc_command += 'write ' + output_design_file + '; '
-    abc_command += 'map -D ' + str(clock_period) + '; '
-    abc_command += 'topo; stime; '
-    
-    proc = subprocess.check_output(['yosys-abc','-c', abc_command])
-    d, a = extract_results(proc)
-    return output_design_file, d, a
+# results of (design, optimization) pairs evaluated before are taken from the cache
+cache = None
+if options.get('result_cache'):
+    cache = ResultCache(options['result_cache'], options.get('result_cache_size', 100000))
+
+# every optimization evaluated is recorded in the evaluation store shared with other runs and DRiLLS sessions
+store = None
+if options.get('evaluation_store'):
+    store = EvaluationStore(options['evaluation_store'], 'greedy')
+    atexit.register(store.close)
+# the sequence of optimizations that produced each design file, from the original design
+sequences = {current_design_file: ['strash']}
+
+# a surrogate QoR model predicts the effect of every optimization; only the top_m are evaluated with ABC
+surrogate = None
+if (options.get('surrogate') or {}).get('model'):
+    surrogate = Surrogate.load(options['surrogate']['model'])
+    top_m = options['surrogate'].get('top_m', 3)
+    prefilter_stats = PrefilterStats(surrogate.metrics)
+
+# every ABC run is killed after a timeout and retried; an optimization that still fails is skipped
+executor = Executor.from_params(options)
+runner = ABCRunner(executor, library_file, clock_period)
+# the cache keys of the (design, optimization) pairs that failed, which are not run again
+failed = set()
+
+# 'parallel' launches one ABC per optimization; 'fan_out' evaluates all the optimizations of an
+# iteration in one persistent ABC that keeps the library loaded and reads the design once
+evaluation = options.get('evaluation', 'parallel')
+engine = None
+engine_design_file = None       # the design whose strashed network the engine holds
+if evaluation == 'fan_out':
+    engine = ABCEngine('yosys-abc', ['read ' + library_file], options.get('abc_timeout'))
 
 def save_optimization_step(iteration, optimization, delay, area):
     """
-    saves the winning optimization to a csv file
+    saves the winning optimization to the results log
     """
-    with open(os.path.join(options['output_dir'], 'results.csv'), 'a') as f:
-        data_point = str(iteration) + ', ' + str(optimization) + ', '
-        data_point += str(delay) + ', ' + str(area) + '\n'
-        f.write(data_point)
+    results_log.write([iteration, optimization, delay, area])
 
-def log(message=''):
-    print(message)
-    with open(os.path.join(options['output_dir'], 'greedy.log'), 'a') as f:
-        f.write(message + '\n')
-    
 def run_post_mapping(output_dir, optimization, design_file, library):
     """
     returns new_design_file, delay, area
@@ -95,26 +105,197 @@ def run_post_mapping(output_dir, optimization, design_file, library):
     abc_command += optimization + ';'
     abc_command += 'write ' + output_design_file + '; '
     abc_command += 'print_stats; '
-    proc = subprocess.check_output(['yosys-abc','-c', abc_command])
+    proc = executor.run(['yosys-abc','-c', abc_command], extract_results)
     d, a = extract_results(proc)
     return output_design_file, d, a
 
 def run_thread(iteration_dir, design_file, opt):
-    opt_dir = os.path.join(iteration_dir, opt)
-    opt_file, delay, area = run_optimization(opt_dir, opt, 
-                                                     design_file, 
-                                                     library_file)
-    log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area))
-    return (opt, opt_file, delay, area)
+    """
+    returns (opt, opt_file, delay, area), or (opt, None, None, None) if ABC failed on every attempt
+    """
+    return (opt,) + runner.run_thread(os.path.join(iteration_dir, opt), design_file, opt)
+
+def record(design_file, opt, opt_file, delay, area, seconds=None):
+    """
+    records the evaluation of the optimization on the design in the store, as the sequence from the original design
+    """
+    sequence = sequences[design_file] + [opt]
+    if opt_file:
+        sequences[opt_file] = sequence
+    if store:
+        store.record(options['design_file'], library_file, runner.mapping, sequence, {'delay': delay, 'area': area}, \
+            seconds=seconds)
+
+def warm_start(design_file):
+    """
+    the design optimized by the best known sequence of the store with the library and mapping of the run (of
+    least area meeting the clock period, or of least delay), or the design itself if the store has none
+    """
+    results = store.best(design_file, 'area', max_delay=clock_period, library_file=library_file, \
+        mapping=runner.mapping) or store.best(design_file, 'delay', library_file=library_file, mapping=runner.mapping)
+    if not results or len(results[0]['sequence']) < 2:
+        return design_file
+    sequence = results[0]['sequence']
+    try:
+        opt_file, delay, area = runner.run_optimization(os.path.join(options['output_dir'], 'warm-start'), \
+            '; '.join(sequence[1:]), design_file)
+    except ExecutionError as e:
+        log('Warm start failed, starting from the design: ' + str(e))
+        return design_file
+    log('Warm start from the best known sequence (' + results[0]['source'] + '): ' + '; '.join(sequence) + \
+        ' -> delay: ' + str(delay) + ', area: ' + str(area))
+    sequences[opt_file] = sequence
+    return opt_file
+
+def evaluate(iteration_dir, design_file, opts):
+    """
+    runs the optimizations on the design in parallel, except the ones found in the result cache.
+    returns a list of (opt, opt_file, delay, area) of those that did not fail
+    """
+    results = {}
+    misses = []
+    for opt in opts:
+        if runner.cache_key(design_file, opt) in failed:
+            continue
+        cached = cache.get(runner.cache_key(design_file, opt), '.blif') if cache else None
+        if cached is None:
+            misses.append(opt)
+            continue
+        result, netlist = cached
+        opt_dir = os.path.join(iteration_dir, opt).replace(' ', '_')
+        if not os.path.exists(opt_dir):
+            os.makedirs(opt_dir)
+        opt_file = opt_dir + '/design.blif'
+        with open(opt_file, 'wb') as f:
+            f.write(netlist)
+        log('Optimization: ' + opt + ' -> delay: ' + str(result['delay']) + ', area: ' + str(result['area']) + ' (cached)')
+        results[opt] = (opt, opt_file, result['delay'], result['area'])
+        sequences[opt_file] = sequences[design_file] + [opt]
+
+    if misses:
+        # the optimizations run concurrently: each is recorded with the wall time of the batch
+        batch_start = timeit.default_timer()
+        for result in Parallel(n_jobs=len(misses))(delayed(run_thread)(iteration_dir, design_file, opt) for opt in misses):
+            opt, opt_file, delay, area = result
+            if opt_file is None:
+                log('Optimization: ' + opt + ' failed, skipped')
+                failed.add(runner.cache_key(design_file, opt))
+                continue
+            log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area))
+            results[opt] = result
+            record(design_file, opt, opt_file, delay, area, timeit.default_timer() - batch_start)
+            if cache:
+                with open(opt_file, 'rb') as f:
+                    cache.put(runner.cache_key(design_file, opt), {'delay': delay, 'area': area}, f.read(), '.blif')
+
+    return [results[opt] for opt in opts if opt in results]
+
+def run_engine(abc_command, design_file):
+    """
+    runs the commands on the engine after bringing it to the strashed design, retrying once
+    if the engine crashes or times out (it then restarts with the library only)
+    """
+    global engine_design_file
+    for attempt in range(2):
+        prefix = [] if engine_design_file == design_file else ['read ' + design_file, 'strash']
+        engine_design_file = None
+        try:
+            return engine.run(prefix + abc_command)
+        except ABCEngineError as e:
+            if attempt:
+                raise
+            log(str(e))
+            log('Retrying on the restarted ABC engine ..')
+
+def fan_out(iteration_dir, design_file, opts):
+    """
+    evaluates the optimizations on the design in one ABC run, except the ones found in the result cache:
+    the design is parked in the & space and every optimization branches off it (apply, map, measure, restore).
+    No netlist is written. returns a list of (opt, None, delay, area) of those that did not fail; if the engine
+    crashes or hangs on the batch, its candidates are evaluated one by one instead, which singles out the failing ones
+    """
+    global engine_design_file
+    results = {}
+    misses = []
+    for opt in opts:
+        if runner.cache_key(design_file, opt) in failed:
+            continue
+        cached = cache.get(runner.cache_key(design_file, opt)) if cache else None
+        if cached is None:
+            misses.append(opt)
+            continue
+        result, _ = cached
+        log('Optimization: ' + opt + ' -> delay: ' + str(result['delay']) + ', area: ' + str(result['area']) + ' (cached)')
+        results[opt] = (opt, None, result['delay'], result['area'])
+
+    if misses:
+        batch_start = timeit.default_timer()
+        abc_command = ['&get -n']
+        for i, opt in enumerate(misses):
+            abc_command += ['echo DRILLS_CANDIDATE_' + str(i), opt, 'map -D ' + str(clock_period), 'topo', 'stime', \
+                '&put', '&get -n']
+        try:
+            proc = run_engine(abc_command, design_file)
+        except ABCEngineError as e:
+            log(str(e))
+            log('Evaluating the candidates one by one ..')
+            evaluated = {result[0]: result for result in evaluate(iteration_dir, design_file, misses)}
+            results.update(evaluated)
+            return [results[opt] for opt in opts if opt in results]
+        # the engine is back at the strashed design
+        engine_design_file = design_file
+        # the output of each candidate follows its echoed index; one without it or without a stime line failed
+        parts = re.split(rb'DRILLS_CANDIDATE_([0-9]+)\n', proc)
+        sections = {int(index): section for index, section in zip(parts[1::2], parts[2::2])}
+        for i, opt in enumerate(misses):
+            lines = [line for line in sections.get(i, b'').decode('utf-8').split('\n') if 'Delay' in line]
+            try:
+                delay, area = extract_results((lines[-1] + '\n').encode())
+            except (IndexError, AttributeError):
+                log('Optimization: ' + opt + ' failed, skipped')
+                failed.add(runner.cache_key(design_file, opt))
+                continue
+            log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area))
+            results[opt] = (opt, None, delay, area)
+            record(design_file, opt, None, delay, area, timeit.default_timer() - batch_start)
+            if cache:
+                cache.put(runner.cache_key(design_file, opt), {'delay': delay, 'area': area})
+
+    return [results[opt] for opt in opts if opt in results]
+
+def write_optimization(iteration_dir, design_file, opt):
+    """
+    applies the chosen optimization to the design in the engine and writes the result; returns the new design file
+    """
+    opt_dir = os.path.join(iteration_dir, opt).replace(' ', '_')
+    if not os.path.exists(opt_dir):
+        os.makedirs(opt_dir)
+    opt_file = opt_dir + '/design.blif'
+    try:
+        run_engine([opt, 'write ' + opt_file], design_file)
+    except ABCEngineError as e:
+        log(str(e))
+        opt_file = run_thread(iteration_dir, design_file, opt)[1]
+        if opt_file is None:
+            raise SystemExit('The chosen optimization ' + opt + ' could not be written')
+    sequences[opt_file] = sequences[design_file] + [opt]
+    return opt_file
 
 def run_thread_post_mapping(iteration_dir, design_file, opt):
     opt_dir = os.path.join(iteration_dir, opt)
-    opt_file, delay, area = run_post_mapping(opt_dir, opt, 
-                                                     design_file, 
-                                                     library_file)
-    log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area))
+    try:
+        opt_file, delay, area = run_post_mapping(opt_dir, opt, 
+                                                         design_file, 
+                                                         library_file)
+    except ExecutionError as e:
+        print(e)
+        return (opt, None, None, None)
     return (opt, opt_file, delay, area)
 
+# start from the best known sequence of the design
+if store and options.get('warm_start', False):
+    current_design_file = warm_start(current_design_file)
+
 # main optimizing iteration
 previous_area = None
 for i in range(iterations):
@@ -127,9 +308,31 @@ for i in range(iterations):
     if not os.path.exists(iteration_dir):
         os.makedirs(iteration_dir)
     
+    # the surrogate picks the candidates worth running ABC on, from the features of the design
+    candidates = optimizations
+    if surrogate:
+        try:
+            features, abc_output = design_features(current_design_file, os.path.join(iteration_dir, 'features'), \
+                'yosys-abc', library_file, ['map -D ' + str(clock_period), 'topo', 'stime'], executor)
+            current_delay, current_area = extract_results(abc_output)
+            candidates, predictions = surrogate.prefilter(features, optimizations, 'area', top_m)
+            log('Surrogate: evaluating ' + ', '.join(candidates))
+        except ExecutionError as e:
+            log('Surrogate: the features failed, evaluating every optimization: ' + str(e))
+
     # in parallel, run ABC on each of the optimizations we have    
-    results = Parallel(n_jobs=len(optimizations))(delayed(run_thread)(iteration_dir, current_design_file, opt) for opt in optimizations)
+    if engine:
+        results = fan_out(iteration_dir, current_design_file, candidates)
+    else:
+        results = evaluate(iteration_dir, current_design_file, candidates)
+    if candidates is not optimizations:
+        prefilter_stats.record(len(optimizations), len(candidates), predictions, \
+            {opt: [area / current_area - 1, delay / current_delay - 1] for opt, _, delay, area in results})
     
+    if not results:
+        log('Every optimization failed on the design, stopping')
+        break
+
     # get the minimum result of all threads
     best_thread = min(results, key = lambda t: t[3])  # getting minimum for delay (index=2) or area (index=3)
     
@@ -138,6 +341,10 @@ for i in range(iterations):
     best_optimization_file = best_thread[1]
     best_delay = best_thread[2]
     best_area = best_thread[3]
+
+    # only the chosen optimization is written when fanning out
+    if best_optimization_file is None:
+        best_optimization_file = write_optimization(iteration_dir, current_design_file, best_optimization)
     
     
     if best_area == previous_area:
@@ -160,6 +367,9 @@ for i in range(iterations):
         log('Performing post mapping optimizations ..')
         # run post mapping optimization
         results = Parallel(n_jobs=len(post_mapping_optimizations))(delayed(run_thread_post_mapping)(iteration_dir, current_design_file, opt) for opt in post_mapping_optimizations)
+        results = [result for result in results if result[1] is not None]
+        for opt, _, delay, area in results:
+            log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area))
 
         # get the minimum result of all threads
         best_thread = min(results, key = lambda t: t[3])  # getting minimum for delay (index=2) or area (index=3)
@@ -185,4 +395,9 @@ for i in range(iterations):
 
 stop = timeit.default_timer()
 
+if engine:
+    engine.close()
+
+if surrogate:
+    log(prefilter_stats.summary())
 log('Total Optimization Time: ' + str(stop - start))
\ No newline at end of file
@@ -8,18 +8,25 @@
 
 import yaml
 import os
-import subprocess
 import sys
 import timeit
-import re
 import random
 import math
+import atexit
 from joblib import Parallel, delayed
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from drills.result_cache import ResultCache
+from drills.evaluation_store import EvaluationStore
+from drills.surrogate import Surrogate, PrefilterStats, design_features
+from drills.executor import Executor, ExecutionError
+from drills.log_writer import LogWriter, log_path
+from baseline.common import ABCRunner, extract_print_stats
+
 data_file = sys.argv[1]
 
 with open(data_file, 'r') as f:
-    options = yaml.load(f)
+    options = yaml.load(f, Loader=yaml.FullLoader)
 
 start = timeit.default_timer()
 
@@ -37,51 +44,53 @@ cooling_rate = options['simulated_annealing']['cooling_rate']
 if not os.path.exists(options['output_dir']):
     os.makedirs(options['output_dir'])
 
-def extract_results(stats):
-    """
-    extracts area and delay from the printed stats on stdout
-    """
-    line = stats.decode("utf-8").split('\n')[-2].split(':')[-1].strip()
-    ob = re.search(r'delay *= *[1-9]+.?[0-9]+', line)
-    delay = float(ob.group().split('=')[1].strip())
-    ob = re.search(r'area *= *[1-9]+.?[0-9]+', line)
-    area = float(ob.group().split('=')[1].strip())
-    return delay, area
+# the logs and results (of the run or of each chain) are buffered and written by this process only,
+# not by the parallel workers
+log_writers = {}
+atexit.register(lambda: [writer.close() for writer in log_writers.values()])
 
-def run_optimization(output_dir, optimization, design_file, library):
-    """
-    returns new_design_file, delay, area
-    """
-    output_dir = output_dir.replace(' ', '_')
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    output_design_file = output_dir + '/design.blif'
-    
-    abc_command = 'read ' + library + '; '
-    abc_command += 'read ' + design_file + '; '
-    abc_command += 'strash; '
-    abc_command += optimization + '; '
-    abc_command += 'write ' + output_design_file + '; '
-    abc_command += 'map -D ' + str(clock_period) + '; '
-    abc_command += 'print_stats; '
-    
-    proc = subprocess.check_output(['yosys-abc','-c', abc_command])
-    d, a = extract_results(proc)
-    return output_design_file, d, a
+def log_writer(path, columns=None):
+    if path not in log_writers:
+        log_writers[path] = LogWriter(path, columns, header=False, mode='a')
+    return log_writers[path]
+
+# results of (design, optimization) pairs evaluated before are taken from the cache
+cache = None
+if options.get('result_cache'):
+    cache = ResultCache(options['result_cache'], options.get('result_cache_size', 100000))
+
+# every optimization evaluated is recorded in the evaluation store shared with other runs and DRiLLS sessions
+store = None
+if options.get('evaluation_store'):
+    store = EvaluationStore(options['evaluation_store'], 'simulated annealing')
+    atexit.register(store.close)
+# the sequence of optimizations that produced each design file, from the original design
+sequences = {current_design_file: ['strash']}
+
+# every ABC run is killed after a timeout and retried; a trial that still fails is rejected
+executor = Executor.from_params(options)
+runner = ABCRunner(executor, library_file, clock_period, 'print_stats')
 
-def save_optimization_step(iteration, optimization, delay, area):
+# a surrogate QoR model predicts the effect of every optimization; a trial of one that is not among the top_m
+# predicted for the design is rejected without running ABC
+surrogate = None
+if (options.get('surrogate') or {}).get('model'):
+    surrogate = Surrogate.load(options['surrogate']['model'])
+    top_m = options['surrogate'].get('top_m', 3)
+    prefilter_stats = PrefilterStats(surrogate.metrics)
+    # design file -> (candidates, predictions, delay, area)
+    prefilters = {}
+
+def save_optimization_step(iteration, optimization, delay, area, output_dir=None):
     """
-    saves the winning optimization to a csv file
+    saves the winning optimization to the results log (of a chain, if its output_dir is given)
     """
-    with open(os.path.join(options['output_dir'], 'results.csv'), 'a') as f:
-        data_point = str(iteration) + ', ' + str(optimization) + ', '
-        data_point += str(delay) + ', ' + str(area) + '\n'
-        f.write(data_point)
+    path = log_path(os.path.join(output_dir or options['output_dir'], 'results'), options.get('log_format', 'csv'))
+    log_writer(path, ['iteration', 'optimization', 'delay', 'area']).write([iteration, optimization, delay, area])
 
-def log(message=''):
-    print(message)
-    with open(os.path.join(options['output_dir'], 'greedy.log'), 'a') as f:
-        f.write(message + '\n')
+def log(message='', output_dir=None):
+    print(('[' + os.path.basename(output_dir) + '] ' if output_dir else '') + message)
+    log_writer(os.path.join(output_dir or options['output_dir'], 'greedy.log')).write(message)
     
 def run_post_mapping(output_dir, optimization, design_file, library):
     """
@@ -99,116 +108,435 @@ def run_post_mapping(output_dir, optimization, design_file, library):
     abc_command += optimization + ';'
     abc_command += 'write ' + output_design_file + '; '
     abc_command += 'print_stats; '
-    proc = subprocess.check_output(['yosys-abc','-c', abc_command])
-    d, a = extract_results(proc)
+    proc = executor.run(['yosys-abc','-c', abc_command], extract_print_stats)
+    d, a = extract_print_stats(proc)
     return output_design_file, d, a
 
-def run_thread(iteration_dir, design_file, opt):
-    opt_dir = os.path.join(iteration_dir, opt)
-    opt_file, delay, area = run_optimization(opt_dir, opt, 
-                                                     design_file, 
-                                                     library_file)
-    log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area))
-    return (opt, opt_file, delay, area)
+def run_thread(iteration_dir, design_file, opt, log_dir=None):
+    """
+    returns (opt, opt_file, delay, area), or (opt, None, None, None) if ABC failed on every attempt
+    """
+    return (opt,) + runner.run_thread(os.path.join(iteration_dir, opt), design_file, opt)
+
+def record(design_file, opt, opt_file, delay, area, seconds=None):
+    """
+    records the evaluation of the optimization on the design in the store, as the sequence from the original design
+    """
+    sequence = sequences[design_file] + [opt]
+    sequences[opt_file] = sequence
+    if store:
+        store.record(options['design_file'], library_file, runner.mapping, sequence, {'delay': delay, 'area': area}, \
+            seconds=seconds)
+
+def warm_start(design_file):
+    """
+    the design optimized by the best known sequence of the store with the library and mapping of the run
+    (of least delay), or the design itself if the store has none
+    """
+    results = store.best(design_file, 'delay', library_file=library_file, mapping=runner.mapping)
+    if not results or len(results[0]['sequence']) < 2:
+        return design_file
+    sequence = results[0]['sequence']
+    try:
+        opt_file, delay, area = runner.run_optimization(os.path.join(options['output_dir'], 'warm-start'), \
+            '; '.join(sequence[1:]), design_file)
+    except ExecutionError as e:
+        log('Warm start failed, starting from the design: ' + str(e))
+        return design_file
+    log('Warm start from the best known sequence (' + results[0]['source'] + '): ' + '; '.join(sequence) + \
+        ' -> delay: ' + str(delay) + ', area: ' + str(area))
+    sequences[opt_file] = sequence
+    return opt_file
+
+def evaluate(iteration_dir, design_file, opts):
+    """
+    runs the optimizations on the design in parallel, except the ones found in the result cache.
+    returns a list of (opt, opt_file, delay, area)
+    """
+    return evaluate_trials([(iteration_dir, design_file, opt, None) for opt in opts])
+
+def evaluate_trials(trials, parallel=None):
+    """
+    runs the trials (iteration_dir, design_file, opt, log_dir) in parallel, on the given joblib pool
+    if any, except the ones found in the result cache. returns a list of (opt, opt_file, delay, area),
+    opt_file, delay and area None for a trial that failed
+    """
+    results = {}
+    misses = []
+    for index, (iteration_dir, design_file, opt, log_dir) in enumerate(trials):
+        cached = cache.get(runner.cache_key(design_file, opt), '.blif') if cache else None
+        if cached is None:
+            misses.append(index)
+            continue
+        result, netlist = cached
+        opt_dir = os.path.join(iteration_dir, opt).replace(' ', '_')
+        if not os.path.exists(opt_dir):
+            os.makedirs(opt_dir)
+        opt_file = opt_dir + '/design.blif'
+        with open(opt_file, 'wb') as f:
+            f.write(netlist)
+        log('Optimization: ' + opt + ' -> delay: ' + str(result['delay']) + ', area: ' + str(result['area']) + \
+            ' (cached)', log_dir)
+        results[index] = (opt, opt_file, result['delay'], result['area'])
+        sequences[opt_file] = sequences[design_file] + [opt]
+
+    if misses:
+        parallel = parallel or Parallel(n_jobs=len(misses))
+        # the trials run concurrently: each is recorded with the wall time of the batch
+        batch_start = timeit.default_timer()
+        for index, result in zip(misses, parallel(delayed(run_thread)(*trials[index]) for index in misses)):
+            opt, opt_file, delay, area = result
+            results[index] = result
+            if opt_file is None:
+                log('Optimization: ' + opt + ' failed', trials[index][3])
+                continue
+            log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area), trials[index][3])
+            record(trials[index][1], opt, opt_file, delay, area, timeit.default_timer() - batch_start)
+            if cache:
+                with open(opt_file, 'rb') as f:
+                    cache.put(runner.cache_key(trials[index][1], opt), {'delay': delay, 'area': area}, f.read(), '.blif')
+
+    return [results[index] for index in range(len(trials))]
+
+def screen(iteration_dir, design_file, opt):
+    """
+    whether the surrogate lets the trial of the optimization on the design through to ABC
+    """
+    feature_runs = 0
+    if design_file not in prefilters:
+        try:
+            features, abc_output = design_features(design_file, os.path.join(iteration_dir, 'features'), \
+                'yosys-abc', library_file, [runner.mapping], executor)
+            prefilters[design_file] = surrogate.prefilter(features, optimizations, 'delay', top_m) + \
+                extract_print_stats(abc_output)
+        except ExecutionError as e:
+            # every trial on the design goes through
+            log('Surrogate: the features failed: ' + str(e))
+            prefilters[design_file] = (optimizations, {}, None, None)
+        feature_runs = 1
+    candidates = prefilters[design_file][0]
+    if opt not in candidates:
+        prefilter_stats.record(1, 0, feature_runs=feature_runs)
+    return opt in candidates, feature_runs
+
+def observe(design_file, opt, delay, area, feature_runs):
+    """
+    records the error of the surrogate's prediction of a trial it let through
+    """
+    _, predictions, current_delay, current_area = prefilters[design_file]
+    if delay is None or current_delay is None:
+        prefilter_stats.record(1, 1, feature_runs=feature_runs)
+        return
+    prefilter_stats.record(1, 1, predictions, {opt: [area / current_area - 1, delay / current_delay - 1]}, \
+        feature_runs)
 
 def run_thread_post_mapping(iteration_dir, design_file, opt):
     opt_dir = os.path.join(iteration_dir, opt)
-    opt_file, delay, area = run_post_mapping(opt_dir, opt, 
-                                                     design_file, 
-                                                     library_file)
-    log('Optimization: ' + opt + ' -> delay: ' + str(delay) + ', area: ' + str(area))
+    try:
+        opt_file, delay, area = run_post_mapping(opt_dir, opt, 
+                                                         design_file, 
+                                                         library_file)
+    except ExecutionError as e:
+        print(e)
+        return (opt, None, None, None)
     return (opt, opt_file, delay, area)
 
-i = 0
-# run the optimization once to set the initial energy (delay) of the system
-log('Initializing annealing ..')
-log('Current temperature: ' + str(temperature))
-log('----------------')
-iteration_dir = os.path.join(options['output_dir'], str(i))
-if not os.path.exists(iteration_dir):
-    os.makedirs(iteration_dir)
-# Pick an optimization at random
-random_optimization = 'strash'      # a command that does no optimization
-result = run_thread(iteration_dir, current_design_file, random_optimization)
-opt_file = result[1]
-delay = result[2]
-area = result[3]
-# accept it to set the energe of the system in the beginning
-save_optimization_step(i, random_optimization, delay, area)
-current_design_file = opt_file
-previous_delay = delay
-i += 1
-
-log('System initialized with delay: ' + str(delay))
-log('Starting annealing ..')
-log()
-
-# main optimizing iteration
-while True:
-    number_of_accepted_optimizations = 0
-
-    for _ in range(100):
-        # if we accept 10 optimizations, we cool down the system
-        # otherwise, only continue up to 100 trials for this temperature
-        
-        # log
-        log('Iteration: ' + str(i))
-        log('Temperature: ' + str(temperature))
-        log('----------------')
-    
-        # create a directory for this iteration
-        iteration_dir = os.path.join(options['output_dir'], str(i))
+class Chain:
+    """
+    one annealing chain of a multi-chain run, with its own temperature, random generator,
+    log and results.csv in output_dir/chain-<index>
+    """
+    def __init__(self, index, temperature, seed):
+        self.index = index
+        self.output_dir = os.path.join(options['output_dir'], 'chain-' + str(index))
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        self.temperature = temperature
+        self.random = random.Random(seed)
+        self.design_file = current_design_file
+        self.delay, self.area = None, None
+        self.best = (float('inf'), float('inf'), -1)    # delay, area, iteration
+        self.iteration = 0
+        self.trials, self.accepted = 0, 0               # at the current temperature
+        self.total_trials, self.total_accepted, self.exchanges = 0, 0, 0
+        self.active = True
+
+    def log(self, message=''):
+        log(message, self.output_dir)
+
+    def iteration_dir(self):
+        iteration_dir = os.path.join(self.output_dir, str(self.iteration))
         if not os.path.exists(iteration_dir):
             os.makedirs(iteration_dir)
-    
-        # Pick an optimization at random
-        random_optimization = random.choice(optimizations)
-        result = run_thread(iteration_dir, current_design_file, random_optimization)
-        opt_file = result[1]
-        delay = result[2]
-        area = result[3]
-
-        # if better than the previous delay, accept. Otherwise, accept with probability
-        if delay < previous_delay:
-            log('The optimization reduced the delay!')
-            log('Accepting it ..')
-            save_optimization_step(i, random_optimization, delay, area)
-            current_design_file = opt_file
-            previous_delay = delay
-            number_of_accepted_optimizations += 1
+        return iteration_dir
+
+    def accept(self, optimization, opt_file, delay, area):
+        save_optimization_step(self.iteration, optimization, delay, area, self.output_dir)
+        self.design_file, self.delay, self.area = opt_file, delay, area
+        if delay < self.best[0]:
+            self.best = (delay, area, self.iteration)
+
+    def step(self, optimization, opt_file, delay, area):
+        """
+        accepts or rejects the trial as the single chain does, then cools down the chain after 10
+        accepted optimizations or 100 trials, or stops it once it has sufficiently cooled down
+        """
+        if delay < self.delay:
+            self.log('The optimization reduced the delay!')
+            self.log('Accepting it ..')
+            self.accept(optimization, opt_file, delay, area)
+            self.accepted += 1
         else:
-            delta_delay = delay - previous_delay
-            probability_of_acceptance = math.exp((- delta_delay) / temperature)
-            log('The optimization didn\'t reduce the delay, the system looks to be still hot.')
-            log('The probability of acceptance is: ' + str(probability_of_acceptance))
-            log('Uniformly generating a number to see if we accept it ..')
-            if random.uniform(0, 1.0) < probability_of_acceptance:
+            probability_of_acceptance = math.exp((- (delay - self.delay)) / self.temperature)
+            self.log('The optimization didn\'t reduce the delay, the system looks to be still hot.')
+            self.log('The probability of acceptance is: ' + str(probability_of_acceptance))
+            if self.random.uniform(0, 1.0) < probability_of_acceptance:
+                self.log('Accepting it ..')
+                self.accept(optimization, opt_file, delay, area)
+                self.accepted += 1
+            else:
+                self.log('Rejected ..')
+        self.advance()
+
+    def skip(self, optimization):
+        """
+        rejects the trial of an optimization the surrogate predicts no good for, without running it
+        """
+        self.log('The surrogate predicts ' + optimization + ' is not worth trying, rejected without ABC ..')
+        self.advance()
+
+    def advance(self):
+        self.iteration += 1
+        self.trials += 1
+        self.total_trials += 1
+        self.log()
+
+        if self.accepted == 10 or self.trials == 100:
+            self.total_accepted += self.accepted
+            self.trials, self.accepted = 0, 0
+            if self.temperature <= 0.1:
+                self.log('System has sufficiently cooled down ..')
+                self.log('Shutting down chain ..')
+                self.active = False
+            else:
+                new_temperature = self.temperature * cooling_rate
+                self.log('Cooling down system from ' + str(self.temperature) + ' to ' + str(new_temperature) + ' ..')
+                self.temperature = new_temperature
+            self.log('================')
+            self.log()
+
+def exchange(chains, offset, exchange_random):
+    """
+    replica exchange: neighbouring chains (c, c + 1), starting at offset, swap their designs with
+    probability min(1, exp((1 / T_c - 1 / T_c+1) * (delay_c - delay_c+1))). A swap is not an optimization:
+    it goes to the chains' logs only, not to their results
+    """
+    for a, b in zip(chains[offset::2], chains[offset + 1::2]):
+        if not (a.active and b.active):
+            continue
+        exponent = (1.0 / a.temperature - 1.0 / b.temperature) * (a.delay - b.delay)
+        if exponent >= 0 or exchange_random.uniform(0, 1.0) < math.exp(exponent):
+            a.design_file, b.design_file = b.design_file, a.design_file
+            a.delay, b.delay = b.delay, a.delay
+            a.area, b.area = b.area, a.area
+            for chain, other in [(a, b), (b, a)]:
+                chain.exchanges += 1
+                chain.log('Exchanged designs with chain ' + str(other.index) + ', delay is now: ' + str(chain.delay))
+
+def run_chains(number_of_chains):
+    """
+    runs several chains concurrently, one trial of each chain per round on a pool of workers.
+    In 'tempering' mode, the initial temperatures of the chains are spaced geometrically up to
+    max_temp and neighbouring chains exchange their designs every exchange_interval rounds;
+    in 'restarts' mode, the chains are independent restarts at the initial temperature.
+    """
+    settings = options['simulated_annealing']
+    mode = settings.get('mode', 'tempering')
+    max_temperature = settings.get('max_temp', 10 * temperature)
+    exchange_interval = settings.get('exchange_interval', 10)
+    seed = settings.get('seed', 0)
+
+    chains = []
+    for index in range(number_of_chains):
+        chain_temperature = temperature
+        if mode == 'tempering':
+            chain_temperature = temperature * (max_temperature / temperature) ** (index / (number_of_chains - 1))
+        chains.append(Chain(index, chain_temperature, seed + index))
+    exchange_random = random.Random(seed - 1)
+
+    log('Initializing ' + str(number_of_chains) + ' chains (' + mode + ') at temperatures: ' + \
+        ', '.join('%.3f' % chain.temperature for chain in chains))
+    with Parallel(n_jobs=number_of_chains) as parallel:
+        # run the optimization once to set the initial energy (delay) of every chain
+        results = evaluate_trials([(chain.iteration_dir(), chain.design_file, 'strash', chain.output_dir) \
+            for chain in chains], parallel)
+        if any(opt_file is None for _, opt_file, _, _ in results):
+            raise SystemExit('The design could not be evaluated')
+        for chain, (_, opt_file, delay, area) in zip(chains, results):
+            chain.delay = delay
+            chain.accept('strash', opt_file, delay, area)
+            chain.iteration += 1
+            chain.log('System initialized with delay: ' + str(delay))
+            chain.log('Starting annealing ..')
+            chain.log()
+
+        rounds = 0
+        while any(chain.active for chain in chains):
+            active = [chain for chain in chains if chain.active]
+            trials, screened = [], []
+            for chain in active:
+                chain.log('Iteration: ' + str(chain.iteration))
+                chain.log('Temperature: ' + str(chain.temperature))
+                chain.log('----------------')
+                # Pick an optimization at random
+                trial = (chain.iteration_dir(), chain.design_file, chain.random.choice(optimizations), chain.output_dir)
+                if surrogate:
+                    passed, feature_runs = screen(*trial[:3])
+                    if not passed:
+                        chain.skip(trial[2])
+                        continue
+                    screened.append((chain.design_file, feature_runs))
+                trials.append((chain, trial))
+            results = evaluate_trials([trial for _, trial in trials], parallel) if trials else []
+            for (chain, trial), (opt, opt_file, delay, area) in zip(trials, results):
+                if surrogate:
+                    observe(trial[1], opt, delay, area, screened.pop(0)[1])
+                if opt_file is None:
+                    chain.log('The optimization failed, rejected ..')
+                    chain.advance()
+                    continue
+                chain.step(opt, opt_file, delay, area)
+
+            rounds += 1
+            if mode == 'tempering' and rounds % exchange_interval == 0:
+                exchange(chains, (rounds // exchange_interval) % 2, exchange_random)
+
+    # a summary of the chains
+    with open(os.path.join(options['output_dir'], 'chains.csv'), 'w') as f:
+        f.write('chain, final_temperature, best_delay, best_area, best_iteration, trials, accepted, exchanges\n')
+        for chain in chains:
+            f.write(', '.join(map(str, [chain.index, chain.temperature, chain.best[0], chain.best[1], chain.best[2], \
+                chain.total_trials, chain.total_accepted, chain.exchanges])) + '\n')
+    best_chain = min(chains, key=lambda chain: chain.best[0])
+    log('Best delay: ' + str(best_chain.best[0]) + ', area: ' + str(best_chain.best[1]) + \
+        ' (chain ' + str(best_chain.index) + ', iteration ' + str(best_chain.best[2]) + ')')
+
+# start from the best known sequence of the design
+if store and options.get('warm_start', False):
+    current_design_file = warm_start(current_design_file)
+
+number_of_chains = options['simulated_annealing'].get('chains', 1)
+if number_of_chains > 1:
+    run_chains(number_of_chains)
+else:
+    i = 0
+    # run the optimization once to set the initial energy (delay) of the system
+    log('Initializing annealing ..')
+    log('Current temperature: ' + str(temperature))
+    log('----------------')
+    iteration_dir = os.path.join(options['output_dir'], str(i))
+    if not os.path.exists(iteration_dir):
+        os.makedirs(iteration_dir)
+    # Pick an optimization at random
+    random_optimization = 'strash'      # a command that does no optimization
+    result = evaluate(iteration_dir, current_design_file, [random_optimization])[0]
+    opt_file = result[1]
+    delay = result[2]
+    area = result[3]
+    if opt_file is None:
+        raise SystemExit('The design could not be evaluated')
+    # accept it to set the energe of the system in the beginning
+    save_optimization_step(i, random_optimization, delay, area)
+    current_design_file = opt_file
+    previous_delay = delay
+    i += 1
+
+    log('System initialized with delay: ' + str(delay))
+    log('Starting annealing ..')
+    log()
+
+    # main optimizing iteration
+    while True:
+        number_of_accepted_optimizations = 0
+
+        for _ in range(100):
+            # if we accept 10 optimizations, we cool down the system
+            # otherwise, only continue up to 100 trials for this temperature
+        
+            # log
+            log('Iteration: ' + str(i))
+            log('Temperature: ' + str(temperature))
+            log('----------------')
+    
+            # create a directory for this iteration
+            iteration_dir = os.path.join(options['output_dir'], str(i))
+            if not os.path.exists(iteration_dir):
+                os.makedirs(iteration_dir)
+    
+            # Pick an optimization at random
+            random_optimization = random.choice(optimizations)
+            if surrogate:
+                passed, feature_runs = screen(iteration_dir, current_design_file, random_optimization)
+                if not passed:
+                    log('The surrogate predicts ' + random_optimization + ' is not worth trying, rejected without ABC ..')
+                    i += 1
+                    log()
+                    continue
+            result = evaluate(iteration_dir, current_design_file, [random_optimization])[0]
+            if surrogate:
+                observe(current_design_file, random_optimization, result[2], result[3], feature_runs)
+            opt_file = result[1]
+            delay = result[2]
+            area = result[3]
+            if opt_file is None:
+                log('The optimization failed, rejected ..')
+                i += 1
+                log()
+                continue
+
+            # if better than the previous delay, accept. Otherwise, accept with probability
+            if delay < previous_delay:
+                log('The optimization reduced the delay!')
                 log('Accepting it ..')
                 save_optimization_step(i, random_optimization, delay, area)
                 current_design_file = opt_file
                 previous_delay = delay
                 number_of_accepted_optimizations += 1
             else:
-                log('Rejected ..')
-                pass
-        i += 1
-        log()
+                delta_delay = delay - previous_delay
+                probability_of_acceptance = math.exp((- delta_delay) / temperature)
+                log('The optimization didn\'t reduce the delay, the system looks to be still hot.')
+                log('The probability of acceptance is: ' + str(probability_of_acceptance))
+                log('Uniformly generating a number to see if we accept it ..')
+                if random.uniform(0, 1.0) < probability_of_acceptance:
+                    log('Accepting it ..')
+                    save_optimization_step(i, random_optimization, delay, area)
+                    current_design_file = opt_file
+                    previous_delay = delay
+                    number_of_accepted_optimizations += 1
+                else:
+                    log('Rejected ..')
+                    pass
+            i += 1
+            log()
+
+            if number_of_accepted_optimizations == 10:
+                break
 
-        if number_of_accepted_optimizations == 10:
+        if temperature <= 0.1:
+            log('System has sufficiently cooled down ..')
+            log('Shutting down simulation ..')
+            log()
             break
 
-    if temperature <= 0.1:
-        log('System has sufficiently cooled down ..')
-        log('Shutting down simulation ..')
+        new_temperature = temperature * cooling_rate
+        log('Cooling down system from ' + str(temperature) + ' to ' + str(new_temperature) + ' ..')
+        temperature = new_temperature
+        log('================')
         log()
-        break
-
-    new_temperature = temperature * cooling_rate
-    log('Cooling down system from ' + str(temperature) + ' to ' + str(new_temperature) + ' ..')
-    temperature = new_temperature
-    log('================')
-    log()
 
 stop = timeit.default_timer()
 
+if surrogate:
+    log(prefilter_stats.summary())
 log('Total Optimization Time: ' + str(stop - start))
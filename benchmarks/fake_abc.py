@@ -0,0 +1,323 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+A deterministic stand-in for yosys-abc and yosys, to benchmark DRiLLS without the
+real tools or designs. A network is modelled by a few numbers (inputs, outputs,
+latches, and gates, levels and a key of how it was reached) and reported in the
+formats DRiLLS parses: stime, print_stats and the yosys stat command. Each
+optimization changes the numbers as a function of the key, so a sequence always
+gives the same QoR. The netlists it writes (Verilog, BLIF, binary AIGER) are real
+files with the model in a comment, so reading them back continues from the same
+network.
+
+Usage:
+    fake_abc.py [abc] -c "<commands>"                   like yosys-abc -c
+    fake_abc.py [abc]                                   interactive, like yosys-abc reading stdin
+    fake_abc.py yosys -QT -p "read_verilog <file>; stat"
+
+Latency, in seconds, is set by environment variables:
+    FAKE_ABC_STARTUP        per launch
+    FAKE_ABC_LATENCY        per optimization, for a network of 1000 and gates
+    FAKE_ABC_MAP_LATENCY    per mapping, for a network of 1000 and gates
+"""
+
+import os
+import re
+import sys
+import math
+import time
+import hashlib
+import numpy as np
+
+STARTUP = float(os.environ.get('FAKE_ABC_STARTUP', 0))
+LATENCY = float(os.environ.get('FAKE_ABC_LATENCY', 0))
+MAP_LATENCY = float(os.environ.get('FAKE_ABC_MAP_LATENCY', 0))
+
+_header = re.compile(rb'fake-abc (\d+) (\d+) (\d+) (\d+) (\d+) (\d+)')
+
+def _key(*parts):
+    return int(hashlib.sha256(repr(parts).encode()).hexdigest()[:16], 16)
+
+def _uniform(key, salt):
+    return (_key(key, salt) % 1000000) / 1000000.0
+
+class Network:
+    """
+    the model of a network: kind is 'logic' (read from a netlist), 'aig' (strashed),
+    'scl' (mapped to the library) or 'fpga' (mapped to LUTs)
+    """
+    def __init__(self, inputs, outputs, latches, ands, levels, key, kind='logic'):
+        self.inputs, self.outputs, self.latches = inputs, outputs, latches
+        self.ands, self.levels, self.key = ands, levels, key
+        self.kind = kind
+        self.lut_size = 6
+
+    @classmethod
+    def read(cls, file_name):
+        with open(file_name, 'rb') as f:
+            content = f.read()
+        kind = 'aig' if file_name.endswith('.aig') else 'logic'
+        match = _header.search(content)
+        if match:
+            return cls(*[int(field) for field in match.groups()], kind=kind)
+        # a design not written by the stand-in gets a model derived from its contents
+        key = _key(content)
+        return cls(16 + key % 48, 8 + (key >> 8) % 32, 0, 800 + (key >> 16) % 3200, 20 + (key >> 32) % 40, key, kind)
+
+    def copy(self):
+        network = Network(self.inputs, self.outputs, self.latches, self.ands, self.levels, self.key, self.kind)
+        network.lut_size = self.lut_size
+        return network
+
+    def optimize(self, command):
+        self.key = _key(self.key, command)
+        u = _uniform(self.key, 'gain')
+        if command.startswith('balance'):
+            self.levels = max(2, self.levels - 1 - int(3 * u))
+            self.ands += int(self.ands * 0.01 * u)
+        else:
+            # mostly improving, with diminishing returns near the floor
+            floor = self.inputs + self.outputs
+            gain = (0.06 * u - 0.015) * (self.ands - floor) / self.ands
+            self.ands = max(floor, int(round(self.ands * (1 - gain))))
+            self.levels = max(2, self.levels + int(3 * _uniform(self.key, 'levels')) - 1)
+        self.kind = 'aig'
+
+    def area(self):
+        return round(self.ands * (1.8 + 0.4 * _uniform(self.key, 'area')), 2)
+
+    def delay(self):
+        return round(self.levels * (3.5 + 1.5 * _uniform(self.key, 'delay')), 2)
+
+    def luts(self):
+        return int(math.ceil(self.ands / (self.lut_size - 1.8)))
+
+    def lut_levels(self):
+        return int(math.ceil(self.levels / (self.lut_size / 2.0)))
+
+    def stats(self):
+        """
+        the print_stats line
+        """
+        line = 'top                       : i/o = {:4d}/{:4d}  lat = {:4d}  '.format(self.inputs, self.outputs, self.latches)
+        if self.kind == 'scl':
+            gates = int(self.ands * 0.6)
+            line += 'nd = {:5d}  edge = {:5d}  area = {:.2f}  delay = {:.2f}  lev = {:3d}'.format( \
+                gates, 2 * gates, self.area(), self.delay(), self.levels)
+        elif self.kind == 'fpga':
+            line += 'nd = {:5d}  edge = {:5d}  aig = {:5d}  lev = {:3d}'.format( \
+                self.luts(), self.luts() * self.lut_size, self.ands, self.lut_levels())
+        elif self.kind == 'aig':
+            line += 'and = {:5d}  lev = {:3d}'.format(self.ands, self.levels)
+        else:
+            line += 'nd = {:5d}  edge = {:5d}  cube = {:5d}  lev = {:3d}'.format( \
+                self.ands, 2 * self.ands, self.ands, self.levels)
+        return line
+
+    def stime(self):
+        return 'top                       : WireLoad = "none"  Gates = {:6d} ( 20.0 %)   Cap = {:5.1f} ff ( 10.0 %)   ' \
+            'Area = {:10.2f} ( 80.0 %)   Delay = {:8.2f} ps  ( 10.0 %)'.format( \
+                int(self.ands * 0.6), 2.0 + _uniform(self.key, 'cap'), self.area(), self.delay())
+
+    def structure(self):
+        """
+        a deterministic AIG with the modelled size and depth: gate g of level l takes one fanin from
+        level l - 1 and one from any lower level. Returns the fanin and output literals.
+        """
+        rng = np.random.RandomState(self.key % (2 ** 32))
+        ands = max(self.ands, 1)
+        levels = max(1, min(self.levels, ands))
+        sizes = np.full(levels, ands // levels)
+        sizes[:ands % levels] += 1
+        first = 1 + self.inputs + self.latches
+        starts = np.concatenate(([1, first], first + np.cumsum(sizes)))     # first variable of each level
+
+        fanin0, fanin1 = [], []
+        for level, size in enumerate(sizes, 1):
+            v0 = rng.randint(starts[level - 1], starts[level], size)
+            v1 = rng.randint(1, starts[level], size)
+            fanin0.append(2 * v0 + rng.randint(0, 2, size))
+            fanin1.append(2 * v1 + rng.randint(0, 2, size))
+        fanin0, fanin1 = np.concatenate(fanin0), np.concatenate(fanin1)
+        fanin0, fanin1 = np.maximum(fanin0, fanin1), np.minimum(fanin0, fanin1)
+
+        last = first + ands - 1
+        outputs = 2 * np.concatenate(([last], rng.randint(first, last + 1, max(self.outputs - 1, 0))))
+        return fanin0, fanin1, outputs
+
+    def header(self):
+        return 'fake-abc {} {} {} {} {} {}'.format(self.inputs, self.outputs, self.latches, self.ands, \
+            self.levels, self.key)
+
+    def write(self, file_name):
+        fanin0, fanin1, outputs = self.structure()
+        first = 1 + self.inputs + self.latches
+        if file_name.endswith('.aig'):
+            self._write_aiger(file_name, fanin0, fanin1, outputs, first)
+        elif file_name.endswith('.blif'):
+            self._write_blif(file_name, fanin0, fanin1, outputs, first)
+        else:
+            self._write_verilog(file_name, fanin0, fanin1, outputs, first)
+
+    def _name(self, variable):
+        return 'pi' + str(variable - 1) if variable <= self.inputs else 'n' + str(variable)
+
+    def _write_verilog(self, file_name, fanin0, fanin1, outputs, first):
+        def literal(l):
+            return ('~' if l & 1 else '') + self._name(l >> 1)
+        inputs = [self._name(v) for v in range(1, self.inputs + 1)]
+        names = ['po' + str(i) for i in range(len(outputs))]
+        lines = ['// ' + self.header(), 'module top (' + ', '.join(inputs + names) + ');', \
+            '  input ' + ', '.join(inputs) + ';', '  output ' + ', '.join(names) + ';', \
+            '  wire ' + ', '.join(self._name(first + g) for g in range(len(fanin0))) + ';']
+        for g, (l0, l1) in enumerate(zip(fanin0.tolist(), fanin1.tolist())):
+            lines.append('  assign ' + self._name(first + g) + ' = ' + literal(l0) + ' & ' + literal(l1) + ';')
+        for name, l in zip(names, outputs.tolist()):
+            lines.append('  assign ' + name + ' = ' + literal(l) + ';')
+        lines.append('endmodule')
+        with open(file_name, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _write_blif(self, file_name, fanin0, fanin1, outputs, first):
+        names = ['po' + str(i) for i in range(len(outputs))]
+        lines = ['# ' + self.header(), '.model top', \
+            '.inputs ' + ' '.join(self._name(v) for v in range(1, self.inputs + 1)), '.outputs ' + ' '.join(names)]
+        for g, (l0, l1) in enumerate(zip(fanin0.tolist(), fanin1.tolist())):
+            lines += ['.names ' + self._name(l0 >> 1) + ' ' + self._name(l1 >> 1) + ' ' + self._name(first + g), \
+                str(1 - (l0 & 1)) + str(1 - (l1 & 1)) + ' 1']
+        for name, l in zip(names, outputs.tolist()):
+            lines += ['.names ' + self._name(l >> 1) + ' ' + name, str(1 - (l & 1)) + ' 1']
+        lines.append('.end')
+        with open(file_name, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _write_aiger(self, file_name, fanin0, fanin1, outputs, first):
+        lhs = 2 * np.arange(first, first + len(fanin0))
+        deltas = np.stack((lhs - fanin0, fanin0 - fanin1), axis=1).ravel().tolist()
+        body = bytearray()
+        for delta in deltas:
+            while delta >= 128:
+                body.append((delta & 127) | 128)
+                delta >>= 7
+            body.append(delta)
+        header = 'aig {} {} 0 {} {}\n'.format(first - 1 + len(fanin0), self.inputs, len(outputs), len(fanin0))
+        with open(file_name, 'wb') as f:
+            f.write(header.encode() + ''.join(str(l) + '\n' for l in outputs.tolist()).encode())
+            f.write(bytes(body) + b'c\n' + self.header().encode() + b'\n')
+
+def run(commands, state):
+    """
+    runs ABC commands on the state (network, & space network, time of the last time command)
+    and returns False on quit
+    """
+    for command in commands:
+        command = command.strip()
+        if not command:
+            continue
+        name, _, arguments = command.partition(' ')
+        arguments = arguments.strip()
+        network = state['network']
+        if name == 'quit':
+            return False
+        elif name == 'echo':
+            print(arguments)
+        elif name in ('read', 'read_verilog', 'read_blif', 'read_aiger'):
+            if not arguments.endswith('.lib'):
+                state['network'] = Network.read(arguments)
+        elif name == 'write' or name.startswith('write_'):
+            network.write(arguments)
+        elif name == 'strash':
+            network.kind = 'aig'
+        elif name == 'map':
+            time.sleep(MAP_LATENCY * network.ands / 1000)
+            network.kind = 'scl'
+        elif name == 'if':
+            time.sleep(MAP_LATENCY * network.ands / 1000)
+            match = re.search(r'-K *([0-9]+)', arguments)
+            network.lut_size = int(match.group(1)) if match else 6
+            network.kind = 'fpga'
+        elif name in ('topo', 'buffer', 'upsize', 'dnsize'):
+            pass
+        elif name == 'stime':
+            print(network.stime())
+        elif name == 'print_stats':
+            print(network.stats())
+        elif name == '&get':
+            state['gia'] = network.copy()
+        elif name == '&put':
+            state['network'] = state['gia'].copy()
+        elif name == 'time':
+            now = time.time()
+            if arguments != '-c':
+                print('elapse: {:.2f} seconds, total: {:.2f} seconds'.format(now - state['time'], now - state['time']))
+            state['time'] = now
+        else:
+            # any other command is an optimization
+            time.sleep(LATENCY * network.ands / 1000)
+            network.optimize(command)
+    sys.stdout.flush()
+    return True
+
+def yosys(arguments):
+    """
+    the read_verilog and stat commands of yosys -p
+    """
+    script = arguments[arguments.index('-p') + 1]
+    counts = {'$and': 0, '$or': 0, '$not': 0}
+    wires, public_wires = 0, 0
+    for command in script.split(';'):
+        name, _, design_file = command.strip().partition(' ')
+        if name == 'read_verilog':
+            with open(design_file.strip()) as f:
+                netlist = f.read()
+            for statement in re.sub(r'//[^\n]*', '', netlist).split(';'):
+                statement = statement.strip()
+                if statement.startswith('assign'):
+                    expression = statement.split('=', 1)[1]
+                    counts['$and'] += expression.count('&')
+                    counts['$or'] += expression.count('|')
+                    counts['$not'] += expression.count('~')
+                elif statement.split(' ')[0] in ('input', 'output', 'wire'):
+                    public_wires += len(statement.split(','))
+            wires = public_wires + counts['$not']
+        elif name == 'stat':
+            print('=== top ===')
+            print('')
+            print('   Number of wires:               {:5d}'.format(wires))
+            print('   Number of wire bits:           {:5d}'.format(wires))
+            print('   Number of public wires:        {:5d}'.format(public_wires))
+            print('   Number of public wire bits:    {:5d}'.format(public_wires))
+            print('   Number of memories:                0')
+            print('   Number of memory bits:             0')
+            print('   Number of processes:               0')
+            print('   Number of cells:               {:5d}'.format(sum(counts.values())))
+            for cell, count in sorted(counts.items()):
+                if count:
+                    print('     {:30s} {:5d}'.format(cell, count))
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    tool = 'abc'
+    if arguments and arguments[0] in ('abc', 'yosys'):
+        tool = arguments.pop(0)
+    time.sleep(STARTUP)
+
+    if tool == 'yosys':
+        yosys(arguments)
+        sys.exit(0)
+
+    state = {'network': Network(0, 0, 0, 0, 0, 0), 'gia': None, 'time': time.time()}
+    if '-c' in arguments:
+        run(arguments[arguments.index('-c') + 1].split(';'), state)
+    else:
+        print('UC Berkeley, ABC 1.01 (fake)')
+        sys.stdout.flush()
+        for line in sys.stdin:
+            if not run(line.split(';'), state):
+                break
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Soak benchmark of the state normalizer: runs the observe/normalize pattern of
+A2C.train_episode for many episodes and reports the per-step latency and the
+memory held by Python every report interval. Both should stay flat.
+
+Usage: python benchmarks/normalizer_soak.py [--episodes 1000] [--iterations 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from drills.normalizer import Normalizer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Soak benchmark of the state normalizer')
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--features', type=int, default=9)
+    parser.add_argument('--report_every', type=int, default=100)
+    parser.add_argument('--keep_statistics', action='store_true', \
+        help='keep the statistics across episodes instead of resetting them')
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    normalizer = Normalizer(args.features)
+    tracemalloc.start()
+
+    print('episode, mean step latency (us), max step latency (us), traced memory (KiB), max RSS (MiB)')
+    latencies = []
+    for episode in range(1, args.episodes + 1):
+        if not args.keep_statistics:
+            normalizer.reset()
+        for _ in range(args.iterations + 1):
+            state = rng.rand(args.features) * 1000
+            start = time.perf_counter()
+            normalizer.observe(state)
+            normalizer.normalize(state)
+            latencies.append(time.perf_counter() - start)
+
+        if episode % args.report_every == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print('{}, {:.2f}, {:.2f}, {:.1f}, {:.1f}'.format(episode, np.mean(latencies) * 1e6, \
+                np.max(latencies) * 1e6, current / 1024, max_rss))
+            latencies = []
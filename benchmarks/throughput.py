@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Offline throughput benchmark of DRiLLS sessions and the greedy, simulated annealing and
+beam search baselines. ABC and yosys are replaced by the deterministic stand-in in fake_abc.py, so
+it runs anywhere and the QoR of every run is the same: the numbers measure the Python
+side (plus the configured latency of the stand-in) and catch performance regressions.
+
+For each session configuration it reports the steps per second, the episodes per hour,
+the time per step spent outside ABC, and the memory held by Python and the maximum RSS
+growth between the first and the last episode. Results can be saved as JSON and compared
+against a previous run, failing if any throughput drops by more than the tolerance.
+
+Usage: python benchmarks/throughput.py [--episodes 5] [--iterations 20] [--latency 0.01]
+                                       [--output results.json] [--compare baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from drills.scl_session import SCLSession
+from drills.fpga_session import FPGASession
+
+OPTIMIZATIONS = ['rewrite', 'rewrite -z', 'refactor', 'refactor -z', 'resub', 'resub -z', 'balance']
+
+# session configurations: the params that differ from plain subprocess sessions
+CONFIGURATIONS = {
+    'subprocess': {},
+    'incremental': {'incremental': True},
+    'persistent': {'abc_engine': 'persistent'},
+    'aiger_features': {'incremental': True, 'feature_extractor': 'aiger', 'extended_features': True},
+    'transposition_table': {'abc_engine': 'persistent', 'transposition_table': True},
+    'result_cache': {'incremental': True, 'result_cache': 'result_cache.db'},
+}
+
+def setup(work_dir, args):
+    """
+    puts yosys-abc and yosys wrappers of the stand-in in work_dir/bin, a design and a library
+    in work_dir, and returns the environment to run them with
+    """
+    bin_dir = os.path.join(work_dir, 'bin')
+    os.makedirs(bin_dir)
+    fake_abc = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_abc.py')
+    for name, tool in [('yosys-abc', 'abc'), ('yosys', 'yosys')]:
+        wrapper = os.path.join(bin_dir, name)
+        with open(wrapper, 'w') as f:
+            f.write('#!/bin/sh\nexec "{}" "{}" {} "$@"\n'.format(sys.executable, fake_abc, tool))
+        os.chmod(wrapper, 0o755)
+
+    with open(os.path.join(work_dir, 'design.v'), 'w') as f:
+        f.write('// benchmark design ' + str(args.design_seed) + '\n')
+    with open(os.path.join(work_dir, 'tech.lib'), 'w') as f:
+        f.write('library (benchmark) { }\n')
+
+    env = dict(os.environ)
+    env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+    env['FAKE_ABC_STARTUP'] = str(args.startup_latency)
+    env['FAKE_ABC_LATENCY'] = str(args.latency)
+    env['FAKE_ABC_MAP_LATENCY'] = str(args.map_latency)
+    return env
+
+def session_params(work_dir, name, configuration, args):
+    params = {
+        'abc_binary': os.path.join(work_dir, 'bin', 'yosys-abc'),
+        'yosys_binary': os.path.join(work_dir, 'bin', 'yosys'),
+        'abc_timeout': 60,
+        'design_file': os.path.join(work_dir, 'design.v'),
+        'mapping': {'clock_period': 150, 'library_file': os.path.join(work_dir, 'tech.lib')},
+        'fpga_mapping': {'levels': 100, 'lut_inputs': 6},
+        'optimizations': OPTIMIZATIONS,
+        'playground_dir': os.path.join(work_dir, 'playground', name),
+        'iterations': args.iterations,
+        'incremental': False,
+        'profile': True,
+    }
+    params.update(configuration)
+    if 'result_cache' in params:
+        params['result_cache'] = os.path.join(work_dir, params['result_cache'])
+    return params
+
+def benchmark_session(session_class, params, args):
+    """
+    runs the episodes with random actions and returns the measurements
+    """
+    rng = np.random.RandomState(args.seed)
+    session = session_class(params)
+    steps, abc_time = 0, 0.0
+    memory, max_rss = [], []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(args.episodes):
+        session.reset()
+        done = False
+        while not done:
+            _, _, done, _ = session.step(rng.randint(len(OPTIMIZATIONS)))
+            steps += 1
+        abc_time += session.profiler.times.get('abc_process', (0.0, 0))[0]
+        memory.append(tracemalloc.get_traced_memory()[0])
+        max_rss.append(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    wall_time = time.perf_counter() - start
+    tracemalloc.stop()
+    del session
+
+    return {
+        'steps_per_second': steps / wall_time,
+        'episodes_per_hour': args.episodes / wall_time * 3600,
+        'overhead_per_step_ms': (wall_time - abc_time) / steps * 1000,
+        'memory_growth_kib': (memory[-1] - memory[0]) / 1024,
+        'max_rss_growth_mib': (max_rss[-1] - max_rss[0]) / 1024,
+    }
+
+def benchmark_baseline(script, data, work_dir, env, name):
+    """
+    runs a baseline script on the stand-in and returns its run time
+    """
+    run_dir = os.path.join(work_dir, name)
+    os.makedirs(run_dir)
+    data_file = os.path.join(run_dir, 'data.yml')
+    with open(data_file, 'w') as f:
+        json.dump(data, f)      # JSON is valid YAML
+    start = time.perf_counter()
+    subprocess.check_output([sys.executable, os.path.join(ROOT, 'baseline', script), data_file], \
+        cwd=run_dir, env=env, stderr=subprocess.STDOUT)
+    return {'seconds': time.perf_counter() - start}
+
+def baseline_data(work_dir, args):
+    return {
+        'design_file': os.path.join(work_dir, 'design.v'),
+        'output_dir': 'result',
+        'mapping': {'clock_period': 150, 'library_file': os.path.join(work_dir, 'tech.lib')},
+        'iterations': args.iterations,
+        'optimizations': OPTIMIZATIONS,
+        'post_mapping_commands': ['buffer'],
+        'simulated_annealing': {'initial_temp': 0.2, 'cooling_rate': 0.5},
+        'beam_width': 2,
+        'result_cache': None,
+    }
+
+def compare(results, previous, tolerance):
+    """
+    prints the throughput changes against a previous run and returns the regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        for metric, value in result.items():
+            if name not in previous or metric not in previous[name]:
+                continue
+            old = previous[name][metric]
+            # throughput should not drop, times should not grow
+            higher_is_better = metric.endswith('_per_second') or metric.endswith('_per_hour')
+            if metric not in ('seconds', 'overhead_per_step_ms') and not higher_is_better:
+                continue
+            change = (value - old) / old if old else 0.0
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            print('{:22s} {:22s} {:12.2f} -> {:12.2f} ({:+.1%}){}'.format(name, metric, old, value, change, \
+                '  REGRESSION' if regressed else ''))
+            if regressed:
+                regressions.append((name, metric))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline throughput benchmark of DRiLLS with a fake ABC')
+    parser.add_argument('--episodes', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--mapping', choices=['scl', 'fpga'], default='scl')
+    parser.add_argument('--configurations', nargs='+', choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS))
+    parser.add_argument('--baselines', action='store_true', help='also time the greedy, SA and beam search baselines')
+    parser.add_argument('--latency', type=float, default=0.0, \
+        help='seconds the stand-in spends per optimization of 1000 and gates')
+    parser.add_argument('--map_latency', type=float, default=0.0, \
+        help='seconds the stand-in spends per mapping of 1000 and gates')
+    parser.add_argument('--startup_latency', type=float, default=0.0, \
+        help='seconds the stand-in spends starting up')
+    parser.add_argument('--design_seed', type=int, default=0, help='picks the modelled design')
+    parser.add_argument('--seed', type=int, default=0, help='seeds the random actions')
+    parser.add_argument('--output', help='saves the results as JSON')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, \
+        help='relative throughput drop reported as a regression')
+    parser.add_argument('--keep', action='store_true', help='keeps the work directory')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='drills-benchmark-')
+    env = setup(work_dir, args)
+    # the sessions launch the stand-in with the environment of this process
+    os.environ.update(env)
+    session_class = FPGASession if args.mapping == 'fpga' else SCLSession
+
+    results = {}
+    try:
+        print('configuration, steps/s, episodes/h, overhead/step (ms), memory growth (KiB), max RSS growth (MiB)')
+        for name in args.configurations:
+            params = session_params(work_dir, name, CONFIGURATIONS[name], args)
+            result = benchmark_session(session_class, params, args)
+            results[name] = result
+            print('{}, {:.2f}, {:.1f}, {:.2f}, {:.1f}, {:.1f}'.format(name, result['steps_per_second'], \
+                result['episodes_per_hour'], result['overhead_per_step_ms'], result['memory_growth_kib'], \
+                    result['max_rss_growth_mib']))
+
+        if args.baselines:
+            data = baseline_data(work_dir, args)
+            for name, script, evaluation in [('greedy', os.path.join('greedy', 'greedy.py'), 'parallel'), \
+                    ('greedy_fan_out', os.path.join('greedy', 'greedy.py'), 'fan_out'), \
+                    ('simulated_annealing', os.path.join('simulated-annealing', 'simulated-annealing.py'), None), \
+                    ('beam_search', os.path.join('beam-search', 'beam-search.py'), None)]:
+                data['evaluation'] = evaluation
+                results[name] = benchmark_baseline(script, data, work_dir, env, name)
+                print('{}: {:.2f} seconds'.format(name, results[name]['seconds']))
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            print('Work directory: ' + work_dir)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(results, previous, args.tolerance):
+            sys.exit(1)
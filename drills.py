@@ -12,7 +12,13 @@ import argparse
 import datetime
 import numpy as np
 import time
+import signal
 from drills.model import A2C
+from drills.actor_learner import ActorLearner
+from drills.inference import optimize_designs
+from drills.mcts import MCTS
+from drills.scl_session import SCLSession
+from drills.fpga_session import FPGASession
 from drills.fixed_optimization import optimize_with_fixed_script
 from pyfiglet import Figlet
 
@@ -36,15 +42,31 @@ if __name__ == '__main__':
         help="Loads a saved Tensorflow model")
     parser.add_argument("-s", "--fixed_script", type=open, \
         help="Executes a fixed optimization script before DRiLLS")
-    parser.add_argument("mode", type=str, choices=['train', 'optimize'], \
-        help="Use the design to train the model or only optimize it")
+    parser.add_argument("mode", type=str, choices=['train', 'optimize', 'mcts'], \
+        help="Use the design to train the model, only optimize it, or optimize it by tree search")
     parser.add_argument("mapping", type=str, choices=['scl', 'fpga'], \
         help="Map to standard cell library or FPGA")
     parser.add_argument("params", type=open, nargs='?', default='params.yml', \
         help="Path to the params.yml file")
+    parser.add_argument("-d", "--designs", type=str, nargs='+', \
+        help="Designs to optimize, or to train one policy on (defaults to designs, or the design_file, in params)")
+    parser.add_argument("-k", "--top_k", type=int, default=1, \
+        help="Picks the most likely action (1) or samples among the k most likely ones when optimizing")
+    parser.add_argument("-r", "--rollouts", type=int, default=1, \
+        help="Number of policy rollouts per design when optimizing")
+    parser.add_argument("-j", "--jobs", type=int, \
+        help="Number of sessions run in parallel when optimizing (defaults to the number of CPUs)")
+    parser.add_argument("-o", "--output_dir", type=str, default='optimized', \
+        help="Directory of the optimized scripts (<design>_drills.tcl)")
+    parser.add_argument("-n", "--simulations", type=int, \
+        help="Number of tree search simulations (defaults to mcts.simulations in params)")
+    parser.add_argument("-b", "--abc_budget", type=int, \
+        help="Stops the tree search after this many ABC runs (defaults to mcts.abc_budget in params)")
     args = parser.parse_args()
     
     options = yaml.load(args.params, Loader=yaml.FullLoader)
+    # the evaluation store records which mode explored each sequence
+    options.setdefault('evaluation_source', 'drills ' + args.mode)
 
     f = Figlet(font='slant')
     print(f.renderText('DRiLLS'))
@@ -61,24 +83,67 @@ if __name__ == '__main__':
         log('Starting to train the agent ..')
         
         all_rewards = []
-        learner = A2C(options, load_model=args.load_model, fpga_mapping=fpga_mapping)
         training_start_time = time.time()
-        for i in range(options['episodes']):
-            log('Episode: ' + str(i+1))
-            start = time.time()
-            total_reward = learner.train_episode()
-            end = time.time()
-            all_rewards.append(total_reward)
-            log('Episode: ' + str(i) + ' - done with total reward = ' + str(total_reward))
-            log('Episode ' + str(i) + ' Run Time ~ ' + str((start - end) / 60) + ' minutes.')
-            print('')
+        # several designs train one policy on the episodes of actors spread over them
+        designs = args.designs or options.get('designs') or []
+        if len(designs) == 1:
+            options['design_file'] = designs[0]
+        options['designs'] = designs
+        # actor processes play the episodes while the learner trains on them
+        asynchronous = bool(options.get('actor_learner', {}).get('actors')) or len(designs) > 1
+        learner = A2C(options, load_model=args.load_model, fpga_mapping=fpga_mapping, learner=asynchronous)
+        # a preempted (SIGTERM) training takes its final checkpoint like an interrupted one
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            # a new agent first learns from the best sequences known for the design
+            if options.get('warm_start_episodes') and options.get('evaluation_store') and not args.load_model:
+                log('Warm starting from ' + options['evaluation_store'] + ' ..')
+                learner.warm_start(options, options['warm_start_episodes'])
+            # a training resumed from a checkpoint with its state runs the remaining episodes
+            if asynchronous:
+                all_rewards = ActorLearner(learner, options).train(options['episodes'] - learner.episode)
+            else:
+                for i in range(learner.episode, options['episodes']):
+                    log('Episode: ' + str(i+1))
+                    start = time.time()
+                    total_reward = learner.train_episode()
+                    end = time.time()
+                    if total_reward is not None:
+                        all_rewards.append(total_reward)
+                    log('Episode: ' + str(i) + ' - done with total reward = ' + str(total_reward))
+                    log('Episode ' + str(i) + ' Run Time ~ ' + str((end - start) / 60) + ' minutes.')
+                    print('')
+        except KeyboardInterrupt:
+            log('Training interrupted')
+        finally:
+            # the final checkpoint
+            learner.close()
         training_end_time = time.time()
         log('Total Training Run Time ~ ' + str((training_end_time - training_start_time) / 60) + ' minutes.')
     
         mean_reward = np.mean(all_rewards[-100:])
     elif args.mode == 'optimize':
         log('Starting agent to optimize')
-        learner = A2C(options, load_model=True)
-        for _ in range(options['iterations']):
-            # TODO: iteratively run the optimizer
-            pass
\ No newline at end of file
+        learner = A2C(options, load_model=True, fpga_mapping=fpga_mapping, inference=True)
+        designs = args.designs or [options['design_file']]
+        start = time.time()
+        results = optimize_designs(learner, options, designs, top_k=args.top_k, rollouts=args.rollouts, \
+            jobs=args.jobs, output_dir=args.output_dir)
+        end = time.time()
+        for design_file in designs:
+            if design_file not in results:
+                log(design_file + ': no improving sequence found')
+        log('Optimized ' + str(len(designs)) + ' designs in ~ ' + str((end - start) / 60) + ' minutes.')
+    elif args.mode == 'mcts':
+        log('Starting tree search to optimize')
+        settings = options.get('mcts', {})
+        # with a trained model, its actor gives the priors and its critic evaluates the leaves
+        agent = A2C(options, load_model=True, fpga_mapping=fpga_mapping, inference=True) if args.load_model else None
+        search = MCTS(FPGASession if fpga_mapping else SCLSession, options, agent=agent, jobs=args.jobs)
+        start = time.time()
+        result = search.search(args.simulations or settings.get('simulations', 1000), \
+            args.abc_budget or settings.get('abc_budget'), output_dir=args.output_dir)
+        end = time.time()
+        if result is None:
+            log('No improving sequence found')
+        log('Tree search Run Time ~ ' + str((end - start) / 60) + ' minutes.')
@@ -10,13 +10,33 @@ A package to manage DRiLLS implementation; utilizing ABC and Tensorflow
 
 Classes:
 --------
+Session: the base class of the logic synthesis environments below
 SCLSession: to manage the logic synthesis environment when using a standard cell library
 FPGASession: to manage the logic synthesis environment when using FPGAs
+VecSession: steps several copies of a session in parallel worker processes
+ABCEngine: a persistent ABC process that keeps the library and the network loaded
+Executor: runs the ABC and yosys subprocesses with timeouts, retries and the stderr of failures kept
+ResultCache: a persistent content-addressed cache of evaluated sequences
+EvaluationStore: a persistent, indexed store of every evaluated sequence, its QoR and the algorithm that found it
+Surrogate: a learned model of the effect of each optimization, to prefilter the optimizations worth running
+TranspositionTable: maps structural hashes of optimized AIGs to their QoR and features
 A2C: contains the deep neural network model (Advantage Actor Critic)
+Normalizer: running statistics used to normalize the states fed to the model
+MCTS: Monte Carlo tree search over the optimization sequences of a session
+ActorLearner: trains the A2C model asynchronously on the episodes of actor processes
+DesignScheduler: spreads the actors of a multi-design training over the designs by their step cost
+Checkpointer: takes checkpoints of the model by policy and writes them in the background
+Playground: keeps, compresses or deletes the networks written by the steps of a session
+LogWriter: buffers log records and writes them in batches as CSV, JSON lines or gzipped JSON lines
+Profiler: accumulates the time spent in each phase of an episode
 
 Helpers:
 --------
 yosys_stats: extract design metrics using yosys
 abc_stats: extract design metrics using ABC
 extract_features: extract design features used as input to the model
+extract_step_features: extract the same features from the output of the ABC step that wrote the design
+extract_aiger_features: extract the features (and extended ones) from a binary AIGER file in-process
+read_aiger: read an AIGER file into an AIG held in NumPy arrays
+optimize_designs: roll a trained policy out on many designs in parallel and write their best scripts
 """
\ No newline at end of file
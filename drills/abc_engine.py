@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import re
+import pty
+import time
+import select
+import datetime
+from subprocess import Popen, PIPE
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+class ABCEngineError(Exception):
+    """
+    Raised when a batch of commands crashes or times out the ABC engine
+    """
+    pass
+
+class ABCEngine:
+    """
+    A long-lived ABC process that takes commands over stdin and keeps the library
+    and the current network loaded between calls. The output of each batch of
+    commands is delimited by echoing a sentinel after it.
+    """
+    prompt = re.compile(rb'abc \d+> ')
+    escape = re.compile(rb'\x1b\[[0-9;]*[A-Za-z]')
+
+    def __init__(self, abc_binary, startup_commands=None, timeout=None):
+        self.abc_binary = abc_binary
+        self.startup_commands = startup_commands or []
+        self.timeout = timeout
+        self.restarts = 0
+
+        self.proc = None
+        self.fd = None
+        self.buffer = b''
+        self.sentinel_id = 0
+
+        self.start()
+
+    def __del__(self):
+        self.close()
+
+    def start(self):
+        """
+        starts ABC and runs the startup commands (e.g. reading the library), waiting for them even if there
+        are none so that the banner ABC prints does not end up in the output of the first batch
+        """
+        # ABC block-buffers a piped stdout, so it writes to a pseudo terminal instead
+        master, slave = pty.openpty()
+        self.proc = Popen([self.abc_binary], stdin=PIPE, stdout=slave, stderr=slave, close_fds=True)
+        os.close(slave)
+        self.fd = master
+        self.buffer = b''
+        self._execute(self.startup_commands, self.timeout)
+
+    def close(self):
+        """
+        quits ABC, killing it if it does not exit by itself
+        """
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                try:
+                    self.proc.stdin.write(b'quit\n')
+                    self.proc.stdin.flush()
+                    self.proc.wait(timeout=1)
+                except Exception:
+                    self.proc.kill()
+                    self.proc.wait()
+            self.proc.stdin.close()
+            self.proc = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def restart(self):
+        self.close()
+        self.restarts += 1
+        self.start()
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def ping(self, timeout=5):
+        """
+        health check: returns True if ABC answers a no-op within the timeout
+        """
+        if not self.is_alive():
+            return False
+        try:
+            self._execute([], timeout)
+            return True
+        except ABCEngineError:
+            return False
+
+    def run(self, commands, timeout=None):
+        """
+        runs a list of ABC commands and returns their output (as bytes, like check_output).
+        On a crash or a timeout, ABC is restarted and ABCEngineError is raised; the caller
+        has to reload its network since the state of the old process is lost.
+        """
+        if not self.is_alive():
+            log('ABC engine is not running, restarting it ..')
+            self.restart()
+        try:
+            return self._execute(commands, timeout or self.timeout)
+        except ABCEngineError:
+            self.restart()
+            raise
+
+    def _execute(self, commands, timeout):
+        self.sentinel_id += 1
+        sentinel = ('DRILLS_DONE_' + str(self.sentinel_id)).encode()
+        script = ('; '.join(commands) + '\n') if commands else ''
+        script += 'echo ' + sentinel.decode() + '\n'
+        try:
+            self.proc.stdin.write(script.encode())
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ABCEngineError('ABC engine died: ' + str(e))
+
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            end = self.buffer.find(sentinel + b'\r\n')
+            if end < 0:
+                end = self.buffer.find(sentinel + b'\n')
+            if end >= 0:
+                output = self.buffer[:end]
+                self.buffer = self.buffer[self.buffer.index(b'\n', end) + 1:]
+                return self._clean(output)
+
+            remaining = deadline - time.time() if deadline else None
+            if remaining is not None and remaining <= 0:
+                raise ABCEngineError('ABC engine timed out after ' + str(timeout) + 's running: ' + '; '.join(commands))
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                continue
+            try:
+                chunk = os.read(self.fd, 65536)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                raise ABCEngineError('ABC engine exited while running: ' + '; '.join(commands) + \
+                    '\n' + self._clean(self.buffer[-2000:]).decode('utf-8', 'replace'))
+            self.buffer += chunk
+
+    def _clean(self, output):
+        """
+        drops prompts, terminal escapes and blank lines from the output of ABC
+        """
+        output = self.escape.sub(b'', output.replace(b'\r\n', b'\n'))
+        output = self.prompt.sub(b'', output)
+        lines = [line for line in output.split(b'\n') if line.strip()]
+        return b'\n'.join(lines) + b'\n' if lines else b''
@@ -0,0 +1,331 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import copy
+import time
+import queue
+import datetime
+import numpy as np
+import multiprocessing
+from .normalizer import Normalizer
+from .log_writer import log_path, LogWriter
+from .scheduler import DesignScheduler, design_name
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+def actor_probabilities(weights, states):
+    """
+    evaluates the actor network (fully connected ReLU layers and a softmax) in NumPy,
+    given its weights and biases in the order of the actor's variables
+    """
+    hidden = states
+    for layer in range(0, len(weights), 2):
+        hidden = hidden.dot(weights[layer]) + weights[layer + 1]
+        if layer + 2 < len(weights):
+            hidden = np.maximum(hidden, 0)
+    hidden = np.exp(hidden - hidden.max(axis=-1, keepdims=True))
+    return hidden / hidden.sum(axis=-1, keepdims=True)
+
+class SharedWeights:
+    """
+    The actor's weights in shared memory: the learner publishes a new version after every update,
+    the actors read the latest one before each episode
+    """
+    def __init__(self, context, shapes):
+        self.shapes = shapes
+        self.lock = context.Lock()
+        self.version = context.Value('i', 0, lock=False)
+        self.buffer = context.RawArray('d', int(sum(np.prod(shape) for shape in shapes)))
+
+    def publish(self, weights):
+        flat = np.concatenate([np.ravel(w) for w in weights])
+        with self.lock:
+            np.frombuffer(self.buffer, dtype=np.float64)[:] = flat
+            self.version.value += 1
+
+    def read(self):
+        """
+        returns (version, weights)
+        """
+        with self.lock:
+            version = self.version.value
+            flat = np.frombuffer(self.buffer, dtype=np.float64).copy()
+        weights, offset = [], 0
+        for shape in self.shapes:
+            size = int(np.prod(shape))
+            weights.append(flat[offset:offset + size].reshape(shape))
+            offset += size
+        return version, weights
+
+def _play(session, normalizer, weights, rng, stop, keep_normalizer_statistics=False):
+    """
+    plays an episode with the policy of the given weights and returns its normalized states, actions,
+    rewards and behaviour probabilities of the actions, or None if the design could not be evaluated
+    """
+    state = session.reset()
+    if state is None:
+        return None
+    if not keep_normalizer_statistics:
+        normalizer.reset()
+    normalizer.observe(state)
+    states, actions, rewards, behaviour = [normalizer.normalize(state)], [], [], []
+    done = False
+    while not done and not stop.is_set():
+        probabilities = actor_probabilities(weights, states[-1].reshape([1, -1])).ravel()
+        probabilities /= probabilities.sum()
+        action = rng.choice(len(probabilities), p=probabilities)
+        new_state, reward, done, _ = session.step(action)
+        if new_state is None:
+            # the step failed: the trajectory ends with the last successful step
+            break
+        actions.append(action)
+        rewards.append(reward)
+        behaviour.append(probabilities[action])
+        normalizer.observe(new_state)
+        states.append(normalizer.normalize(new_state))
+    return states, actions, rewards, behaviour
+
+def _actor(index, session_class, params, session_states, normalizer_statistics, shared_weights, scheduler, \
+        trajectories, stop):
+    """
+    runs episodes with the latest published policy, on its own session of the design the scheduler
+    assigns (the design_file without a scheduler), and puts the trajectories on the queue with the
+    statistics of the normalizer they were normalized with. The normalizer starts from the learner's
+    """
+    design_files = scheduler.design_files if scheduler else [params['design_file']]
+    session_states = session_states or {}
+    sessions = {}
+    normalizer = Normalizer(len(normalizer_statistics['mean']))
+    normalizer.load_statistics(normalizer_statistics)
+    keep_normalizer_statistics = params.get('keep_normalizer_statistics', False)
+    # every actor samples its own actions
+    rng = np.random.RandomState()
+    try:
+        while shared_weights.version.value == 0 and not stop.is_set():
+            time.sleep(0.1)
+        while not stop.is_set():
+            version, weights = shared_weights.read()
+            design = scheduler.acquire() if scheduler else 0
+            if design is None:
+                log('Actor ' + str(index) + ': none of the designs could be evaluated')
+                break
+            design_file = design_files[design]
+            start, episode = time.time(), None
+            try:
+                if design not in sessions:
+                    session_params = params
+                    if scheduler:
+                        session_params = copy.deepcopy(params)
+                        session_params['design_file'] = design_file
+                        session_params['playground_dir'] = os.path.join(params['playground_dir'], \
+                            design_name(design_file))
+                    sessions[design] = session_class(session_params)
+                    if session_states.get(design_file):
+                        sessions[design].restore_training_state(session_states[design_file])
+                session = sessions[design]
+                episode = _play(session, normalizer, weights, rng, stop, keep_normalizer_statistics)
+            finally:
+                if scheduler:
+                    scheduler.release(design, time.time() - start, len(episode[2]) if episode else 0)
+            if episode is None:
+                log('Actor ' + str(index) + ': ' + design_file + ' could not be evaluated' + \
+                    (', dropping it' if scheduler else ''))
+                if not scheduler:
+                    break
+                # the other actors skip it too; this one moves on to another design
+                scheduler.drop(design)
+                del sessions[design]
+                continue
+
+            states, actions, rewards, behaviour = episode
+            if not actions or stop.is_set():
+                continue
+            session_states[design_file] = session.training_state()
+            best, _, meets_constraint = session.best_result()
+            # the last state is not acted on
+            trajectories.put({'actor': index, 'version': version, 'design': design, \
+                'states': np.array(states[:-1]), 'actions': np.array(actions), 'rewards': np.array(rewards), \
+                'behaviour': np.array(behaviour), 'normalizer': normalizer.statistics(), \
+                'times': dict(session.profiler.times), 'seconds': time.time() - start, \
+                'qor': session._log_metrics(), 'best': list(best[:2]), 'meets_constraint': meets_constraint, \
+                'session_states': dict(session_states)})
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sessions.clear()
+
+class ActorLearner:
+    """
+    Asynchronous training on a single host: actor processes run their own sessions with the latest
+    published policy (evaluated in NumPy) and stream their episodes to the learner through a queue.
+    The learner trains the A2C model on them and publishes the new weights to shared memory.
+    Episodes played by a policy a few updates old are corrected by truncated importance weights,
+    older ones are dropped. Given several designs, a DesignScheduler spreads the actors over them and
+    all their episodes train the one policy; the QoR of every design is logged to a file of its own.
+    """
+    def __init__(self, agent, options):
+        settings = options.get('actor_learner', {})
+        self.agent = agent
+        self.options = options
+        self.design_files = options.get('designs') or [options['design_file']]
+        self.num_actors = settings.get('actors') or len(self.design_files)
+        self.batch_episodes = settings.get('batch_episodes', 1)
+        self.max_policy_lag = settings.get('max_policy_lag', 4)
+        self.importance_clip = settings.get('importance_clip', 1.0)
+
+        # spawned, not forked: the learner's Tensorflow runtime is not fork-safe
+        context = multiprocessing.get_context('spawn')
+        weights = agent.actor_weights()
+        self.weights = SharedWeights(context, [w.shape for w in weights])
+        self.weights.publish(weights)
+        self.trajectories = context.Queue(settings.get('queue_size', 2 * self.num_actors))
+        self.stop = context.Event()
+        self.scheduler = None
+        if len(self.design_files) > 1:
+            self.scheduler = DesignScheduler(context, self.design_files, settings.get('cost_smoothing', 0.2))
+
+        # the QoR curve of every design: its episodes' total reward, final and best known metrics
+        metrics = agent.game_class.log_header.split(', ')[2:4]
+        columns = ['episode', 'design_episode', 'actor', 'total_reward'] + metrics + \
+            ['best ' + metric for metric in metrics] + ['best_meets_constraint', 'seconds_per_step']
+        qor_dir = settings.get('qor_dir') or os.path.join(options['playground_dir'], 'qor')
+        self.qor_logs = [LogWriter(log_path(os.path.join(qor_dir, design_name(design_file)), \
+            options.get('log_format', 'csv')), columns, flush_seconds=options.get('log_flush_seconds', 5.0)) \
+                for design_file in self.design_files]
+        self.design_rewards = [[] for _ in self.design_files]
+
+        # the actors of a resumed training continue from the training state of their sessions,
+        # those of a synchronous training being sessions of the design_file
+        agent.session_states = [{options['design_file']: states} if states and 'episode' in states else states \
+            for states in agent.session_states]
+        agent.session_states += [None] * (self.num_actors - len(agent.session_states))
+        self.processes = []
+        for i in range(self.num_actors):
+            params = copy.deepcopy(options)
+            params['playground_dir'] = os.path.join(options['playground_dir'], 'actor-' + str(i))
+            process = context.Process(target=_actor, args=(i, agent.game_class, params, agent.session_states[i], \
+                agent.normalizer.statistics(), self.weights, self.scheduler, self.trajectories, self.stop), daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def __del__(self):
+        self.close()
+
+    def train(self, episodes):
+        """
+        trains on the given number of episodes played by the actors and returns their total rewards
+        """
+        all_rewards, dropped = [], 0
+        try:
+            while len(all_rewards) < episodes:
+                update_start = time.time()
+                batch, size = [], min(self.batch_episodes, episodes - len(all_rewards))
+                while len(batch) < size:
+                    trajectory = self._receive()
+                    actor = trajectory['actor']
+                    self.agent.session_states[actor] = trajectory['session_states']
+                    lag = self.weights.version.value - trajectory['version']
+                    if lag > self.max_policy_lag:
+                        dropped += 1
+                        log('Dropped an episode of actor ' + str(actor) + ' played by a policy ' + str(lag) + \
+                            ' updates old')
+                        continue
+                    batch.append(trajectory)
+                    all_rewards.append(float(np.sum(trajectory['rewards'])))
+                    self._log_qor(len(all_rewards), trajectory)
+                    log('Episode: ' + str(len(all_rewards)) + ' (' + \
+                        design_name(self.design_files[trajectory['design']]) + ', actor ' + str(actor) + \
+                        ', policy lag ' + str(lag) + ') - done with total reward = ' + str(all_rewards[-1]))
+
+                self._update(batch)
+                self.weights.publish(self.agent.actor_weights())
+                self.agent.checkpoint(np.mean([np.sum(trajectory['rewards']) for trajectory in batch]))
+                if self.agent.profile_writer:
+                    self.agent.write_profile(time.time() - update_start)
+        finally:
+            self.close()
+        if dropped:
+            log('Dropped ' + str(dropped) + ' stale episodes')
+        self._log_designs()
+        return all_rewards
+
+    def _log_qor(self, episode, trajectory):
+        design = trajectory['design']
+        rewards = self.design_rewards[design]
+        rewards.append(float(np.sum(trajectory['rewards'])))
+        self.qor_logs[design].write([episode, len(rewards), trajectory['actor'], rewards[-1]] + \
+            list(trajectory['qor']) + list(trajectory['best']) + [trajectory['meets_constraint'], \
+                round(trajectory['seconds'] / len(trajectory['actions']), 4)])
+
+    def _log_designs(self):
+        """
+        logs the episodes, recent mean reward and step cost of every design
+        """
+        if self.scheduler is None:
+            return
+        for design, (design_file, _, _, cost) in enumerate(self.scheduler.allocation()):
+            rewards = self.design_rewards[design]
+            log(design_name(design_file) + ': ' + str(len(rewards)) + ' episodes, mean reward of the last 10 = ' + \
+                str(np.mean(rewards[-10:]) if rewards else None) + ', ~ ' + str(round(cost, 2)) + ' seconds per step')
+
+    def _receive(self):
+        while True:
+            try:
+                return self.trajectories.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self.processes):
+                    raise RuntimeError('All actors exited')
+
+    def _update(self, batch):
+        """
+        trains the agent on a batch of episodes, weighting each step by the truncated ratio of
+        the current policy's probability of its action to the probability the actor sampled it with
+        """
+        agent = self.agent
+        states, actions, discounted, weights = [], [], [], []
+        for trajectory in batch:
+            episode_states, episode_actions = trajectory['states'], trajectory['actions']
+            # the states are normalized by the actor: the learner's normalizer, saved with the model for
+            # inference, takes the statistics they were normalized with
+            agent.normalizer.load_statistics(trajectory['normalizer'])
+            with agent.profiler.phase('policy'):
+                probabilities = agent.action_probabilities(episode_states)
+            current = probabilities[np.arange(len(episode_actions)), episode_actions]
+            weights.append(np.minimum(self.importance_clip, current / np.maximum(trajectory['behaviour'], 1e-8)))
+            states.append(episode_states)
+            one_hot = np.zeros((len(episode_actions), agent.num_actions))
+            one_hot[np.arange(len(episode_actions)), episode_actions] = 1
+            actions.append(one_hot)
+            discounted.append(agent.discount_and_normalize_rewards(trajectory['rewards']))
+            agent.profiler.merge(trajectory['times'])
+
+        with agent.profiler.phase('train'):
+            agent.update(np.concatenate(states), np.concatenate(actions), np.concatenate(discounted), \
+                np.concatenate(weights))
+        agent.episode += len(batch)
+
+    def close(self):
+        for qor_log in getattr(self, 'qor_logs', []):
+            qor_log.close()
+        if not self.processes:
+            return
+        self.stop.set()
+        # unblock the actors waiting to put an episode on a full queue
+        deadline = time.time() + 10
+        while any(process.is_alive() for process in self.processes) and time.time() < deadline:
+            try:
+                self.trajectories.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
+        self.processes = []
@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import hashlib
+import numpy as np
+
+def _mix(x):
+    """
+    splitmix64 finalizer over uint64 arrays (wrapping arithmetic)
+    """
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+class AIG:
+    """
+    An and-inverter graph read from an AIGER file and held in NumPy arrays.
+    Variables are numbered as in AIGER: 0 is the constant, then the inputs,
+    the latches and the and gates in topological order. A literal is
+    2 * variable + complemented.
+    """
+    def __init__(self, num_inputs, latches, outputs, fanin0, fanin1):
+        self.num_inputs = num_inputs
+        self.num_latches = len(latches)
+        self.num_outputs = len(outputs)
+        self.num_ands = len(fanin0)
+        self.num_variables = 1 + self.num_inputs + self.num_latches + self.num_ands
+
+        self.latches = latches      # next state literal of each latch
+        self.outputs = outputs      # literal of each output
+        self.fanin0 = fanin0        # literals of the and gates' fanins
+        self.fanin1 = fanin1
+
+        self.levels = self._compute_levels()
+
+    def _compute_levels(self):
+        """
+        levels of all variables in one topological sweep (inputs and latches are at level 0)
+        """
+        levels = [0] * self.num_variables
+        first_and = 1 + self.num_inputs + self.num_latches
+        for i, (v0, v1) in enumerate(zip((self.fanin0 >> 1).tolist(), (self.fanin1 >> 1).tolist())):
+            levels[first_and + i] = 1 + max(levels[v0], levels[v1])
+        return np.array(levels, dtype=np.int64)
+
+    def and_levels(self):
+        return self.levels[1 + self.num_inputs + self.num_latches:]
+
+    def depth(self):
+        """
+        the number of levels seen from the outputs and the latch inputs
+        """
+        sinks = np.concatenate((self.outputs, self.latches)) >> 1
+        return int(self.levels[sinks].max()) if len(sinks) else 0
+
+    def fanouts(self):
+        """
+        the number of fanouts of each variable (and gate fanins, outputs and latch inputs)
+        """
+        sinks = np.concatenate((self.fanin0, self.fanin1, self.outputs, self.latches)) >> 1
+        return np.bincount(sinks, minlength=self.num_variables)
+
+    def complemented_edges(self):
+        """
+        the number of complemented and gate fanins and complemented outputs
+        """
+        return int(np.sum(self.fanin0 & 1) + np.sum(self.fanin1 & 1) + np.sum(self.outputs & 1))
+
+    def reconvergences(self):
+        """
+        the number of and gates whose two fanins reconverge within one level, i.e. one fanin
+        feeds the other or both share a fanin
+        """
+        first_and = 1 + self.num_inputs + self.num_latches
+        # fanin variables of every variable, -1 (distinct for each side) for inputs and latches
+        children0 = np.full(self.num_variables, -1, dtype=np.int64)
+        children1 = np.full(self.num_variables, -1, dtype=np.int64)
+        children0[first_and:] = self.fanin0 >> 1
+        children1[first_and:] = self.fanin1 >> 1
+
+        v0, v1 = self.fanin0 >> 1, self.fanin1 >> 1
+        a0, a1 = children0[v0], children1[v0]
+        b0, b1 = children0[v1], children1[v1]
+        shared = ((a0 >= 0) & ((a0 == b0) | (a0 == b1))) | ((a1 >= 0) & ((a1 == b0) | (a1 == b1)))
+        nested = (v0 == b0) | (v0 == b1) | (v1 == a0) | (v1 == a1)
+        return int(np.sum((shared | nested) & (v0 != v1)))
+
+    def structural_hash(self):
+        """
+        a canonical hash of the structure seen from the outputs and the latch inputs: it does not
+        depend on how the and gates are numbered, so structurally identical AIGs hash the same.
+        Gate hashes are computed bottom-up one level at a time, with the two fanins sorted.
+        """
+        first_and = 1 + self.num_inputs + self.num_latches
+        hashes = np.zeros(self.num_variables, dtype=np.uint64)
+        hashes[1:first_and] = _mix(np.arange(1, first_and, dtype=np.uint64))
+
+        def edge_hashes(literals):
+            return _mix(hashes[literals >> 1] + (literals & 1).astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+
+        and_levels = self.and_levels()
+        order = np.argsort(and_levels, kind='stable')
+        boundaries = np.searchsorted(and_levels[order], np.arange(1, and_levels.max() + 2)) if self.num_ands else []
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            gates = order[start:end]
+            e0, e1 = edge_hashes(self.fanin0[gates]), edge_hashes(self.fanin1[gates])
+            low, high = np.minimum(e0, e1), np.maximum(e0, e1)
+            hashes[first_and + gates] = _mix(low * np.uint64(0x100000001B3) ^ _mix(high))
+
+        sinks = np.concatenate((edge_hashes(self.outputs), edge_hashes(self.latches)))
+        header = np.array([self.num_inputs, self.num_latches, self.num_outputs], dtype=np.uint64)
+        return hashlib.sha256(header.tobytes() + sinks.tobytes()).hexdigest()
+
+def _decode(data, count):
+    """
+    decodes the first count 7-bit variable-length unsigned integers of the AIGER binary section
+    """
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    terminators = np.flatnonzero(data < 128)
+    if len(terminators) < count:
+        raise ValueError('AIGER file is truncated')
+    end = terminators[count - 1] + 1
+    data = data[:end].astype(np.int64)
+    starts = np.concatenate(([0], terminators[:count - 1] + 1))
+    group = np.repeat(np.arange(count), np.diff(np.concatenate((starts, [end]))))
+    shifts = 7 * (np.arange(end) - starts[group])
+    return np.add.reduceat((data & 127) << shifts, starts)
+
+def read_aiger(file_name):
+    """
+    reads a binary (aig) or ASCII (aag) AIGER file
+    """
+    with open(file_name, 'rb') as f:
+        content = f.read()
+
+    position = content.index(b'\n') + 1
+    header = content[:position].split()
+    file_format = header[0]
+    M, I, L, O, A = [int(field) for field in header[1:6]]
+    B, C = [int(field) for field in header[6:8]] + [0] * (2 - len(header[6:8]))
+    if any(int(field) for field in header[8:]):
+        raise ValueError('justice and fairness properties are not supported')
+
+    def read_lines(count):
+        nonlocal position
+        lines = []
+        for _ in range(count):
+            end = content.index(b'\n', position)
+            lines.append(content[position:end].split())
+            position = end + 1
+        return lines
+
+    if file_format == b'aag':
+        read_lines(I)
+        latches = np.array([int(line[1]) for line in read_lines(L)], dtype=np.int64)
+        outputs = np.array([int(line[0]) for line in read_lines(O)], dtype=np.int64)
+        read_lines(B + C)
+        ands = np.array([[int(literal) for literal in line[:3]] for line in read_lines(A)], dtype=np.int64)
+        ands = ands.reshape(A, 3)
+        # ASCII files may list the and gates in any order
+        ands = ands[np.argsort(ands[:, 0])]
+        if A and not np.array_equal(ands[:, 0] >> 1, np.arange(I + L + 1, I + L + 1 + A)):
+            raise ValueError('ASCII AIGER variables must be numbered inputs, latches then and gates')
+        fanin0, fanin1 = np.maximum(ands[:, 1], ands[:, 2]), np.minimum(ands[:, 1], ands[:, 2])
+    elif file_format == b'aig':
+        latches = np.array([int(line[0]) for line in read_lines(L)], dtype=np.int64)
+        outputs = np.array([int(line[0]) for line in read_lines(O)], dtype=np.int64)
+        read_lines(B + C)
+        deltas = _decode(np.frombuffer(content, dtype=np.uint8, offset=position), 2 * A).reshape(A, 2)
+        lhs = 2 * np.arange(I + L + 1, I + L + 1 + A, dtype=np.int64)
+        fanin0 = lhs - deltas[:, 0]
+        fanin1 = fanin0 - deltas[:, 1]
+    else:
+        raise ValueError('unknown AIGER format: ' + file_format.decode('utf-8', 'replace'))
+
+    if M != I + L + A:
+        raise ValueError('AIGER header M must equal I + L + A')
+
+    return AIG(I, latches, outputs, fanin0, fanin1)
@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import glob
+import time
+import datetime
+import threading
+import tensorflow as tf
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+def latest_checkpoint(model_dir):
+    """
+    the path of the latest checkpoint taken of model_dir (model_dir-<episode>),
+    or model_dir itself for a model saved without an episode
+    """
+    state = tf.train.get_checkpoint_state(os.path.dirname(model_dir))
+    if state and state.model_checkpoint_path.startswith(model_dir + '-'):
+        return state.model_checkpoint_path
+    return model_dir
+
+class Checkpointer:
+    """
+    Decides when to checkpoint the model (every N episodes, every T minutes and/or when the
+    episode reward beats the best so far) and writes the checkpoints on a background thread.
+    The variables are copied into a shadow graph of their own, so training goes on while a
+    snapshot is written; a snapshot taken while another is still being written replaces it.
+    The last keep checkpoints are kept, with their sidecar files (e.g. the normalizer statistics).
+    """
+    def __init__(self, session, model_dir, settings):
+        self.session = session
+        self.model_dir = model_dir
+        self.every_episodes = settings.get('every_episodes', 1)
+        self.every_minutes = settings.get('every_minutes')
+        self.on_best_reward = settings.get('on_best_reward', False)
+        self.keep = settings.get('keep', 5)
+
+        self.variables = tf.global_variables()
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.placeholders, assigns, var_list = [], [], {}
+            for variable in self.variables:
+                shadow = tf.Variable(tf.zeros(variable.shape, variable.dtype.base_dtype), trainable=False)
+                placeholder = tf.placeholder(variable.dtype.base_dtype, variable.shape)
+                assigns.append(shadow.assign(placeholder))
+                self.placeholders.append(placeholder)
+                var_list[variable.op.name] = shadow
+            self.assign = tf.group(*assigns)
+            self.saver = tf.train.Saver(var_list, max_to_keep=self.keep)
+        self.shadow_session = tf.Session(graph=self.graph)
+
+        # continue rotating the checkpoints of a previous run
+        state = tf.train.get_checkpoint_state(os.path.dirname(model_dir))
+        if state:
+            self.saver.recover_last_checkpoints([path for path in state.all_model_checkpoint_paths \
+                if path.startswith(model_dir + '-')])
+
+        self.last_episode = None
+        self.last_time = time.time()
+        self.best_reward = None
+
+        self.pending = None
+        self.writing = False
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def should_save(self, episode, reward=None):
+        """
+        whether the policy asks for a checkpoint after this episode
+        """
+        improved = reward is not None and (self.best_reward is None or reward > self.best_reward)
+        if improved:
+            self.best_reward = float(reward)
+        if self.on_best_reward and improved:
+            return True
+        if self.every_episodes and episode - (self.last_episode or 0) >= self.every_episodes:
+            return True
+        if self.every_minutes and time.time() - self.last_time >= self.every_minutes * 60:
+            return True
+        return False
+
+    def save(self, episode, sidecars=(), wait=False):
+        """
+        snapshots the variables and has them written as model_dir-<episode>, along with the sidecars:
+        (suffix, function writing a snapshot to a path) pairs, written to model_dir-<episode><suffix>
+        """
+        values = self.session.run(self.variables)
+        with self.condition:
+            self.pending = (episode, values, list(sidecars))
+            self.condition.notify_all()
+        self.last_episode = episode
+        self.last_time = time.time()
+        if wait:
+            self.wait()
+
+    def wait(self):
+        """
+        blocks until the pending snapshot is written
+        """
+        with self.condition:
+            while self.pending is not None or self.writing:
+                self.condition.wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.wait()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.shadow_session.close()
+
+    def _write_loop(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                (episode, values, sidecars), self.pending = self.pending, None
+                self.writing = True
+            try:
+                self._write(episode, values, sidecars)
+            except Exception as e:
+                log('Checkpoint of episode ' + str(episode) + ' failed: ' + str(e))
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.condition.notify_all()
+
+    def _write(self, episode, values, sidecars):
+        start = time.time()
+        # the sidecars go first: a checkpoint becomes the latest only once it is complete
+        path = self.model_dir + '-' + str(episode)
+        for suffix, write in sidecars:
+            write(path + suffix)
+        self.shadow_session.run(self.assign, feed_dict=dict(zip(self.placeholders, values)))
+        self.saver.save(self.shadow_session, self.model_dir, global_step=episode)
+
+        # remove the sidecars of the checkpoints the saver rotated out
+        kept = set(self.saver.last_checkpoints)
+        for suffix, _ in sidecars:
+            for sidecar in glob.glob(glob.escape(self.model_dir) + '-*' + suffix):
+                if sidecar[:-len(suffix)] not in kept:
+                    os.remove(sidecar)
+        log('Model saved in path: ' + path + ' (~ ' + str(round(time.time() - start, 2)) + ' seconds in the background)')
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+from .result_cache import ResultCache, file_hash
+
+# the QoR columns; a session or baseline fills those of its mapping
+METRICS = ['area', 'delay', 'luts', 'levels']
+
+class EvaluationStore:
+    """
+    A persistent SQLite store of every sequence evaluated by the sessions and baselines: the design
+    (content hash and name), the library and mapping, the sequence, its QoR (area and delay, or LUTs
+    and levels), its features, the wall time of the evaluation and the algorithm (source) that
+    explored it. Indexed on the design and the QoR, so the best known sequences of a design are a
+    query away. Records are buffered and inserted in batches; a sequence is recorded once per source.
+    """
+    def __init__(self, path, source='drills', buffer_size=100):
+        self.path = path
+        self.source = source
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS evaluations (key TEXT, source TEXT, ' + \
+            'design_hash TEXT, design_name TEXT, library_hash TEXT, mapping TEXT, sequence TEXT, length INTEGER, ' + \
+            'area REAL, delay REAL, luts REAL, levels REAL, features TEXT, seconds REAL, created REAL, ' + \
+            'PRIMARY KEY (key, source))')
+        for design in ['design_hash', 'design_name']:
+            for metrics in ['delay, area', 'levels, luts']:
+                self.connection.execute('CREATE INDEX IF NOT EXISTS evaluations_' + design + '_' + \
+                    metrics.replace(', ', '_') + ' ON evaluations (' + design + ', ' + metrics + ')')
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if getattr(self, 'connection', None) is None:
+            return
+        self.flush()
+        self.connection.close()
+        self.connection = None
+
+    def record(self, design_file, library_file, mapping, sequence, metrics, features=None, seconds=None):
+        """
+        adds an evaluation of the sequence on the design: metrics maps some of METRICS to their values,
+        mapping describes the mapping commands (and anything else that changes the result)
+        """
+        key = ResultCache.key(design_file, library_file, mapping, sequence)
+        self.buffer.append((key, self.source, file_hash(design_file), \
+            os.path.splitext(os.path.basename(design_file))[0], file_hash(library_file), mapping, \
+            '; '.join(sequence), len(sequence)) + tuple(metrics.get(metric) for metric in METRICS) + \
+            (json.dumps([float(x) for x in features]) if features is not None else None, seconds, time.time()))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        with self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.executemany('INSERT OR IGNORE INTO evaluations VALUES (' + \
+                ', '.join(['?'] * 15) + ')', self.buffer)
+        self.buffer = []
+
+    def best(self, design, metric='area', max_delay=None, max_levels=None, source=None, limit=1, \
+            library_file=None, mapping=None):
+        """
+        the evaluations of the design (a design file, the hash of its contents or its name) of lowest metric,
+        among those meeting the delay or levels constraint if given, the other metric breaking ties. Given a
+        library file and a mapping description, only the evaluations with that library and mapping count.
+        Returns them as dicts, their sequence as a list of commands.
+        """
+        self.flush()
+        if os.path.isfile(design):
+            conditions, values = ['design_hash = ?'], [file_hash(design)]
+        else:
+            conditions, values = ['(design_hash = ? OR design_name = ?)'], [design, design]
+        conditions.append(metric + ' IS NOT NULL')
+        if max_delay is not None:
+            conditions.append('delay <= ?')
+            values.append(max_delay)
+        if max_levels is not None:
+            conditions.append('levels <= ?')
+            values.append(max_levels)
+        if source:
+            conditions.append('source = ?')
+            values.append(source)
+        if library_file:
+            conditions.append('library_hash = ?')
+            values.append(file_hash(library_file))
+        if mapping:
+            conditions.append('mapping = ?')
+            values.append(mapping)
+        other = {'area': 'delay', 'delay': 'area', 'luts': 'levels', 'levels': 'luts'}[metric]
+        cursor = self.connection.execute('SELECT * FROM evaluations WHERE ' + ' AND '.join(conditions) + \
+            ' ORDER BY ' + metric + ', ' + other + ' LIMIT ?', values + [limit])
+        columns = [column[0] for column in cursor.description]
+        return [self._result(dict(zip(columns, row))) for row in cursor.fetchall()]
+
+    def evaluations(self, design=None, with_features=False):
+        """
+        iterates over the evaluations (of the design, if given; with features only, if asked) as dicts
+        """
+        self.flush()
+        conditions, values = ['1'], []
+        if design and os.path.isfile(design):
+            conditions, values = ['design_hash = ?'], [file_hash(design)]
+        elif design:
+            conditions, values = ['(design_hash = ? OR design_name = ?)'], [design, design]
+        if with_features:
+            conditions.append('features IS NOT NULL')
+        cursor = self.connection.execute('SELECT * FROM evaluations WHERE ' + ' AND '.join(conditions), values)
+        columns = [column[0] for column in cursor.description]
+        for row in cursor:
+            yield self._result(dict(zip(columns, row)))
+
+    @staticmethod
+    def _result(result):
+        result['sequence'] = result['sequence'].split('; ')
+        result['features'] = json.loads(result['features']) if result['features'] else None
+        return result
+
+    def stats(self):
+        """
+        the number of evaluations of every source
+        """
+        self.flush()
+        return dict(self.connection.execute('SELECT source, COUNT(*) FROM evaluations GROUP BY source').fetchall())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Queries the best known sequences of a design')
+    parser.add_argument('store', help='Path to the evaluation store')
+    parser.add_argument('design', help='Design file, design name (e.g. adder) or hash of the design contents')
+    parser.add_argument('-m', '--metric', choices=METRICS, default='area', help='QoR to minimize')
+    parser.add_argument('--max_delay', type=float, help='Keeps the sequences meeting this delay')
+    parser.add_argument('--max_levels', type=int, help='Keeps the sequences meeting this number of levels')
+    parser.add_argument('--source', help='Keeps the sequences explored by this algorithm, e.g. greedy')
+    parser.add_argument('-n', '--limit', type=int, default=1, help='Number of sequences')
+    parser.add_argument('--library', help='Keeps the sequences mapped with this library file')
+    parser.add_argument('--mapping', help='Keeps the sequences of this mapping, e.g. "map -D 150; topo; stime"')
+    args = parser.parse_args()
+
+    store = EvaluationStore(args.store)
+    for result in store.best(args.design, args.metric, args.max_delay, args.max_levels, args.source, args.limit, \
+            args.library, args.mapping):
+        print(', '.join(metric + ': ' + str(result[metric]) for metric in METRICS if result[metric] is not None) + \
+            ' (' + result['source'] + ', ' + result['design_name'] + ')')
+        print('; '.join(result['sequence']))
+    store.close()
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import time
+import signal
+import datetime
+from subprocess import Popen, PIPE, TimeoutExpired
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+class ExecutionError(Exception):
+    """
+    Raised when a command fails on every attempt: it exited with an error, timed out or printed
+    output its check rejected. Holds the command, the reason and the tail of its stderr and stdout.
+    """
+    def __init__(self, command, reason, attempts, stderr=b'', stdout=b''):
+        self.command = command
+        self.reason = reason
+        self.attempts = attempts
+        self.stderr = stderr or b''
+        self.stdout = stdout or b''
+        message = ' '.join(command) + ' failed after ' + str(attempts) + ' attempt(s): ' + reason
+        for name, output in [('stderr', self.stderr), ('stdout', self.stdout)]:
+            if output.strip():
+                message += '\n' + name + ': ' + output[-1000:].decode('utf-8', 'replace').strip()
+        super().__init__(message)
+
+    def __reduce__(self):
+        # raised in the worker processes of parallel runs, so it has to survive pickling
+        return ExecutionError, (self.command, self.reason, self.attempts, self.stderr, self.stdout)
+
+def _kill(proc):
+    """
+    kills the process and anything it started, as it runs in a process group of its own
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+
+class Executor:
+    """
+    Runs the ABC and yosys subprocesses of the sessions and baselines: kills a run that exceeds its
+    timeout, retries a failed run (a non-zero exit, a timeout or output the caller's check rejects)
+    up to retries times after retry_delay seconds (doubling every retry), and keeps its stderr for
+    the error it finally raises, so a bad invocation fails alone instead of hanging or killing a run.
+    """
+    def __init__(self, timeout=None, retries=0, retry_delay=1.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.calls, self.retried, self.timeouts, self.failures = 0, 0, 0, 0
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        the executor configured by the executor section of the params (or a baseline's data.yml)
+        """
+        settings = params.get('executor') or {}
+        return cls(settings.get('timeout'), settings.get('retries', 0), settings.get('retry_delay', 1.0))
+
+    def run(self, command, check=None, timeout=None):
+        """
+        runs the command (a list of arguments) and returns its stdout (as bytes, like check_output).
+        check, if given, is called on the stdout and raises on output it does not expect.
+        Raises ExecutionError once every attempt failed.
+        """
+        timeout = timeout or self.timeout
+        self.calls += 1
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                log('Retrying (' + str(attempt) + ' of ' + str(self.retries) + ') ' + command[0] + ', which ' + reason)
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+            # a missing binary is not worth retrying
+            proc = Popen(command, stdout=PIPE, stderr=PIPE, start_new_session=True)
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except TimeoutExpired:
+                _kill(proc)
+                stdout, stderr = proc.communicate()
+                self.timeouts += 1
+                reason = 'timed out after ' + str(timeout) + 's'
+                continue
+            except BaseException:
+                _kill(proc)
+                proc.wait()
+                raise
+
+            if proc.returncode != 0:
+                reason = 'exited with ' + str(proc.returncode)
+                continue
+            if check:
+                try:
+                    check(stdout)
+                except Exception as e:
+                    reason = 'printed unexpected output (' + type(e).__name__ + ': ' + str(e) + ')'
+                    continue
+            return stdout
+
+        self.failures += 1
+        raise ExecutionError(command, reason, self.retries + 1, stderr, stdout)
+
+    def stats(self):
+        return {'calls': self.calls, 'retried': self.retried, 'timeouts': self.timeouts, 'failures': self.failures}
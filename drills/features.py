@@ -10,82 +10,144 @@ import re
 import numpy as np
 import datetime
 from multiprocessing import Process, Manager
-from subprocess import check_output
 from collections import defaultdict
+from .aiger import read_aiger
+from .executor import Executor
 
 def log(message):
     print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
 
-def yosys_stats(design_file, yosys_binary, stats):
+def yosys_stats(design_file, yosys_binary, stats, executor=None):
     yosys_command = "read_verilog " + design_file + "; stat"
     try:
-        proc = check_output([yosys_binary, '-QT', '-p', yosys_command])
-        lines = proc.decode("utf-8").split('\n')
-        for line in lines:
-            if 'Number of wires' in line:
-                stats['number_of_wires'] = int(line.strip().split()[-1])
-            if 'Number of public wires' in line:
-                stats['number_of_public_wires'] = int(line.strip().split()[-1])
-            if 'Number of cells' in line:
-                stats['number_of_cells'] = float(line.strip().split()[-1])
-            if '$and' in line:
-                stats['ands'] = float(line.strip().split()[-1])
-            if '$or' in line:
-                stats['ors'] = float(line.strip().split()[-1])
-            if '$not' in line:
-                stats['nots'] = float(line.strip().split()[-1])
-        
-        # catch some design special cases
-        if 'ands' not in stats:
-            stats['ands'] = 0.0
-        if 'ors' not in stats:
-            stats['ors'] = 0.0
-        if 'nots' not in stats:
-            stats['nots'] = 0.0
+        proc = (executor or Executor()).run([yosys_binary, '-QT', '-p', yosys_command])
+        parse_yosys_stats(proc, stats)
     except Exception as e:
         print(e)
         return None
     return stats
 
-def abc_stats(design_file, abc_binary, stats):    
+def parse_yosys_stats(yosys_output, stats):
+    '''
+    Parses the wire and cell counts of a yosys stat output into stats
+    '''
+    lines = yosys_output.decode("utf-8").split('\n')
+    for line in lines:
+        if 'Number of wires' in line:
+            stats['number_of_wires'] = int(line.strip().split()[-1])
+        if 'Number of public wires' in line:
+            stats['number_of_public_wires'] = int(line.strip().split()[-1])
+        if 'Number of cells' in line:
+            stats['number_of_cells'] = float(line.strip().split()[-1])
+        if '$and' in line:
+            stats['ands'] = float(line.strip().split()[-1])
+        if '$or' in line:
+            stats['ors'] = float(line.strip().split()[-1])
+        if '$not' in line:
+            stats['nots'] = float(line.strip().split()[-1])
+
+    # catch some design special cases
+    if 'ands' not in stats:
+        stats['ands'] = 0.0
+    if 'ors' not in stats:
+        stats['ors'] = 0.0
+    if 'nots' not in stats:
+        stats['nots'] = 0.0
+    return stats
+
+def abc_stats(design_file, abc_binary, stats, executor=None):    
     abc_command = "read_verilog " + design_file + "; print_stats"
     try:
-        proc = check_output([abc_binary, '-c', abc_command])
-        lines = proc.decode("utf-8").split('\n')
-        for line in lines:
-            if 'i/o' in line:
-                ob = re.search(r'i/o *= *[0-9]+ */ *[0-9]+', line)
-                stats['input_pins'] = int(ob.group().split('=')[1].strip().split('/')[0].strip())
-                stats['output_pins'] = int(ob.group().split('=')[1].strip().split('/')[1].strip())
-        
-                ob = re.search(r'edge *= *[0-9]+', line)
-                stats['edges'] = int(ob.group().split('=')[1].strip())
-
-                ob = re.search(r'lev *= *[0-9]+', line)
-                stats['levels'] = int(ob.group().split('=')[1].strip())
-
-                ob = re.search(r'lat *= *[0-9]+', line)
-                stats['latches'] = int(ob.group().split('=')[1].strip())
+        proc = (executor or Executor()).run([abc_binary, '-c', abc_command])
+        parse_abc_stats(proc, stats)
     except Exception as e:
         print(e)
         return None
     
     return stats
 
-def extract_features(design_file, yosys_binary='yosys', abc_binary='abc'):
+def parse_abc_stats(abc_output, stats):
+    '''
+    Parses the (last) print_stats line of an ABC output into stats
+    '''
+    lines = [line for line in abc_output.decode("utf-8").split('\n') if 'i/o' in line]
+    if lines:
+        line = lines[-1]
+        ob = re.search(r'i/o *= *[0-9]+ */ *[0-9]+', line)
+        stats['input_pins'] = int(ob.group().split('=')[1].strip().split('/')[0].strip())
+        stats['output_pins'] = int(ob.group().split('=')[1].strip().split('/')[1].strip())
+
+        ob = re.search(r'edge *= *[0-9]+', line)
+        stats['edges'] = int(ob.group().split('=')[1].strip())
+
+        ob = re.search(r'lev *= *[0-9]+', line)
+        stats['levels'] = int(ob.group().split('=')[1].strip())
+
+        ob = re.search(r'lat *= *[0-9]+', line)
+        stats['latches'] = int(ob.group().split('=')[1].strip())
+    return stats
+
+def netlist_stats(design_file, stats):
+    '''
+    Estimates the cells yosys would create when reading the Verilog netlist written by ABC
+    (one cell per operator of the assign statements), without launching yosys. An approximation
+    of yosys stat, used only by the opt-in 'netlist' feature extractor
+    '''
+    with open(design_file) as f:
+        netlist = f.read()
+    netlist = re.sub(r'//[^\n]*|/\*.*?\*/', '', netlist, flags=re.S)
+
+    stats['ands'], stats['ors'], stats['nots'], others = 0.0, 0.0, 0.0, 0.0
+    for statement in netlist.split(';'):
+        statement = statement.strip()
+        if not statement.startswith('assign'):
+            continue
+        expression = statement.split('=', 1)[1]
+        stats['ands'] += expression.count('&')
+        stats['ors'] += expression.count('|')
+        stats['nots'] += expression.count('~')
+        others += expression.count('^') + expression.count('?')
+    stats['number_of_cells'] = stats['ands'] + stats['ors'] + stats['nots'] + others
+    return stats
+
+def extract_features(design_file, yosys_binary='yosys', abc_binary='abc', executor=None):
     '''
     Returns features of a given circuit as a tuple.
     Features are listed below
     '''
     manager = Manager()
     stats = manager.dict()
-    p1 = Process(target=yosys_stats, args=(design_file, yosys_binary, stats))
-    p2 = Process(target=abc_stats, args=(design_file, abc_binary, stats))
+    p1 = Process(target=yosys_stats, args=(design_file, yosys_binary, stats, executor))
+    p2 = Process(target=abc_stats, args=(design_file, abc_binary, stats, executor))
     p1.start()
     p2.start()
     p1.join()
     p2.join()
 
+    return features_from_stats(stats)
+
+def extract_step_features(design_file, abc_output, yosys_binary=None, executor=None):
+    '''
+    Returns the same features as extract_features, taking the i/o, edge, level and latch stats
+    from the print_stats already in the output of the ABC step that wrote the design, and the
+    gate types from yosys stat on the written netlist (run with the executor, which raises
+    ExecutionError if it fails). Without a yosys binary, the gate types are estimated from the
+    netlist by netlist_stats instead and no process is launched.
+    '''
+    stats = {}
+    parse_abc_stats(abc_output, stats)
+    if yosys_binary:
+        yosys_command = "read_verilog " + design_file + "; stat"
+        parse_yosys_stats((executor or Executor()).run([yosys_binary, '-QT', '-p', yosys_command]), stats)
+    else:
+        netlist_stats(design_file, stats)
+
+    return features_from_stats(stats)
+
+def features_from_stats(stats):
+    '''
+    Builds the feature vector from the collected design stats
+    '''
     # normalized features
     features = defaultdict(float)    
     
@@ -111,4 +173,40 @@ def extract_features(design_file, yosys_binary='yosys', abc_binary='abc'):
     return np.array([features['input_pins'], features['output_pins'], \
         features['number_of_nodes'], features['number_of_edges'], \
             features['number_of_levels'], features['number_of_latches'], \
-                features['percentage_of_ands'], features['percentage_of_ors'], features['percentage_of_nots']])
\ No newline at end of file
+                features['percentage_of_ands'], features['percentage_of_ors'], features['percentage_of_nots']])
+
+def extract_aiger_features(aig_file, extended=False):
+    '''
+    Returns features of the AIG saved (as binary AIGER) by a step, computed in-process.
+    The first 9 are the AIG counterparts of the features above: ABC writes each and gate
+    as one & with its complemented fanins as ~, so there are no ors. The extended
+    features add the fanout histogram, the level distribution and the reconvergences.
+    '''
+    aig = read_aiger(aig_file)
+
+    stats = {}
+    stats['input_pins'] = aig.num_inputs
+    stats['output_pins'] = aig.num_outputs
+    stats['edges'] = 2 * aig.num_ands
+    stats['levels'] = aig.depth()
+    stats['latches'] = aig.num_latches
+    stats['ands'] = float(aig.num_ands)
+    stats['ors'] = 0.0
+    stats['nots'] = float(aig.complemented_edges())
+    stats['number_of_cells'] = max(stats['ands'] + stats['nots'], 1.0)
+    features = features_from_stats(stats)
+    if not extended:
+        return features
+
+    # (6) - fanout histogram: fractions of the nodes with 0, 1, 2, 3, 4-7 and 8+ fanouts
+    fanouts = aig.fanouts()[1:]
+    fanout_histogram = np.histogram(fanouts, bins=[0, 1, 2, 3, 4, 8, np.inf])[0] / max(len(fanouts), 1)
+
+    # (7) - level distribution: fractions of the and gates in each quarter of the depth
+    depth = max(aig.depth(), 1)
+    level_distribution = np.histogram(aig.and_levels(), bins=4, range=(1, depth + 1))[0] / max(aig.num_ands, 1)
+
+    # (8) - number of reconvergences
+    reconvergences = [aig.reconvergences()]
+
+    return np.concatenate((features, fanout_histogram, level_distribution, reconvergences))
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import copy
+import datetime
+import numpy as np
+from .vec_session import VecSession
+from .normalizer import Normalizer
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+def choose_actions(probabilities, top_k=1):
+    """
+    picks an action for each row of probabilities: the most likely one when top_k is 1,
+    otherwise one sampled among the top_k most likely ones
+    """
+    if top_k <= 1:
+        return list(np.argmax(probabilities, axis=1))
+    actions = []
+    for p in probabilities:
+        candidates = np.argsort(p)[::-1][:top_k]
+        actions.append(np.random.choice(candidates, p=p[candidates] / np.sum(p[candidates])))
+    return actions
+
+def optimize_designs(agent, options, design_files, top_k=1, rollouts=1, jobs=None, output_dir='optimized'):
+    """
+    rolls the trained policy of the agent out on every design (rollouts times each), running up to jobs
+    sessions concurrently and evaluating the policy on all their states at once every step.
+    Writes the best script of each design to output_dir/<design>_drills.tcl and returns
+    {design_file: (best record, best sequence)}
+    """
+    jobs = jobs or os.cpu_count()
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    tasks = []
+    for design_file in design_files:
+        design_name = os.path.splitext(os.path.basename(design_file))[0]
+        for rollout in range(rollouts):
+            params = copy.deepcopy(options)
+            params['design_file'] = design_file
+            params['playground_dir'] = os.path.join(options['playground_dir'], 'optimize', design_name, \
+                'rollout-' + str(rollout))
+            tasks.append(params)
+
+    best = {}
+    for start in range(0, len(tasks), jobs):
+        batch = tasks[start:start + jobs]
+        log('Optimizing ' + ', '.join(sorted(set(os.path.basename(params['design_file']) for params in batch))) + ' ..')
+        games = VecSession(agent.game_class, options, env_params=batch)
+        try:
+            for i, result in enumerate(_rollout(agent, games, top_k)):
+                design_file = batch[i]['design_file']
+                if result is None:
+                    log('The design ' + design_file + ' could not be evaluated, skipping the rollout')
+                    continue
+                record, sequence, meets_constraint = result
+                if sequence and (design_file not in best or better_result(record, meets_constraint, *best[design_file][::2])):
+                    best[design_file] = (record, sequence, meets_constraint)
+                    write_script(games.call_one(i, 'script', sequence), design_file, record, output_dir)
+        finally:
+            games.close()
+
+    return {design_file: result[:2] for design_file, result in best.items()}
+
+def _rollout(agent, games, top_k):
+    """
+    runs one episode on every environment and returns their best results, None for the environments
+    whose design could not be evaluated (which are dropped from the rollout)
+    """
+    normalizers = []
+    for _ in range(games.num_envs):
+        normalizer = Normalizer(agent.state_size)
+        if agent.keep_normalizer_statistics:
+            normalizer.restore(agent.normalizer_file)
+        normalizers.append(normalizer)
+
+    states = games.reset()
+    evaluated = [i for i in range(games.num_envs) if states[i] is not None]
+    states = np.array([state if state is not None else np.zeros(agent.state_size) for state in states])
+    for i in evaluated:
+        normalizers[i].observe(states[i])
+        states[i] = normalizers[i].normalize(states[i])
+
+    active = evaluated
+    while active:
+        actions = choose_actions(agent.action_probabilities(states[active]), top_k)
+        still_active = []
+        for i, (new_state, _, done, _) in zip(active, games.step(actions, active)):
+            normalizers[i].observe(new_state)
+            states[i] = normalizers[i].normalize(new_state)
+            if not done:
+                still_active.append(i)
+        active = still_active
+
+    return [result if i in evaluated else None for i, result in enumerate(games.call('best_result'))]
+
+def better_result(record, meets_constraint, other, other_meets_constraint):
+    """
+    compares two best records (optimized metric, constrained metric, episode, iteration): meeting the
+    constraint comes first, then the optimized metric if both meet it, or the constrained one if none does
+    """
+    if meets_constraint != other_meets_constraint:
+        return meets_constraint
+    if meets_constraint:
+        return (record[0], record[1]) < (other[0], other[1])
+    return (record[1], record[0]) < (other[1], other[0])
+
+def write_script(script, design_file, record, output_dir):
+    design_name = os.path.splitext(os.path.basename(design_file))[0]
+    script_file = os.path.join(output_dir, design_name + '_drills.tcl')
+    with open(script_file, 'w') as f:
+        f.write(script)
+    log(design_name + ': ' + str(record[0]) + ', ' + str(record[1]) + ' -> ' + script_file)
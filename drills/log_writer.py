@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import gzip
+import json
+import time
+
+# the file extension of each log format
+LOG_FORMATS = {'csv': '.csv', 'jsonl': '.jsonl', 'jsonl.gz': '.jsonl.gz'}
+
+def log_path(base, log_format='csv'):
+    """
+    the path of a log in the given format, e.g. log_path('playground/1/log', 'jsonl') is playground/1/log.jsonl
+    """
+    if log_format not in LOG_FORMATS:
+        raise ValueError('unknown log format: ' + str(log_format))
+    return base + LOG_FORMATS[log_format]
+
+class LogWriter:
+    """
+    Buffers log records and writes them in batches: once buffer_size of them are waiting or
+    flush_seconds have passed since the last write, and when closed. Records are rows of the
+    columns, written as CSV (', ' separated, as the logs always were), JSON lines (.jsonl) or
+    gzipped JSON lines (.jsonl.gz) depending on the file name; a log without columns takes lines of text.
+    """
+    def __init__(self, path, columns=None, header=True, mode='w', buffer_size=1000, flush_seconds=5.0):
+        self.path = path
+        self.columns = columns
+        self.jsonl = columns is not None and (path.endswith('.jsonl') or path.endswith('.jsonl.gz'))
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self.buffer = []
+        self.last_flush = time.time()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.output = gzip.open(path, mode + 't') if path.endswith('.gz') else open(path, mode)
+        if columns is not None and header and not self.jsonl and self.output.tell() == 0:
+            # not buffered, so that buffer_size counts records; it reaches the file with the first batch
+            self.output.write(', '.join(columns) + '\n')
+
+    def __del__(self):
+        self.close()
+
+    def write(self, record):
+        """
+        adds a record: a list of values in the order of the columns, or a line of a text log
+        """
+        if self.columns is None:
+            self.buffer.append(str(record) + '\n')
+        elif self.jsonl:
+            self.buffer.append(json.dumps(dict(zip(self.columns, record))) + '\n')
+        else:
+            self.buffer.append(', '.join(map(str, record)) + '\n')
+        if len(self.buffer) >= self.buffer_size or time.time() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.output is None:
+            return
+        if self.buffer:
+            self.output.write(''.join(self.buffer))
+            self.buffer = []
+        self.output.flush()
+        self.last_flush = time.time()
+
+    def close(self):
+        if getattr(self, 'output', None) is None:
+            return
+        self.flush()
+        self.output.close()
+        self.output = None
@@ -0,0 +1,289 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import json
+import math
+import datetime
+import numpy as np
+from .vec_session import VecSession
+from .result_cache import file_hash
+from .inference import better_result, write_script
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+class Node:
+    """
+    A node of the search tree: the sequence of optimizations leading to it from the root.
+    reward is the (shaped) reward of the step into the node and state its features, once
+    the node has been evaluated; value is the sum of the returns backed up through it.
+    """
+    __slots__ = ('prior', 'visits', 'value', 'reward', 'state', 'evaluated', 'children')
+
+    def __init__(self, prior=1.0):
+        self.prior = prior
+        self.visits = 0
+        self.value = 0.0
+        self.reward = 0.0
+        self.state = None
+        self.evaluated = False
+        self.children = {}
+
+    def q(self):
+        return self.value / self.visits if self.visits else 0.0
+
+class MCTS:
+    """
+    Monte Carlo tree search over the sequences of optimizations of a session, rewarded by the
+    session's own reward shaping. Every batch, one leaf per worker is selected (PUCT, with a
+    virtual loss on the selected path so the workers spread over the tree) and all of them are
+    simulated in parallel on a VecSession. A trained A2C agent, if given, provides the priors
+    (actor) and evaluates the leaves (critic); otherwise the priors are uniform and the leaves
+    are evaluated by random rollouts. The tree can be saved to and resumed from tree_file.
+    """
+    def __init__(self, session_class, options, agent=None, jobs=None):
+        settings = options.get('mcts', {})
+        self.session_class = session_class
+        self.options = options
+        self.agent = agent
+        self.jobs = jobs or os.cpu_count()
+
+        self.num_actions = len(options['optimizations'])
+        # a session takes iterations - 1 steps after its reset
+        self.max_depth = options['iterations'] - 1
+        self.exploration = settings.get('exploration', 1.25)
+        self.virtual_loss = settings.get('virtual_loss', 3.0)
+        self.rollout_depth = settings.get('rollout_depth', 10)
+        self.tree_file = settings.get('tree_file')
+        self.save_every = settings.get('save_every', 10)
+        self.rng = np.random.RandomState(settings.get('seed', 0))
+        # the reward of a step that failed, as the sessions give it
+        self.failed_step_reward = options.get('failed_step_reward', -3)
+
+        self.root = Node()
+        self.simulations = 0
+        # bounds of the backed up values, to normalize Q into [0, 1]
+        self.minimum, self.maximum = float('inf'), float('-inf')
+        if self.tree_file and os.path.exists(self.tree_file):
+            self.load()
+
+    def search(self, simulations, abc_budget=None, output_dir='optimized'):
+        """
+        runs simulations (episodes) until their number, or the number of ABC runs, reaches its budget.
+        Writes the script of the best sequence found to output_dir and returns (best record, best sequence)
+        """
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        # the depth of the simulations is the search's, not cut short by the termination criteria of training
+        games = VecSession(self.session_class, dict(self.options, termination=None), self.jobs)
+        best = None
+        try:
+            if not self.root.evaluated:
+                states = games.reset()
+                self.root.evaluated = True
+                self.root.state = states[0]
+                self._expand(self.root)
+
+            # a resumed search runs as many simulations again
+            target = self.simulations + simulations
+            batches, abc_runs = 0, 0
+            while self.simulations < target and not (abc_budget and abc_runs >= abc_budget):
+                paths = [self._select() for _ in range(min(self.jobs, target - self.simulations))]
+                for path, (rewards, leaf_state) in zip(paths, self._simulate(games, paths)):
+                    self._backup(path, rewards, leaf_state)
+                self.simulations += len(paths)
+
+                for i, (record, sequence, meets_constraint) in enumerate(games.call('best_result')):
+                    if sequence and (best is None or better_result(record, meets_constraint, best[0], best[2])):
+                        best = (record, sequence, meets_constraint)
+                        script = games.call_one(i, 'script', sequence)
+                        write_script(script, self.options['design_file'], record, output_dir)
+
+                batches += 1
+                abc_runs = sum(games.get_attr('abc_runs'))
+                log('MCTS: ' + str(self.simulations) + ' simulations, ' + str(abc_runs) + ' ABC runs, ' + \
+                    'tree of ' + str(self._size()) + ' nodes')
+                if self.tree_file and batches % self.save_every == 0:
+                    self.save()
+        finally:
+            if self.tree_file:
+                self.save()
+            games.close()
+
+        return best[:2] if best else None
+
+    def _select(self):
+        """
+        descends from the root to a node without children (not evaluated yet, terminal or failed),
+        adding a virtual loss to every node on the way. Returns the path of actions.
+        """
+        node, path = self.root, []
+        self._add_virtual_loss(node)
+        while node.children:
+            scale = math.sqrt(max(node.visits, 1))
+            action = max(node.children, key=lambda a: self._puct(node.children[a], scale))
+            node = node.children[action]
+            path.append(action)
+            self._add_virtual_loss(node)
+        return path
+
+    def _puct(self, child, scale):
+        q = 0.0
+        if child.visits and self.maximum > self.minimum:
+            q = (child.q() - self.minimum) / (self.maximum - self.minimum)
+        return q + self.exploration * child.prior * scale / (1 + child.visits)
+
+    def _add_virtual_loss(self, node):
+        node.visits += 1
+        node.value -= self.virtual_loss
+
+    def _simulate(self, games, paths):
+        """
+        steps one environment per path: through the path (the prefix is taken from the result cache
+        if enabled) then, without a critic, a random rollout. Returns the rewards of the steps and
+        the state of the leaf (None if it was not stepped into) of every path.
+        """
+        actions = []
+        for path in paths:
+            leaf = self._node(path)
+            if leaf.evaluated:
+                # terminal or failed: nothing left to simulate
+                actions.append([])
+                continue
+            rollout = []
+            if self.agent is None:
+                rollout = list(self.rng.randint(self.num_actions, size=min(self.rollout_depth, \
+                    self.max_depth - len(path))))
+            actions.append(path + rollout)
+
+        rewards = [[] for _ in paths]
+        leaf_states = [None] * len(paths)
+        # only the environments assigned a leaf start a new episode
+        indices = [i for i in range(len(paths)) if actions[i]]
+        if indices:
+            games.reset(indices)
+        step = 0
+        while indices:
+            results = games.step([actions[i][step] for i in indices], indices)
+            still_stepping = []
+            for i, (state, reward, done, info) in zip(indices, results):
+                rewards[i].append(self.failed_step_reward if reward is None else reward)
+                if step == len(paths[i]) - 1:
+                    # a failed step left the network as it was: nothing to expand
+                    leaf_states[i] = None if info and info.get('failed') else state
+                if not done and step + 1 < len(actions[i]):
+                    still_stepping.append(i)
+            indices = still_stepping
+            step += 1
+        return list(zip(rewards, leaf_states))
+
+    def _backup(self, path, rewards, leaf_state):
+        """
+        evaluates and expands the leaf, then backs the return up the path, removing the virtual loss
+        """
+        nodes = [self.root]
+        for action in path:
+            nodes.append(nodes[-1].children[action])
+        leaf = nodes[-1]
+
+        if path and not leaf.evaluated:
+            leaf.evaluated = True
+            leaf.reward = rewards[len(path) - 1]
+            leaf.state = leaf_state
+            if leaf_state is not None and len(path) < self.max_depth:
+                self._expand(leaf)
+
+        # the return after the leaf: the critic's estimate or the rewards of the rollout
+        value = 0.0
+        if leaf.children:
+            if self.agent is not None:
+                value = float(self.agent.state_values(self._normalize(leaf.state))[0])
+            else:
+                value = float(np.sum(rewards[len(path):]))
+
+        for depth in reversed(range(len(nodes))):
+            node = nodes[depth]
+            node.visits -= 1
+            node.value += self.virtual_loss
+            if depth:
+                value += node.reward
+            node.visits += 1
+            node.value += value
+            self.minimum = min(self.minimum, node.q())
+            self.maximum = max(self.maximum, node.q())
+
+    def _expand(self, node):
+        if self.agent is not None:
+            priors = self.agent.action_probabilities(self._normalize(node.state))[0]
+        else:
+            priors = np.full(self.num_actions, 1.0 / self.num_actions)
+        node.children = {action: Node(float(priors[action])) for action in range(self.num_actions)}
+
+    def _normalize(self, state):
+        return self.agent.normalizer.normalize(np.array(state)).reshape([1, -1])
+
+    def _node(self, path):
+        node = self.root
+        for action in path:
+            node = node.children[action]
+        return node
+
+    def _size(self):
+        size, stack = 0, [self.root]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.children.values())
+        return size
+
+    def _signature(self):
+        """
+        what the tree is valid for: the design, the optimizations and the episode length
+        """
+        return {'design': file_hash(self.options['design_file']), 'optimizations': self.options['optimizations'], \
+            'iterations': self.options['iterations']}
+
+    def save(self):
+        nodes = {}
+        stack = [((), self.root)]
+        while stack:
+            path, node = stack.pop()
+            nodes[','.join(map(str, path))] = [node.prior, node.visits, node.value, node.reward, \
+                None if node.state is None else [float(x) for x in node.state], node.evaluated]
+            stack.extend((path + (action,), child) for action, child in node.children.items())
+
+        directory = os.path.dirname(os.path.abspath(self.tree_file))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.tree_file + '.tmp', 'w') as f:
+            json.dump({'signature': self._signature(), 'simulations': self.simulations, \
+                'bounds': [self.minimum, self.maximum], 'nodes': nodes}, f)
+        os.replace(self.tree_file + '.tmp', self.tree_file)
+
+    def load(self):
+        with open(self.tree_file) as f:
+            tree = json.load(f)
+        if tree['signature'] != self._signature():
+            log('MCTS: ' + self.tree_file + ' was saved for another design or optimizations, starting a new tree')
+            return
+
+        nodes = {}
+        for key in sorted(tree['nodes'], key=lambda key: key.count(',') + bool(key)):
+            prior, visits, value, reward, state, evaluated = tree['nodes'][key]
+            node = Node(prior)
+            node.visits, node.value, node.reward, node.evaluated = visits, value, reward, evaluated
+            node.state = None if state is None else np.array(state)
+            path = tuple(int(action) for action in key.split(',')) if key else ()
+            nodes[path] = node
+            if path:
+                nodes[path[:-1]].children[path[-1]] = node
+        self.root = nodes[()]
+        self.simulations = tree['simulations']
+        self.minimum, self.maximum = tree['bounds']
+        log('MCTS: resumed a tree of ' + str(len(nodes)) + ' nodes after ' + str(self.simulations) + ' simulations')
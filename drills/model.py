@@ -8,48 +8,41 @@
 
 import tensorflow as tf
 import numpy as np
+import os
 import datetime
 import time
+import copy
+import json
 from .scl_session import SCLSession as SCLGame
 from .fpga_session import FPGASession as FPGAGame
+from .session import observation_space_size
+from .vec_session import VecSession
+from .normalizer import Normalizer
+from .profiler import Profiler, ProfileWriter
+from .checkpoint import Checkpointer, latest_checkpoint
+from .surrogate import Surrogate
 
 def log(message):
     print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
 
-class Normalizer():
-    def __init__(self, num_inputs):
-        self.num_inputs = num_inputs
-        self.n = tf.zeros(num_inputs)
-        self.mean = tf.zeros(num_inputs)
-        self.mean_diff = tf.zeros(num_inputs)
-        self.var = tf.zeros(num_inputs)
-
-    def observe(self, x):
-        self.n += 1.
-        last_mean = tf.identity(self.mean)
-        self.mean += (x-self.mean)/self.n
-        self.mean_diff += (x-last_mean)*(x-self.mean)
-        self.var = tf.clip_by_value(self.mean_diff/self.n, clip_value_min=1e-2, clip_value_max=1000000000)
-
-    def normalize(self, inputs):
-        obs_std = tf.sqrt(self.var)
-        return (inputs - self.mean)/obs_std
-    
-    def reset(self):
-        self.n = tf.zeros(self.num_inputs)
-        self.mean = tf.zeros(self.num_inputs)
-        self.mean_diff = tf.zeros(self.num_inputs)
-        self.var = tf.zeros(self.num_inputs)
+def _write_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f)
 
 class A2C:
-    def __init__(self, options, load_model=False, fpga_mapping=False):
-        if fpga_mapping:
-            self.game = FPGAGame(options)
+    def __init__(self, options, load_model=False, fpga_mapping=False, inference=False, learner=False):
+        self.game_class = FPGAGame if fpga_mapping else SCLGame
+        self.num_envs = options.get('num_envs', 1)
+        if inference or learner:
+            # the environments are created by the inference engine or run by the actor processes
+            self.game = None
+        elif self.num_envs > 1:
+            self.game = VecSession(self.game_class, options, self.num_envs)
         else:
-            self.game = SCLGame(options)
+            self.game = self.game_class(options)
 
-        self.num_actions = self.game.action_space_length
-        self.state_size = self.game.observation_space_size
+        self.num_actions = len(options['optimizations'])
+        self.state_size = observation_space_size(options)
         self.normalizer = Normalizer(self.state_size)
 
         self.state_input = tf.placeholder(tf.float32, [None, self.state_size])
@@ -57,26 +50,77 @@ class A2C:
         # Define any additional placeholders needed for training your agent here:
         self.actions = tf.placeholder(tf.float32, [None, self.num_actions])
         self.discounted_episode_rewards_ = tf.placeholder(tf.float32, [None, ])
+        # weights of the steps in the actor loss, e.g. to correct for episodes played by an older policy
+        self.importance_weights = tf.placeholder_with_default(tf.ones_like(self.discounted_episode_rewards_), [None, ])
 
         self.state_value = self.critic()
+        critic_variables = len(tf.trainable_variables())
         self.actor_probs = self.actor()
+        self.actor_variables = tf.trainable_variables()[critic_variables:]
         self.loss_val = self.loss()
         self.train_op = self.optimizer()
         self.session = tf.Session()
         
         # model saving/restoring
         self.model_dir = options['model_dir']
+        self.design_file = options['design_file']
         self.saver = tf.train.Saver()
 
+        # the normalizer statistics are saved next to the checkpoint
+        self.normalizer_file = self.model_dir + '.normalizer.npz'
+        self.keep_normalizer_statistics = options.get('keep_normalizer_statistics', False)
+
+        # episodes trained on, and the training state of the environments when run by actor processes
+        self.episode = 0
+        self.session_states = []
+
         if load_model:
-            self.saver.restore(self.session, self.model_dir)
+            checkpoint = latest_checkpoint(self.model_dir)
+            self.saver.restore(self.session, checkpoint)
+            if os.path.exists(checkpoint + '.normalizer.npz'):
+                self.normalizer_file = checkpoint + '.normalizer.npz'
+            if os.path.exists(self.normalizer_file):
+                self.normalizer.restore(self.normalizer_file)
             log("Model restored.")
         else:
             self.session.run(tf.global_variables_initializer())
+            checkpoint = None
+
+        # checkpoints are taken by policy (every N episodes, every T minutes, on a better reward)
+        # and written in the background
+        self.checkpointer = None
+        if not inference:
+            self.checkpointer = Checkpointer(self.session, self.model_dir, options.get('checkpoint', {}))
+            # a training run saved with its state resumes where it stopped
+            if checkpoint and os.path.exists(checkpoint + '.state.json'):
+                with open(checkpoint + '.state.json') as f:
+                    self.restore_training_state(json.load(f))
+                log('Resuming the training after episode ' + str(self.episode))
         
         self.gamma = 0.99
         self.learning_rate = 0.01
 
+        # Dyna-style planning: imagined rollouts on a surrogate of the effect of the optimizations
+        settings = options.get('surrogate') or {}
+        self.surrogate = None
+        self.dyna_rollouts = settings.get('dyna_rollouts', 0)
+        self.dyna_depth = settings.get('dyna_depth', 5)
+        if settings.get('model') and self.dyna_rollouts and not inference:
+            self.surrogate = Surrogate.load(settings['model']).for_commands(options['optimizations'])
+            if self.surrogate.metrics != self.game_class.store_metrics:
+                raise ValueError('the surrogate predicts ' + ', '.join(self.surrogate.metrics) + ', not ' + \
+                    ', '.join(self.game_class.store_metrics))
+
+        # time spent in each phase of an episode, written per episode to profile_file
+        # and optionally added to TensorBoard
+        self.profiler = Profiler(options.get('profile', False))
+        self.profile_writer = None
+        self.profile_summary_writer = None
+        if self.profiler.enabled and not inference:
+            self.profile_writer = ProfileWriter(options.get('profile_file', 'profile.csv'))
+            if options.get('profile_tensorboard_dir'):
+                self.profile_summary_writer = tf.summary.FileWriter(options['profile_tensorboard_dir'])
+
     def optimizer(self):
         """
         :return: Optimizer for your loss function
@@ -137,7 +181,7 @@ class A2C:
         # actor loss        
         neg_log_prob = tf.nn.softmax_cross_entropy_with_logits_v2(logits=tf.log(self.actor_probs), 
                                                                   labels=self.actions)
-        actor_loss = tf.reduce_sum(neg_log_prob * advantage)
+        actor_loss = tf.reduce_sum(neg_log_prob * advantage * self.importance_weights)
         
         neg_log_prob = tf.nn.softmax_cross_entropy_with_logits_v2(logits=self.actor_probs,
                                                                  labels=self.actions)
@@ -146,19 +190,199 @@ class A2C:
         
         return critic_loss + actor_loss
 
-    def save_model(self):
-        save_path = self.saver.save(self.session, self.model_dir)
-        log("Model saved in path: %s" % str(save_path))
+    def action_probabilities(self, states):
+        """
+        evaluates the actor on a batch of (normalized) states
+        """
+        return self.session.run(self.actor_probs, feed_dict={self.state_input: states})
+
+    def state_values(self, states):
+        """
+        evaluates the critic on a batch of (normalized) states
+        """
+        return self.session.run(self.state_value, feed_dict={self.state_input: states}).ravel()
+
+    def actor_weights(self):
+        """
+        returns the weights and biases of the actor's layers as NumPy arrays
+        """
+        return self.session.run(self.actor_variables)
+
+    def update(self, states, actions, discounted_rewards, importance_weights=None):
+        """
+        applies one gradient step on a batch of (normalized) states, one-hot actions and discounted rewards
+        """
+        feed_dict = {self.state_input: states, self.actions: actions, \
+            self.discounted_episode_rewards_: discounted_rewards}
+        if importance_weights is not None:
+            feed_dict[self.importance_weights] = importance_weights
+        self.session.run(self.train_op, feed_dict=feed_dict)
+
+    def checkpoint(self, reward=None):
+        """
+        takes a checkpoint after an episode if the checkpoint policy asks for one
+        """
+        if self.checkpointer.should_save(self.episode, reward):
+            self.save_model()
+
+    def save_model(self, wait=False):
+        """
+        snapshots the model (weights and optimizer slots), the normalizer statistics and the training state,
+        which are written in the background
+        """
+        with self.profiler.phase('checkpoint'):
+            normalizer = copy.deepcopy(self.normalizer)
+            state = self.training_state()
+            self.checkpointer.save(self.episode, [('.normalizer.npz', normalizer.save), \
+                ('.state.json', lambda path: _write_json(state, path))], wait)
+
+    def training_state(self):
+        """
+        the counters, random state and best known records of the training and its environments
+        """
+        if self.game is None:
+            sessions = self.session_states
+        elif self.num_envs > 1:
+            sessions = self.game.call('training_state')
+        else:
+            sessions = [self.game.training_state()]
+        rng = np.random.get_state()
+        return {'episode': self.episode, 'best_reward': self.checkpointer.best_reward, \
+            'rng': [rng[0], rng[1].tolist(), rng[2], rng[3], rng[4]], 'sessions': sessions}
+
+    def restore_training_state(self, state):
+        self.episode = state['episode']
+        self.checkpointer.last_episode = self.episode
+        self.checkpointer.best_reward = state['best_reward']
+        rng = state['rng']
+        np.random.set_state((rng[0], np.array(rng[1], dtype=np.uint32), rng[2], rng[3], rng[4]))
+        self.session_states = state['sessions']
+        # the actors of an asynchronous training keep the state of their session of every design
+        session_states = [states.get(self.design_file) if states and 'episode' not in states else states \
+            for states in self.session_states]
+        if self.game is not None and self.num_envs > 1:
+            for i, session_state in enumerate(session_states[:self.num_envs]):
+                if session_state:
+                    self.game.call_one(i, 'restore_training_state', session_state)
+        elif self.game is not None and session_states and session_states[0]:
+            self.game.restore_training_state(session_states[0])
+
+    def close(self):
+        """
+        takes a final checkpoint of the episodes trained since the last one and waits for the writes
+        """
+        if self.checkpointer is None:
+            return
+        if self.episode and self.checkpointer.last_episode != self.episode:
+            self.save_model(wait=True)
+        self.checkpointer.close()
+        self.checkpointer = None
+
+    def write_profile(self, wall_time):
+        """
+        writes the phase times of the episode, including those of the environments, and starts over
+        """
+        # without environments (asynchronous training), the actors' times are merged as their episodes arrive
+        if self.game is not None and self.num_envs > 1:
+            for profiler in self.game.get_attr('profiler'):
+                self.profiler.merge(profiler.times)
+        elif self.game is not None:
+            self.profiler.merge(self.game.profiler.times)
+
+        self.profile_writer.write(self.episode, wall_time, self.profiler.times)
+        if self.profile_summary_writer:
+            summary = tf.Summary(value=[tf.Summary.Value(tag='profile/' + name, simple_value=seconds) \
+                for name, (seconds, _) in self.profiler.times.items()] + \
+                    [tf.Summary.Value(tag='profile/wall_time', simple_value=wall_time)])
+            self.profile_summary_writer.add_summary(summary, self.episode)
+            self.profile_summary_writer.flush()
+        self.profiler.reset()
 
     def train_episode(self):
         """
         train_episode will be called several times by the drills.py to train the agent. In this method,
         we run the agent for a single episode, then use that data to train the agent.
         """
-        state = self.game.reset()
-        self.normalizer.reset()
-        self.normalizer.observe(state)
-        state = self.normalizer.normalize(state).eval(session=self.session)
+        episode_start = time.time()
+        if self.num_envs > 1:
+            total_reward = self.train_episode_vectorized()
+        else:
+            total_reward = self.train_episode_single()
+        # counted once trained on, so that a final checkpoint never holds a partial episode; an episode
+        # skipped because the design could not be evaluated trained nothing
+        if total_reward is not None:
+            self.episode += 1
+            self.checkpoint(total_reward)
+        if self.profile_writer:
+            self.write_profile(time.time() - episode_start)
+        return total_reward
+
+    def warm_start(self, options, episodes=10):
+        """
+        trains the agent on the best sequences of the design in the evaluation store, replayed as
+        demonstration episodes on a session of their own (their steps mostly come from the result cache).
+        Returns the total rewards of the demonstrations.
+        """
+        params = copy.deepcopy(options)
+        params['playground_dir'] = os.path.join(options['playground_dir'], 'warm-start')
+        params['evaluation_source'] = 'drills warm start'
+        # the demonstrations are replayed whole
+        params['termination'] = None
+        game = self.game_class(params)
+        optimizations = options['optimizations']
+        all_rewards = []
+        for sequence in game.stored_sequences(episodes):
+            # the stored sequence starts with the strash of the reset, and may hold commands the agent cannot take
+            if any(command not in optimizations for command in sequence[1:]):
+                continue
+            actions = [optimizations.index(command) for command in sequence[1:options['iterations']]]
+            if len(actions) < 2:
+                continue
+            state = game.reset()
+            if state is None:
+                break
+            if not self.keep_normalizer_statistics:
+                self.normalizer.reset()
+            self.normalizer.observe(state)
+            episode_states, episode_actions, episode_rewards = [], [], []
+            for action in actions:
+                new_state, reward, _, _ = game.step(action)
+                if new_state is None:
+                    break
+                episode_states.append(self.normalizer.normalize(state))
+                action_ = np.zeros(self.num_actions)
+                action_[action] = 1
+                episode_actions.append(action_)
+                episode_rewards.append(reward)
+                state = new_state
+                self.normalizer.observe(state)
+            if len(episode_rewards) < 2:
+                continue
+            self.update(np.array(episode_states), np.array(episode_actions), \
+                self.discount_and_normalize_rewards(episode_rewards))
+            all_rewards.append(np.sum(episode_rewards))
+            log('Warm start: ' + '; '.join(sequence[:len(episode_rewards) + 1]) + ' - total reward = ' + \
+                str(all_rewards[-1]))
+        del game
+        return all_rewards
+
+    def train_episode_single(self):
+        """
+        runs one episode on the environment, then trains the agent on it. Returns the total reward,
+        or None if the design could not be evaluated.
+        """
+        with self.profiler.phase('env_step'):
+            state = self.game.reset()
+        if state is None:
+            log('The design could not be evaluated, skipping the episode')
+            return None
+        # the raw states and metrics of the episode, to plan on
+        raw_states, metrics, actions = [state], [self.game.metrics()], []
+        with self.profiler.phase('normalize'):
+            if not self.keep_normalizer_statistics:
+                self.normalizer.reset()
+            self.normalizer.observe(state)
+            state = self.normalizer.normalize(state)
         done = False
         
         episode_states = []
@@ -167,11 +391,13 @@ class A2C:
         
         while not done:
             log('  iteration: ' + str(self.game.iteration))
-            action_probability_distribution = self.session.run(self.actor_probs, \
-                feed_dict={self.state_input: state.reshape([1, self.state_size])})
+            with self.profiler.phase('policy'):
+                action_probability_distribution = self.session.run(self.actor_probs, \
+                    feed_dict={self.state_input: state.reshape([1, self.state_size])})
             action = np.random.choice(range(action_probability_distribution.shape[1]), \
                 p=action_probability_distribution.ravel())
-            new_state, reward, done, _ = self.game.step(action)
+            with self.profiler.phase('env_step'):
+                new_state, reward, done, _ = self.game.step(action)
             
             # append this step
             episode_states.append(state)
@@ -179,39 +405,173 @@ class A2C:
             action_[action] = 1
             episode_actions.append(action_)
             episode_rewards.append(reward)
+            if self.surrogate:
+                raw_states.append(new_state)
+                metrics.append(self.game.metrics())
+                actions.append(action)
             
             state = new_state
-            self.normalizer.observe(state)
-            state = self.normalizer.normalize(state).eval(session=self.session)
+            with self.profiler.phase('normalize'):
+                self.normalizer.observe(state)
+                state = self.normalizer.normalize(state)
         
         # Now that we have run the episode, we use this data to train the agent
         start = time.time()
-        discounted_episode_rewards = self.discount_and_normalize_rewards(episode_rewards)
-        
-        _ = self.session.run(self.train_op, feed_dict={self.state_input: np.array(episode_states), \
-            self.actions: np.array(episode_actions), \
-                self.discounted_episode_rewards_: discounted_episode_rewards})
+        with self.profiler.phase('train'):
+            discounted_episode_rewards = self.discount_and_normalize_rewards(episode_rewards)
+
+            self.update(np.array(episode_states), np.array(episode_actions), discounted_episode_rewards)
         end = time.time()
-        log('Episode Agent Training Time ~ ' + str((start - end) / 60) + ' minutes.')
-        
-        self.save_model()
+        log('Episode Agent Training Time ~ ' + str((end - start) / 60) + ' minutes.')
+        if self.surrogate:
+            self.plan(raw_states, actions, metrics, self.game.imagined_rewards)
         
         return np.sum(episode_rewards)
     
+    def train_episode_vectorized(self):
+        """
+        runs one episode on each of the parallel environments, evaluating the policy on all their states
+        at once every step, then trains the agent on the stacked trajectories.
+        Returns the mean total reward of the environments, or None if the design could not be evaluated.
+        """
+        with self.profiler.phase('env_step'):
+            states = self.game.reset()
+        if any(state is None for state in states):
+            log('The design could not be evaluated in every environment, skipping the episode')
+            return None
+        # the raw states and metrics of the episodes, to plan on
+        raw_states = [[state] for state in states]
+        metrics = [[env_metrics] for env_metrics in self.game.call('metrics')] if self.surrogate else []
+        with self.profiler.phase('normalize'):
+            if not self.keep_normalizer_statistics:
+                self.normalizer.reset()
+            for state in states:
+                self.normalizer.observe(state)
+            states = self.normalizer.normalize(states)
+
+        active = list(range(self.num_envs))
+        episode_states = [[] for _ in range(self.num_envs)]
+        episode_actions = [[] for _ in range(self.num_envs)]
+        episode_rewards = [[] for _ in range(self.num_envs)]
+        iteration = 1
+
+        while active:
+            log('  iteration: ' + str(iteration) + ' on ' + str(len(active)) + ' environments')
+            with self.profiler.phase('policy'):
+                action_probability_distributions = self.session.run(self.actor_probs, \
+                    feed_dict={self.state_input: states[active]})
+            actions = [np.random.choice(range(self.num_actions), p=p) for p in action_probability_distributions]
+            with self.profiler.phase('env_step'):
+                results = self.game.step(actions, active)
+            if self.surrogate:
+                all_metrics = self.game.call('metrics')
+                for i, (new_state, _, _, _) in zip(active, results):
+                    raw_states[i].append(new_state)
+                    metrics[i].append(all_metrics[i])
+
+            still_active = []
+            for i, action, (new_state, reward, done, _) in zip(active, actions, results):
+                # append this step
+                episode_states[i].append(states[i])
+                action_ = np.zeros(self.num_actions)
+                action_[action] = 1
+                episode_actions[i].append(action_)
+                episode_rewards[i].append(reward)
+
+                with self.profiler.phase('normalize'):
+                    self.normalizer.observe(new_state)
+                    states[i] = self.normalizer.normalize(new_state)
+                if not done:
+                    still_active.append(i)
+            active = still_active
+            iteration += 1
+
+        # Now that we have run the episodes, we use the stacked data to train the agent
+        start = time.time()
+        with self.profiler.phase('train'):
+            discounted_episode_rewards = np.concatenate([self.discount_and_normalize_rewards(rewards) \
+                for rewards in episode_rewards])
+
+            self.update(np.concatenate(episode_states), np.concatenate(episode_actions), discounted_episode_rewards)
+        end = time.time()
+        log('Episode Agent Training Time ~ ' + str((end - start) / 60) + ' minutes.')
+        if self.surrogate:
+            # the rewards only depend on the params, which all the environments share
+            imagined_rewards = lambda previous, predicted: self.game.call_one(0, 'imagined_rewards', previous, predicted)
+            for i in range(self.num_envs):
+                self.plan(raw_states[i], [np.argmax(action) for action in episode_actions[i]], metrics[i], \
+                    imagined_rewards)
+
+        return np.mean([np.sum(rewards) for rewards in episode_rewards])
+
+    def plan(self, raw_states, actions, metrics, imagined_rewards):
+        """
+        Dyna-style planning after a real episode (its raw states, the actions taken and the metrics of its states):
+        logs the error of the surrogate on the real steps, then rolls the policy out from states of the episode
+        on the surrogate's predictions of the next features and metrics, and trains on these imagined episodes.
+        imagined_rewards gives the rewards of the predicted steps as the session would.
+        """
+        raw_states, metrics = np.array(raw_states, dtype=float), np.array(metrics, dtype=float)
+        steps = len(actions)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            predicted = self.surrogate.predict(raw_states[:steps])[0][np.arange(steps), actions]
+            errors = np.nanmean(np.abs(predicted - (metrics[1:steps + 1] / metrics[:steps] - 1)), axis=0)
+        log('Surrogate: mean absolute error of the relative ' + ', '.join(metric + ' change ' + \
+            str(round(float(error), 4)) for metric, error in zip(self.surrogate.metrics, errors)) + ' on the real steps')
+
+        with self.profiler.phase('planning'):
+            starts = np.random.randint(len(raw_states), size=self.dyna_rollouts)
+            states, current = raw_states[starts], metrics[starts]
+            rollout_states, rollout_actions, rollout_rewards = [], [], []
+            for _ in range(self.dyna_depth):
+                normalized = self.normalizer.normalize(states)
+                probabilities = self.action_probabilities(normalized)
+                imagined_actions = np.array([np.random.choice(self.num_actions, p=p / p.sum()) for p in probabilities])
+                metric_changes, feature_changes = self.surrogate.predict(states)
+                rollouts = np.arange(len(states))
+                predicted = current * (1 + metric_changes[rollouts, imagined_actions])
+                rollout_states.append(normalized)
+                rollout_actions.append(imagined_actions)
+                rollout_rewards.append(imagined_rewards(current.tolist(), predicted.tolist()))
+                states, current = states + feature_changes[rollouts, imagined_actions], predicted
+
+            episode_states, episode_actions, discounted, total_rewards = [], [], [], []
+            for rollout in range(self.dyna_rollouts):
+                rewards = np.array([step_rewards[rollout] for step_rewards in rollout_rewards], dtype=float)
+                discounted_rewards = self.discount_and_normalize_rewards(rewards)
+                # e.g. predicted metrics that overflowed
+                if not np.all(np.isfinite(discounted_rewards)):
+                    continue
+                one_hot = np.zeros((self.dyna_depth, self.num_actions))
+                one_hot[np.arange(self.dyna_depth), [step_actions[rollout] for step_actions in rollout_actions]] = 1
+                episode_states.append(np.array([step_states[rollout] for step_states in rollout_states]))
+                episode_actions.append(one_hot)
+                discounted.append(discounted_rewards)
+                total_rewards.append(np.sum(rewards))
+            if episode_states:
+                self.update(np.concatenate(episode_states), np.concatenate(episode_actions), np.concatenate(discounted))
+        log('Planned on ' + str(len(total_rewards)) + ' imagined episodes, mean total reward = ' + \
+            str(np.mean(total_rewards) if total_rewards else None))
+
     def discount_and_normalize_rewards(self, episode_rewards):
         """
-        used internally to calculate the discounted episode rewards
+        used internally to calculate the discounted episode rewards. Episodes may end early, so an episode
+        can be of any length: one step or one of constant discounted rewards is only centered (to zeros)
         """
-        discounted_episode_rewards = np.zeros_like(episode_rewards)
+        discounted_episode_rewards = np.zeros(len(episode_rewards))
         cumulative = 0.0
         for i in reversed(range(len(episode_rewards))):
             cumulative = cumulative * self.gamma + episode_rewards[i]
             discounted_episode_rewards[i] = cumulative
+        if not len(discounted_episode_rewards):
+            return discounted_episode_rewards
     
         mean = np.mean(discounted_episode_rewards)
         std = np.std(discounted_episode_rewards)
     
-        discounted_episode_rewards = (discounted_episode_rewards - mean) / std
+        discounted_episode_rewards = discounted_episode_rewards - mean
+        if std > 1e-8:
+            discounted_episode_rewards /= std
     
         return discounted_episode_rewards
 
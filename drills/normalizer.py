@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+
+class Normalizer():
+    """
+    Running mean and variance of the observed states (Welford's algorithm) kept in NumPy,
+    so observing and normalizing a state adds nothing to the Tensorflow graph
+    """
+    def __init__(self, num_inputs):
+        self.num_inputs = num_inputs
+        self.reset()
+
+    def observe(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        self.n += 1.
+        last_mean = self.mean.copy()
+        self.mean += (x-self.mean)/self.n
+        self.mean_diff += (x-last_mean)*(x-self.mean)
+        self.var = np.clip(self.mean_diff/self.n, 1e-2, 1000000000)
+
+    def normalize(self, inputs):
+        obs_std = np.sqrt(self.var)
+        return (inputs - self.mean)/obs_std
+    
+    def reset(self):
+        self.n = 0.
+        self.mean = np.zeros(self.num_inputs)
+        self.mean_diff = np.zeros(self.num_inputs)
+        self.var = np.zeros(self.num_inputs)
+
+    def statistics(self):
+        return {'n': self.n, 'mean': self.mean.copy(), 'mean_diff': self.mean_diff.copy(), 'var': self.var.copy()}
+
+    def load_statistics(self, stats):
+        self.n = float(stats['n'])
+        self.mean = np.array(stats['mean'], dtype=np.float64)
+        self.mean_diff = np.array(stats['mean_diff'], dtype=np.float64)
+        self.var = np.array(stats['var'], dtype=np.float64)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, **self.statistics())
+
+    def restore(self, path):
+        self.load_statistics(np.load(path))
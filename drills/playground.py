@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import gzip
+import shutil
+import datetime
+import tempfile
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+RETENTION_POLICIES = ['all', 'compress', 'best', 'top_k']
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+class Playground:
+    """
+    Applies the retention policy to the networks the steps of a session write: 'all' keeps them,
+    'compress' gzips them once their episode ends, 'best' keeps only those of the current step and
+    of the best known results, 'top_k' those of the current step and of the top_k steps of best QoR.
+    The networks can be written to a scratch directory (e.g. on a tmpfs), from which the kept ones
+    are moved to their episode directory once the episode ends. Counts the bytes written per episode.
+    """
+    def __init__(self, retention='all', top_k=10, scratch_dir=None):
+        if retention not in RETENTION_POLICIES:
+            raise ValueError('unknown playground_retention: ' + str(retention))
+        self.retention = retention
+        self.top_k = top_k
+        self.scratch_dir = None
+        if scratch_dir:
+            if not os.path.exists(scratch_dir):
+                os.makedirs(scratch_dir)
+            self.scratch_dir = tempfile.mkdtemp(prefix='drills-', dir=scratch_dir)
+
+        # (episode, iteration) -> (QoR, files) of the kept steps, with the 'best' and 'top_k' policies
+        self.steps = {}
+        self.episode_dir = None
+        self.network_dir = None
+        self.episode_files = []
+        self.bytes_written = 0
+
+    def __del__(self):
+        self.close()
+
+    def start_episode(self, episode_dir):
+        """
+        sets the directory of the networks the steps of the new episode write, and returns it
+        """
+        self.episode_dir = episode_dir
+        self.network_dir = episode_dir
+        if self.scratch_dir:
+            self.network_dir = os.path.join(self.scratch_dir, os.path.basename(episode_dir))
+            if not os.path.exists(self.network_dir):
+                os.makedirs(self.network_dir)
+        self.episode_files = []
+        self.bytes_written = 0
+        return self.network_dir
+
+    def add(self, step, files, qor, best_steps=()):
+        """
+        records the files a step (episode, iteration) wrote and deletes those of the steps
+        the policy no longer keeps; best_steps are the steps of the best known results
+        """
+        files = [path for path in files if path and os.path.exists(path)]
+        self.bytes_written += sum(_size(path) for path in files)
+        self.episode_files += files
+        if self.retention == 'best':
+            self.steps[step] = (qor, files)
+            keep = set(best_steps) | {step}
+        elif self.retention == 'top_k':
+            self.steps[step] = (qor, files)
+            keep = set(sorted(self.steps, key=lambda other: self.steps[other][0])[:self.top_k]) | {step}
+        else:
+            return
+        for other in list(self.steps):
+            if other not in keep:
+                for path in self.steps.pop(other)[1]:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def finish_episode(self, log_file=None):
+        """
+        moves the kept networks of the episode out of the scratch directory and compresses them if asked.
+        Logs and returns the bytes written during the episode (including its log) and the bytes kept of them.
+        """
+        if self.episode_dir is None:
+            return None
+        moved = {}
+        for path in self.episode_files:
+            if not os.path.exists(path):
+                continue
+            kept = path
+            if self.scratch_dir:
+                kept = os.path.join(self.episode_dir, os.path.basename(path))
+                shutil.move(path, kept)
+            if self.retention == 'compress':
+                with open(kept, 'rb') as f, gzip.open(kept + '.gz', 'wb') as compressed:
+                    shutil.copyfileobj(f, compressed)
+                os.remove(kept)
+                kept += '.gz'
+            moved[path] = kept
+        for step, (qor, files) in self.steps.items():
+            self.steps[step] = (qor, [moved.get(path, path) for path in files])
+        if self.scratch_dir:
+            shutil.rmtree(self.network_dir, ignore_errors=True)
+
+        written = self.bytes_written + (_size(log_file) if log_file else 0)
+        kept = sum(_size(path) for path in moved.values()) + (_size(log_file) if log_file else 0)
+        log('Playground: ' + str(written) + ' bytes written to ' + self.episode_dir + ', ' + str(kept) + ' kept')
+        self.episode_dir = None
+        self.episode_files = []
+        return written, kept
+
+    def close(self):
+        # also called on a playground whose __init__ rejected the policy
+        if getattr(self, 'scratch_dir', None):
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.scratch_dir = None
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import re
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# the phases timed during an episode, in the order of the CSV columns
+PHASES = [
+    'abc_optimize',     # reading the design (or snapshot) and applying the optimizations, inside ABC
+    'abc_write',        # writing the optimized netlist and the AIG snapshot, inside ABC
+    'abc_mapping',      # mapping and timing (map, topo, stime) or LUT mapping (if, print_stats), inside ABC
+    'abc_features',     # reading the written netlist back and printing its stats, inside ABC
+    'abc_process',      # wall time of the ABC runs: the above plus launching ABC and collecting its output
+    'features',         # extracting the features in-process
+    'structural_hash',  # hashing the optimized AIG for the transposition table
+    'result_cache',     # result cache lookups and updates
+    'env_step',         # wall time of the environment steps as seen by the agent
+    'normalize',        # updating the state statistics and normalizing the states
+    'policy',           # forward passes of the actor
+    'train',            # discounting the rewards and the gradient update
+    'checkpoint',       # snapshotting the model and the normalizer statistics (written in the background)
+    'planning',         # imagined rollouts on the surrogate and training on them
+]
+
+_abc_elapsed = re.compile(rb'elapse: *([0-9.]+) seconds')
+
+class Profiler:
+    """
+    Accumulates the time spent (seconds and number of calls) in each phase of an episode.
+    When disabled, timing a phase costs nothing but the call.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.times = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds, calls=1):
+        if not self.enabled:
+            return
+        total = self.times.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += calls
+
+    def add_abc_phases(self, names, abc_output):
+        """
+        adds the times ABC printed for the phases (one 'time' command following each of them);
+        they are left out if the output does not have one for each phase
+        """
+        if not self.enabled:
+            return
+        elapsed = _abc_elapsed.findall(abc_output)
+        if len(elapsed) == len(names):
+            for name, seconds in zip(names, elapsed):
+                self.add(name, float(seconds))
+
+    def merge(self, times):
+        """
+        adds the times accumulated by another profiler (e.g. of a session in a worker process)
+        """
+        for name, (seconds, calls) in times.items():
+            self.add(name, seconds, calls)
+
+    def reset(self):
+        self.times = OrderedDict()
+
+class ProfileWriter:
+    """
+    Writes the phase times of every episode to a CSV file, or to a JSON lines file if its
+    name ends with .jsonl
+    """
+    def __init__(self, output_file):
+        self.jsonl = output_file.endswith('.jsonl')
+        directory = os.path.dirname(os.path.abspath(output_file))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.output = open(output_file, 'w')
+        if not self.jsonl:
+            self.output.write(', '.join(['episode', 'wall_time'] + \
+                [column for phase in PHASES for column in (phase, phase + '_calls')]) + '\n')
+
+    def __del__(self):
+        self.close()
+
+    def write(self, episode, wall_time, times):
+        if self.jsonl:
+            self.output.write(json.dumps({'episode': episode, 'wall_time': wall_time, \
+                'phases': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in times.items()}}) + '\n')
+        else:
+            row = [str(episode), '%.6f' % wall_time]
+            for phase in PHASES:
+                seconds, calls = times.get(phase, (0.0, 0))
+                row += ['%.6f' % seconds, str(calls)]
+            self.output.write(', '.join(row) + '\n')
+        self.output.flush()
+
+    def close(self):
+        if self.output:
+            self.output.close()
+            self.output = None
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+_file_hashes = {}
+
+def file_hash(file_name):
+    """
+    returns the SHA-256 of the file contents, remembered as long as the file is not modified
+    """
+    if not file_name:
+        return ''
+    stat = os.stat(file_name)
+    signature = (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+    if signature not in _file_hashes:
+        with open(file_name, 'rb') as f:
+            _file_hashes[signature] = hashlib.sha256(f.read()).hexdigest()
+    return _file_hashes[signature]
+
+class ResultCache:
+    """
+    A persistent, content-addressed cache of evaluation results (QoR, features and optionally
+    the resulting netlist) keyed on the design and library contents, the mapping and the
+    command sequence. It is stored in SQLite so parallel workers can share one file; the
+    least recently used entries are evicted beyond max_entries.
+    """
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits, self.misses = 0, 0
+        self.puts = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT, ' + \
+            'netlist BLOB, netlist_format TEXT, last_access REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    @staticmethod
+    def key(design_file, library_file, mapping, sequence, design_hash=None):
+        """
+        the cache key of running the sequence on the design, then the mapping (a description of
+        the mapping commands and anything else that changes the result) with the library. The design
+        is identified by the hash of its file, or by the given design_hash (e.g. of its content without
+        the comments that differ from run to run)
+        """
+        content = '\n'.join([design_hash or file_hash(design_file), file_hash(library_file), mapping] + list(sequence))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key, netlist_format=None):
+        """
+        returns (result, netlist) or None on a miss. If a netlist format (file extension) is given,
+        an entry without a netlist in that format counts as a miss.
+        """
+        row = self.connection.execute('SELECT result, netlist, netlist_format FROM results WHERE key = ?', \
+            (key,)).fetchone()
+        if row is None or (netlist_format and row[2] != netlist_format):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, result, netlist=None, netlist_format=None):
+        """
+        stores a result (a JSON-serializable dict) and optionally the resulting netlist
+        """
+        self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', \
+            (key, json.dumps(result), netlist, netlist_format if netlist is not None else None, time.time()))
+        self.puts += 1
+        if self.puts % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        drops the least recently used entries beyond max_entries
+        """
+        count = self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute('DELETE FROM results WHERE key IN ' + \
+                '(SELECT key FROM results ORDER BY last_access LIMIT ?)', (count - self.max_entries,))
+
+    def stats(self):
+        entries = self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+
+def design_name(design_file):
+    """
+    the name of a design, e.g. design_name('designs/div.v') is div
+    """
+    return os.path.splitext(os.path.basename(design_file))[0]
+
+class DesignScheduler:
+    """
+    Allocates the actors of a multi-design training to the designs in proportion to their step cost
+    (a moving average of the seconds per step of their episodes), so that every design completes
+    episodes at about the same rate: a slow design gets more actors instead of holding up the fast
+    ones. An actor acquires a design before each episode and releases it with the time the episode
+    took; the counters live in shared memory, so the actors schedule themselves.
+    """
+    def __init__(self, context, design_files, smoothing=0.2):
+        self.design_files = list(design_files)
+        self.smoothing = smoothing
+        self.lock = context.Lock()
+        num_designs = len(self.design_files)
+        # seconds per step, 0 until the first episode of the design is measured
+        self.costs = context.RawArray('d', num_designs)
+        self.active = context.RawArray('i', num_designs)
+        self.episodes = context.RawArray('i', num_designs)
+        # the designs that could not be evaluated, no longer handed out
+        self.failed = context.RawArray('i', num_designs)
+
+    def acquire(self):
+        """
+        picks the design with the fewest actors per unit of step cost (the fewest episodes among ties)
+        and returns its index, or None once every design failed
+        """
+        with self.lock:
+            designs = [d for d in range(len(self.design_files)) if not self.failed[d]]
+            if not designs:
+                return None
+            # a design not measured yet counts as the slowest one so far
+            measured = [cost for cost in self.costs if cost > 0]
+            default = max(measured) if measured else 1.0
+            design = min(designs, key=lambda d: (self.active[d] / (self.costs[d] or default), self.episodes[d]))
+            self.active[design] += 1
+        return design
+
+    def release(self, design, seconds, steps):
+        """
+        frees an actor of the design, updating its step cost with an episode of steps that took seconds
+        """
+        with self.lock:
+            self.active[design] -= 1
+            if steps:
+                self.episodes[design] += 1
+                cost = seconds / steps
+                previous = self.costs[design]
+                self.costs[design] = cost if not previous else \
+                    (1 - self.smoothing) * previous + self.smoothing * cost
+
+    def drop(self, design):
+        """
+        stops handing out a design that could not be evaluated
+        """
+        with self.lock:
+            self.failed[design] = 1
+
+    def allocation(self):
+        """
+        (design file, actors on it, episodes, seconds per step) of every design
+        """
+        with self.lock:
+            return [(design_file, self.active[d], self.episodes[d], self.costs[d]) \
+                for d, design_file in enumerate(self.design_files)]
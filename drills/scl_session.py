@@ -6,125 +6,80 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree. 
 
-import os
 import re
-import datetime
-import numpy as np
-from subprocess import check_output
-from .features import extract_features
+from .session import Session
 
-def log(message):
-    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
-
-class SCLSession:
+class SCLSession(Session):
     """
     A class to represent a logic synthesis optimization session using ABC
     """
-    def __init__(self, params):
-        self.params = params
+    log_header = 'iteration, optimization, area, delay, best_area_meets_constraint, best_area, best_delay'
+    store_metrics = ['area', 'delay']
 
-        self.action_space_length = len(self.params['optimizations'])
-        self.observation_space_size = 9     # number of features
+    def __init__(self, params):
+        super().__init__(params)
 
-        self.iteration = 0
-        self.episode = 0
-        self.sequence = ['strash']
         self.delay, self.area = float('inf'), float('inf')
 
         self.best_known_area = (float('inf'), float('inf'), -1, -1)
         self.best_known_delay = (float('inf'), float('inf'), -1, -1)
         self.best_known_area_meets_constraint = (float('inf'), float('inf'), -1, -1)
 
-        # logging
-        self.log = None
-    
-    def __del__(self):
-        if self.log:
-            self.log.close()
-    
-    def reset(self):
-        """
-        resets the environment and returns the state
-        """
-        self.iteration = 0
-        self.episode += 1
+    def _reset_metrics(self):
         self.delay, self.area = float('inf'), float('inf')
-        self.sequence = ['strash']
-        self.episode_dir = os.path.join(self.params['playground_dir'], str(self.episode))
-        if not os.path.exists(self.episode_dir):
-            os.makedirs(self.episode_dir)
-        
-        # logging
-        log_file = os.path.join(self.episode_dir, 'log.csv')
-        if self.log:
-            self.log.close()
-        self.log = open(log_file, 'w')
-        self.log.write('iteration, optimization, area, delay, best_area_meets_constraint, best_area, best_delay\n')
 
-        state, _ = self._run()
+    def _set_metrics(self, delay, area):
+        self.delay, self.area = delay, area
 
-        # logging
-        self.log.write(', '.join([str(self.iteration), self.sequence[-1], str(self.area), str(self.delay)]) + '\n')
-        self.log.flush()
+    def _library_file(self):
+        return self.params['mapping']['library_file']
 
-        return state
-    
-    def step(self, optimization):
-        """
-        accepts optimization index and returns (new state, reward, done, info)
-        """
-        self.sequence.append(self.params['optimizations'][optimization])
-        new_state, reward = self._run()
+    def _mapping_commands(self, output_design_file_mapped=None):
+        abc_command = ['map -D ' + str(self.params['mapping']['clock_period'])]
+        if output_design_file_mapped:
+            abc_command += ['write ' + output_design_file_mapped]
+        abc_command += ['topo', 'stime']
+        return abc_command
 
-        # logging
+    def _update_best_known(self):
         if self.area < self.best_known_area[0]:
             self.best_known_area = (self.area, self.delay, self.episode, self.iteration)
         if self.delay < self.best_known_delay[1]:
             self.best_known_delay = (self.area, self.delay, self.episode, self.iteration)
         if self.delay <= self.params['mapping']['clock_period'] and self.area < self.best_known_area_meets_constraint[0]:
             self.best_known_area_meets_constraint = (self.area, self.delay, self.episode, self.iteration)
-        self.log.write(', '.join([str(self.iteration), self.sequence[-1], str(self.area), str(self.delay)]) + ', ' +
-            '; '.join(list(map(str, self.best_known_area_meets_constraint))) + ', ' + 
-            '; '.join(list(map(str, self.best_known_area))) + ', ' + 
-            '; '.join(list(map(str, self.best_known_delay))) + '\n')
-        self.log.flush()
 
-        return new_state, reward, self.iteration == self.params['iterations'], None
+    def _best_result(self):
+        if self.best_known_area_meets_constraint[2] != -1:
+            return self.best_known_area_meets_constraint, True
+        return self.best_known_delay, False
+
+    def _best_known(self):
+        return [self.best_known_area_meets_constraint, self.best_known_area, self.best_known_delay]
+
+    def _qor(self):
+        if self.delay <= self.params['mapping']['clock_period']:
+            return (0, self.area, self.delay)
+        return (1, self.delay, self.area)
+
+    def _store_queries(self):
+        return [{'metric': 'area', 'max_delay': self.params['mapping']['clock_period']}, {'metric': 'delay'}]
+
+    def _metrics_arguments(self, metrics):
+        area, delay = metrics
+        return delay, area
+
+    def _restore_best_known(self, records):
+        self.best_known_area_meets_constraint, self.best_known_area, self.best_known_delay = records
+
+    def _log_metrics(self):
+        return [self.area, self.delay]
 
-    def _run(self):
-        """
-        run ABC on the given design file with the sequence of commands
-        """
-        self.iteration += 1
-        output_design_file = os.path.join(self.episode_dir, str(self.iteration) + '.v')
-        output_design_file_mapped = os.path.join(self.episode_dir, str(self.iteration) + '-mapped.v')
-    
-        abc_command = 'read ' + self.params['mapping']['library_file'] + '; '
-        abc_command += 'read ' + self.params['design_file'] + '; '
-        abc_command += ';'.join(self.sequence) + '; '
-        abc_command += 'write ' + output_design_file + '; '
-        abc_command += 'map -D ' + str(self.params['mapping']['clock_period']) + '; '
-        abc_command += 'write ' + output_design_file_mapped + '; '
-        abc_command += 'topo; stime;'
-    
-        try:
-            proc = check_output([self.params['abc_binary'], '-c', abc_command])
-            # get reward
-            delay, area = self._get_metrics(proc)
-            reward = self._get_reward(delay, area)
-            self.delay, self.area = delay, area
-            # get new state of the circuit
-            state = self._get_state(output_design_file)
-            return state, reward
-        except Exception as e:
-            print(e)
-            return None, None
-        
     def _get_metrics(self, stats):
         """
         parse delay and area from the stats command of ABC
         """
-        line = stats.decode("utf-8").split('\n')[-2].split(':')[-1].strip()
+        line = [line for line in stats.decode("utf-8").split('\n') if 'Delay' in line][-1].split(':')[-1].strip()
         
         ob = re.search(r'Delay *= *[0-9]+.?[0-9]*', line)
         delay = float(ob.group().split('=')[1].strip())
@@ -159,35 +114,3 @@ class SCLSession:
 
         # now calculate the reward
         return self._reward_table(constraint_met, constraint_improvement, optimization_improvement)
-    
-    def _reward_table(self, constraint_met, contraint_improvement, optimization_improvement):
-        return {
-            True: {
-                0: {
-                    1: 3,
-                    0: 0,
-                    -1: -1
-                }
-            },
-            False: {
-                1: {
-                    1: 3,
-                    0: 2,
-                    -1: 1
-                },
-                0: {
-                    1: 2,
-                    0: 0,
-                    -1: -2
-                },
-                -1: {
-                    1: -1,
-                    0: -2,
-                    -1: -3
-                }
-            }
-        }[constraint_met][contraint_improvement][optimization_improvement]
-    
-    def _get_state(self, design_file):
-        return extract_features(design_file, self.params['yosys_binary'], self.params['abc_binary'])
-    
\ No newline at end of file
@@ -0,0 +1,710 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import time
+import datetime
+import numpy as np
+from .features import extract_step_features, extract_aiger_features
+from .executor import Executor, ExecutionError
+from .abc_engine import ABCEngine, ABCEngineError
+from .result_cache import ResultCache
+from .evaluation_store import EvaluationStore
+from .transposition import TranspositionTable
+from .aiger import read_aiger
+from .profiler import Profiler
+from .playground import Playground
+from .log_writer import LogWriter, log_path
+
+def log(message):
+    print('[DRiLLS {:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now()) + "] " + message)
+
+def observation_space_size(params):
+    """
+    the number of features a session with these params returns as its state
+    """
+    extended = params.get('feature_extractor', 'yosys') == 'aiger' and params.get('extended_features', False)
+    return 20 if extended else 9
+
+class Session:
+    """
+    A base class to represent a logic synthesis optimization session using ABC.
+    Subclasses define how the optimized design is read, mapped and measured.
+    """
+    log_header = 'iteration, optimization'
+    # the columns of the evaluation store of the metrics, in the order of _log_metrics
+    store_metrics = []
+
+    def __init__(self, params):
+        self.params = params
+
+        self.action_space_length = len(self.params['optimizations'])
+        # 'yosys' and 'netlist' read the features from the ABC step (and the gate types from yosys stat or
+        # the netlist), 'aiger' computes them from the saved AIG
+        self.feature_extractor = self.params.get('feature_extractor', 'yosys')
+        self.extended_features = self.feature_extractor == 'aiger' and self.params.get('extended_features', False)
+        self.observation_space_size = observation_space_size(self.params)     # number of features
+
+        self.iteration = 0
+        self.episode = 0
+        self.sequence = ['strash']
+        self.abc_runs = 0       # steps that ran ABC, i.e. were not taken from the result cache
+
+        # ABC runs are killed after a timeout and retried; a step that still fails leaves the network as it
+        # was at a penalty, and its sequence is poisoned: it fails at once if asked again
+        self.executor = Executor.from_params(self.params)
+        self.failed_step_reward = self.params.get('failed_step_reward', -3)
+        self.failed_steps = set()   # indices in the sequence of the optimizations of failed steps
+        self.poisoned = {}          # sequence -> why it failed
+        self.state = None
+
+        # an episode ends before its iterations once a termination criterion holds (empty or 0 disables each):
+        # patience steps without improving its QoR, the constraint met with the optimized metric within
+        # near_best_epsilon (relative) of the best result of the previous episodes, or its budget of
+        # max_seconds of wall-clock time or max_abc_runs ABC runs spent
+        termination = self.params.get('termination') or {}
+        self.patience = termination.get('patience')
+        self.near_best_epsilon = termination.get('near_best_epsilon')
+        self.max_episode_seconds = termination.get('max_seconds')
+        self.max_episode_abc_runs = termination.get('max_abc_runs')
+        self.termination = None     # the criterion that ended the episode
+
+        # incremental execution: a step starts from the network saved by the previous step
+        # and applies only the new optimization instead of replaying the whole sequence
+        self.incremental = self.params.get('incremental', False)
+        self.compare_incremental = self.params.get('compare_incremental', False)
+        self.snapshot_file = None
+        self.incremental_mismatches = 0
+
+        # structurally identical optimized AIGs skip mapping and feature extraction
+        self.transpositions = None
+        if self.params.get('transposition_table', False):
+            self.transpositions = TranspositionTable(self.params.get('transposition_table_size', 100000))
+        self.last_structural_hash = None
+        self.noop_steps = 0
+
+        # 'aiger' keeps the network of each step as its binary AIGER snapshot only (no Verilog netlists)
+        self.playground_format = self.params.get('playground_format', 'verilog')
+        self.save_snapshots = self.incremental or self.feature_extractor == 'aiger' or self.transpositions is not None \
+            or self.playground_format == 'aiger'
+        # which of the networks written by the steps are kept, and where they are written
+        self.playground = Playground(self.params.get('playground_retention', 'all'), \
+            self.params.get('playground_top_k', 10), self.params.get('playground_scratch_dir'))
+        self.network_dir = None
+        self.step_files = []
+
+        # results of sequences evaluated before (by any session or baseline) are taken from the cache
+        self.cache = None
+        if self.params.get('result_cache'):
+            self.cache = ResultCache(self.params['result_cache'], self.params.get('result_cache_size', 100000))
+        self.cache_netlists = self.params.get('result_cache_netlists', True)
+
+        # every sequence evaluated is recorded, with its QoR and features, in the evaluation store
+        self.store = None
+        if self.params.get('evaluation_store'):
+            self.store = EvaluationStore(self.params['evaluation_store'], self.params.get('evaluation_source', 'drills'))
+
+        # a persistent ABC process keeps the library and the current network loaded across steps
+        self.engine = None
+        self.engine_network_loaded = False
+        if self.params.get('abc_engine', 'subprocess') == 'persistent':
+            self.engine = ABCEngine(self.params['abc_binary'], self._library_commands(), \
+                self.params.get('abc_timeout'))
+
+        # time spent in each phase of the steps of the current episode
+        self.profiler = Profiler(self.params.get('profile', False))
+
+        # logging: the log of each episode is buffered and written as csv, jsonl or jsonl.gz
+        self.log = None
+        self.log_format = self.params.get('log_format', 'csv')
+        self.log_flush_seconds = self.params.get('log_flush_seconds', 10)
+
+    def __del__(self):
+        if self.log:
+            self.log.close()
+        self.playground.close()
+        if self.engine:
+            self.engine.close()
+        if self.cache:
+            self.cache.close()
+        if self.store:
+            self.store.close()
+
+    def reset(self):
+        """
+        resets the environment and returns the state
+        """
+        if self.cache and self.episode:
+            log('Result cache: ' + ', '.join(k + ' = ' + str(v) for k, v in self.cache.stats().items()))
+        # an episode left before its end
+        if self.log:
+            self.log.close()
+        self.playground.finish_episode(self.log.path if self.log else None)
+
+        self.iteration = 0
+        self.episode += 1
+        self._reset_metrics()
+        self.sequence = ['strash']
+        self.failed_steps = set()
+        self.snapshot_file = None
+        self.engine_network_loaded = False
+        self.last_structural_hash = None
+        self.noop_steps = 0
+        self.profiler.reset()
+        self.termination = None
+        self.episode_start = time.time()
+        self.episode_abc_runs = self.abc_runs
+        self.steps_without_improvement = 0
+        # the best result of the previous episodes, the near best criterion compares with
+        self.reference_result = self._best_result()
+        self.episode_dir = os.path.join(self.params['playground_dir'], str(self.episode))
+        if not os.path.exists(self.episode_dir):
+            os.makedirs(self.episode_dir)
+        self.network_dir = self.playground.start_episode(self.episode_dir)
+
+        # logging
+        self.log = LogWriter(log_path(os.path.join(self.episode_dir, 'log'), self.log_format), \
+            self.log_header.split(', '), flush_seconds=self.log_flush_seconds)
+
+        state, _ = self._run()
+        self.state = state
+        self._retain_step_files()
+        self.episode_best_qor = self._qor()
+
+        # logging
+        self.log.write([self.iteration, self.sequence[-1]] + self._log_metrics())
+
+        return state
+
+    def step(self, optimization):
+        """
+        accepts optimization index and returns (new state, reward, done, info)
+        """
+        self.sequence.append(self.params['optimizations'][optimization])
+        new_state, reward = self._run()
+        info = None
+        if new_state is None and self.state is not None:
+            # the failed optimization leaves the network as it was, at a penalty
+            self.failed_steps.add(len(self.sequence) - 1)
+            new_state, reward, info = self.state, self.failed_step_reward, {'failed': self.sequence[-1]}
+        self.state = new_state
+
+        # logging
+        self._update_best_known()
+        # a failed step wrote nothing: the playground keeps the network of the previous step, the next one starts from
+        if info is None:
+            self._retain_step_files()
+        self.log.write([self.iteration, self.sequence[-1]] + self._log_metrics() + \
+            ['; '.join(list(map(str, best))) for best in self._best_known()])
+
+        done = self._done()
+        if done:
+            self.log.close()
+            self.playground.finish_episode(self.log.path)
+        if done and self.termination != 'iterations':
+            log('Episode ' + str(self.episode) + ' ended after ' + str(self.iteration - 1) + ' of ' + \
+                str(self.params['iterations'] - 1) + ' steps: ' + self.termination)
+        if done and self.transpositions is not None:
+            log('Episode ' + str(self.episode) + ': ' + str(self.noop_steps) + ' of ' + str(self.iteration - 1) + \
+                ' steps left the AIG unchanged; transposition table: ' + \
+                ', '.join(k + ' = ' + str(v) for k, v in self.transpositions.stats().items()))
+        if done and (self.failed_steps or self.executor.retried):
+            log('Episode ' + str(self.episode) + ': ' + str(len(self.failed_steps)) + ' failed steps; executor: ' + \
+                ', '.join(k + ' = ' + str(v) for k, v in self.executor.stats().items()) + ', poisoned = ' + \
+                str(len(self.poisoned)))
+
+        return new_state, reward, done, info
+
+    def _done(self):
+        """
+        whether the episode ends with the current step, keeping the termination criterion that ended it
+        """
+        qor = self._qor()
+        if qor < self.episode_best_qor:
+            self.episode_best_qor, self.steps_without_improvement = qor, 0
+        else:
+            self.steps_without_improvement += 1
+        best, meets_constraint = self.reference_result
+
+        if self.iteration == self.params['iterations']:
+            self.termination = 'iterations'
+        elif self.patience and self.steps_without_improvement >= self.patience:
+            self.termination = 'no improvement in ' + str(self.patience) + ' steps'
+        elif self.near_best_epsilon is not None and meets_constraint and qor[0] == 0 and \
+                qor[1] <= best[0] * (1 + self.near_best_epsilon):
+            self.termination = 'constraint met within ' + str(self.near_best_epsilon) + ' of the best known ' + \
+                str(best[0])
+        elif self.max_episode_seconds and time.time() - self.episode_start >= self.max_episode_seconds:
+            self.termination = 'wall-clock budget of ' + str(self.max_episode_seconds) + ' seconds spent'
+        elif self.max_episode_abc_runs and self.abc_runs - self.episode_abc_runs >= self.max_episode_abc_runs:
+            self.termination = 'budget of ' + str(self.max_episode_abc_runs) + ' ABC runs spent'
+        return self.termination is not None
+
+    def _run(self):
+        """
+        run ABC on the given design file with the sequence of commands
+        """
+        self.iteration += 1
+        output_design_file = os.path.join(self.network_dir, str(self.iteration) + '.v')
+        output_design_file_mapped = os.path.join(self.network_dir, str(self.iteration) + '-mapped.v')
+        snapshot_file = os.path.join(self.network_dir, str(self.iteration) + '.aig')
+        if self.playground_format == 'aiger':
+            # the mapped netlist is not written; the optimized one only to read the abc features from
+            output_design_file_mapped = None
+            if self.feature_extractor == 'aiger':
+                output_design_file = None
+        self.step_files = []
+
+        reason = self.poisoned.get(tuple(self._applied_sequence()))
+        if reason:
+            log('Step ' + str(self.iteration) + ' of episode ' + str(self.episode) + ' is poisoned (' + reason + \
+                '), skipping ' + self.sequence[-1])
+            return None, None
+
+        cache_key = None
+        if self.cache:
+            cache_key = self._cache_key()
+            with self.profiler.phase('result_cache'):
+                cached = self.cache.get(cache_key)
+            if cached:
+                self.step_files = [snapshot_file]
+                return self._run_cached(*cached, snapshot_file)
+
+        if self.snapshot_file is not None and not os.path.exists(self.snapshot_file):
+            # e.g. removed with the playground of an earlier step: replay the sequence from the design instead
+            log('Snapshot ' + self.snapshot_file + ' is missing, replaying the sequence from the design')
+            self.snapshot_file = None
+        incremental_step = self.incremental and self.snapshot_file is not None and not self.engine
+        self.abc_runs += 1
+        start = time.time()
+        previous_snapshot_file = self.snapshot_file
+
+        try:
+            if self.transpositions is not None:
+                metrics, state = self._run_transposed(output_design_file, output_design_file_mapped, \
+                    snapshot_file, incremental_step)
+            else:
+                metrics, state = self._run_step(output_design_file, output_design_file_mapped, \
+                    snapshot_file, incremental_step)
+            # get reward
+            reward = self._get_reward(*metrics)
+            self._set_metrics(*metrics)
+            self.snapshot_file = snapshot_file if self.save_snapshots else None
+            if self.cache:
+                with self.profiler.phase('result_cache'):
+                    self._cache_put(cache_key, metrics, state, snapshot_file)
+            if self.store:
+                self.store.record(self.params['design_file'], self._library_file(), self._mapping_description(), \
+                    self._applied_sequence(), dict(zip(self.store_metrics, self._log_metrics())), state, time.time() - start)
+            if self.playground_format == 'aiger' and output_design_file and os.path.exists(output_design_file):
+                os.remove(output_design_file)
+            self.step_files = [output_design_file if self.playground_format == 'verilog' else None, \
+                output_design_file_mapped, snapshot_file if self.save_snapshots else None]
+            return state, reward
+        except Exception as e:
+            log('Step ' + str(self.iteration) + ' of episode ' + str(self.episode) + ' failed: ' + str(e))
+            self.poisoned[tuple(self._applied_sequence())] = e.reason if isinstance(e, ExecutionError) else \
+                type(e).__name__ + ': ' + str(e)
+            # the network of the previous step is where the next one starts; the engine may hold the failed one
+            self.snapshot_file = previous_snapshot_file
+            self.engine_network_loaded = False
+            return None, None
+
+    def _applied_sequence(self, end=None):
+        """
+        the sequence (up to end) without the optimizations of the failed steps, which left the network as it was
+        """
+        return [command for i, command in enumerate(self.sequence[:end]) if i not in self.failed_steps]
+
+    def _run_step(self, output_design_file, output_design_file_mapped, snapshot_file, incremental_step):
+        """
+        optimizes, maps and measures the design in one ABC run and returns (metrics, state)
+        """
+        if self.engine:
+            proc, abc_output = self._run_engine( \
+                [('abc_write', self._write_commands(output_design_file, snapshot_file)), \
+                    ('abc_mapping', ['&get -n'] + self._mapping_commands(output_design_file_mapped))], \
+                [('abc_features', self._feature_commands(output_design_file) + ['&put'])])
+        else:
+            proc = abc_output = self._run_abc( \
+                ('abc_optimize', self._optimize_commands(incremental_step)), \
+                ('abc_write', self._write_commands(output_design_file, snapshot_file)), \
+                ('abc_mapping', self._mapping_commands(output_design_file_mapped)), \
+                ('abc_features', self._feature_commands(output_design_file)), check=self._get_metrics)
+
+        metrics = self._get_metrics(proc)
+        if incremental_step and self.compare_incremental:
+            self._compare_with_replay(metrics)
+        # get new state of the circuit
+        return metrics, self._get_state(output_design_file, snapshot_file, abc_output)
+
+    def _run_transposed(self, output_design_file, output_design_file_mapped, snapshot_file, incremental_step):
+        """
+        optimizes the design first, then maps and measures it only if the structural hash of the
+        optimized AIG is not in the transposition table. Returns (metrics, state)
+        """
+        write_commands = self._write_commands(output_design_file, snapshot_file)
+        if self.engine:
+            self._run_engine([('abc_write', write_commands)])
+        else:
+            self._run_abc(('abc_optimize', self._optimize_commands(incremental_step)), ('abc_write', write_commands))
+
+        with self.profiler.phase('structural_hash'):
+            structural_hash = read_aiger(snapshot_file).structural_hash()
+        if structural_hash == self.last_structural_hash:
+            self.noop_steps += 1
+        self.last_structural_hash = structural_hash
+        entry = self.transpositions.get(structural_hash)
+        if entry:
+            return entry
+
+        mapping_commands = self._mapping_commands(output_design_file_mapped)
+        feature_commands = self._feature_commands(output_design_file)
+        if self.engine:
+            self.engine_network_loaded = False
+            try:
+                proc = self._run_engine_batch(('abc_mapping', ['&get -n'] + mapping_commands))
+            except ABCEngineError as e:
+                # the restarted engine lost the network, which is the snapshot just written
+                log(str(e))
+                proc = self._run_engine_batch(('abc_optimize', ['read ' + snapshot_file]), \
+                    ('abc_mapping', ['&get -n'] + mapping_commands))
+            abc_output = self._run_engine_batch(('abc_features', feature_commands + ['&put']))
+            self.engine_network_loaded = True
+        else:
+            proc = abc_output = self._run_abc(('abc_optimize', self._read_commands(snapshot_file)), \
+                ('abc_mapping', mapping_commands), ('abc_features', feature_commands), check=self._get_metrics)
+
+        metrics = self._get_metrics(proc)
+        state = self._get_state(output_design_file, snapshot_file, abc_output)
+        self.transpositions.put(structural_hash, metrics, state)
+        return metrics, state
+
+    def _optimize_commands(self, incremental_step):
+        """
+        ABC commands that load the design and apply the sequence (only its last command in an incremental step)
+        """
+        if incremental_step:
+            return self._read_commands(self.snapshot_file) + self.sequence[-1:]
+        return self._read_commands(self.params['design_file']) + self._applied_sequence()
+
+    def _timed_commands(self, phases):
+        """
+        joins the commands of the (phase name, commands) pairs; when profiling, ABC's time command
+        follows every phase so the time ABC spent in each one can be read from its output.
+        Returns the commands and the names of the timed phases.
+        """
+        abc_command, names = ['time -c'] if self.profiler.enabled else [], []
+        for name, commands in phases:
+            abc_command += commands
+            if self.profiler.enabled and commands:
+                abc_command.append('time')
+                names.append(name)
+        return abc_command, names
+
+    def _run_abc(self, *phases, check=None):
+        """
+        launches ABC on the commands of the (phase name, commands) pairs and returns its output;
+        check raises on output it does not expect, which is retried like a crash
+        """
+        abc_command, names = self._timed_commands(phases)
+        with self.profiler.phase('abc_process'):
+            abc_output = self.executor.run([self.params['abc_binary'], '-c', '; '.join(abc_command) + ';'], check)
+        self.profiler.add_abc_phases(names, abc_output)
+        return abc_output
+
+    def _run_engine_batch(self, *phases):
+        """
+        runs the commands of the (phase name, commands) pairs on the persistent ABC engine and returns its output
+        """
+        abc_command, names = self._timed_commands(phases)
+        with self.profiler.phase('abc_process'):
+            abc_output = self.engine.run(abc_command)
+        self.profiler.add_abc_phases(names, abc_output)
+        return abc_output
+
+    def _run_engine(self, *batches):
+        """
+        runs the batches of (phase name, commands) pairs on the persistent ABC engine, the first one after
+        the commands that bring the engine to the optimized network: the engine still holds the network of
+        the previous step unless it was restarted. Returns the output of each batch.
+        """
+        for attempt in range(2):
+            if self.engine_network_loaded:
+                abc_command = self.sequence[-1:]
+            elif self.snapshot_file:
+                abc_command = ['read ' + self.snapshot_file] + self.sequence[-1:]
+            else:
+                abc_command = ['read ' + self.params['design_file']] + self._applied_sequence()
+
+            self.engine_network_loaded = False
+            try:
+                outputs = [self._run_engine_batch(('abc_optimize', abc_command), *batches[0])]
+                outputs += [self._run_engine_batch(*batch) for batch in batches[1:]]
+                self.engine_network_loaded = True
+                return outputs
+            except ABCEngineError as e:
+                # the engine was restarted with the library only; replay the sequence once
+                if attempt:
+                    raise
+                log(str(e))
+                log('Replaying the sequence on the restarted ABC engine ..')
+
+    def _run_cached(self, result, netlist, snapshot_file):
+        """
+        takes the step from a cached result. Its snapshot, if cached, lets the next step continue from it.
+        """
+        metrics = tuple(result['metrics'])
+        reward = self._get_reward(*metrics)
+        self._set_metrics(*metrics)
+        self.snapshot_file = None
+        if netlist is not None:
+            with open(snapshot_file, 'wb') as f:
+                f.write(netlist)
+            self.snapshot_file = snapshot_file
+        # the engine does not hold this network
+        self.engine_network_loaded = False
+        return np.array(result['state']), reward
+
+    def _mapping_description(self):
+        """
+        the mapping commands and the features, which together with the design, library and sequence determine a result
+        """
+        return '; '.join(self._mapping_commands()) + '; features: ' + self.feature_extractor + \
+            (' extended' if self.extended_features else '')
+
+    def _cache_key(self):
+        return ResultCache.key(self.params['design_file'], self._library_file(), self._mapping_description(), \
+            self._applied_sequence())
+
+    def _cache_put(self, cache_key, metrics, state, snapshot_file):
+        netlist = None
+        if self.cache_netlists and self.save_snapshots:
+            with open(snapshot_file, 'rb') as f:
+                netlist = f.read()
+        self.cache.put(cache_key, {'metrics': list(metrics), 'state': [float(x) for x in state]}, netlist, '.aig')
+
+    def _retain_step_files(self):
+        """
+        hands the networks written by the step to the playground, which keeps or deletes them by its policy
+        """
+        best_steps = [(best[2], best[3]) for best in self._best_known() if best[2] != -1]
+        self.playground.add((self.episode, self.iteration), self.step_files, self._qor(), best_steps)
+
+    def training_state(self):
+        """
+        the episode counter and best known records, for a resumed training to continue from
+        """
+        return {'episode': self.episode, 'best_known': [list(best) for best in self._best_known()]}
+
+    def restore_training_state(self, state):
+        self.episode = state['episode']
+        self._restore_best_known([tuple(best) for best in state['best_known']])
+
+    def best_result(self):
+        """
+        returns the best known record meeting the constraint (or the one closest to it), the sequence
+        of the step of this episode that reached it and whether it meets the constraint
+        """
+        best, meets_constraint = self._best_result()
+        if best[2] != self.episode or best[3] < 1:
+            return best, None, meets_constraint
+        return best, self._applied_sequence(best[3]), meets_constraint
+
+    def stored_sequences(self, limit=10):
+        """
+        the sequences of the best results of the design in the evaluation store: those meeting the
+        constraint first, then those closest to meeting it. Only the results of this session's library
+        and mapping count; others were measured under a different library or clock period.
+        """
+        if self.store is None:
+            return []
+        sequences = []
+        for query in self._store_queries():
+            for result in self.store.best(self.params['design_file'], limit=limit, library_file=self._library_file(), \
+                    mapping=self._mapping_description(), **query):
+                if result['sequence'] not in sequences and len(sequences) < limit:
+                    sequences.append(result['sequence'])
+        return sequences
+
+    def metrics(self):
+        """
+        the metrics of the current step, in the order of store_metrics
+        """
+        return list(self._log_metrics())
+
+    def imagined_rewards(self, previous, metrics):
+        """
+        the rewards of steps from the previous metrics to the given ones (both lists of metrics in the order of
+        store_metrics, e.g. predicted by a surrogate), computed without running ABC or changing the session
+        """
+        current = self._metrics_arguments(self._log_metrics())
+        rewards = []
+        try:
+            for before, after in zip(previous, metrics):
+                self._set_metrics(*self._metrics_arguments(before))
+                rewards.append(self._get_reward(*self._metrics_arguments(after)))
+        finally:
+            self._set_metrics(*current)
+        return rewards
+
+    def script(self, sequence, design_file=None):
+        """
+        an ABC script, in the format of scripts/*_drills.tcl, that runs the sequence on the design and maps it
+        """
+        design_file = design_file or self.params['design_file']
+        design_name = os.path.splitext(os.path.basename(design_file))[0]
+        return '\n\n'.join(['# Script generated by DRiLLS agent', \
+            '\n'.join(self._library_commands() + ['read ' + design_file]), \
+            '\n'.join(sequence), \
+            'write_verilog ' + design_name + '_synth_drills.v', \
+            '\n'.join(self._mapping_commands())]) + '\n'
+
+    def _compare_with_replay(self, metrics):
+        """
+        replays the whole sequence from the design file and reports if it disagrees with the incremental step
+        """
+        abc_command = self._optimize_commands(False) + self._mapping_commands()
+        proc = self.executor.run([self.params['abc_binary'], '-c', '; '.join(abc_command) + ';'], self._get_metrics)
+        replay_metrics = self._get_metrics(proc)
+        if replay_metrics != metrics:
+            self.incremental_mismatches += 1
+            log('Incremental step ' + str(self.iteration) + ' of episode ' + str(self.episode) + \
+                ' gave ' + str(metrics) + ' while replaying the sequence gave ' + str(replay_metrics))
+
+    def _reward_table(self, constraint_met, contraint_improvement, optimization_improvement):
+        return {
+            True: {
+                0: {
+                    1: 3,
+                    0: 0,
+                    -1: -1
+                }
+            },
+            False: {
+                1: {
+                    1: 3,
+                    0: 2,
+                    -1: 1
+                },
+                0: {
+                    1: 2,
+                    0: 0,
+                    -1: -2
+                },
+                -1: {
+                    1: -1,
+                    0: -2,
+                    -1: -3
+                }
+            }
+        }[constraint_met][contraint_improvement][optimization_improvement]
+
+    def _get_state(self, design_file, snapshot_file, abc_output):
+        with self.profiler.phase('features'):
+            if self.feature_extractor == 'aiger':
+                return extract_aiger_features(snapshot_file, self.extended_features)
+            yosys_binary = self.params['yosys_binary'] if self.feature_extractor == 'yosys' else None
+            return extract_step_features(design_file, abc_output, yosys_binary, self.executor)
+
+    def _feature_commands(self, output_design_file):
+        """
+        ABC commands, run last in the step, that print the stats of the written design used as features
+        """
+        if self.feature_extractor == 'aiger':
+            return []
+        return ['read_verilog ' + output_design_file, 'print_stats']
+
+    def _read_commands(self, design_file):
+        """
+        ABC commands that load the library (if any) and the design
+        """
+        return self._library_commands() + ['read ' + design_file]
+
+    def _write_commands(self, output_design_file, snapshot_file):
+        """
+        ABC commands that write the optimized design and, when it is read back, its AIG snapshot
+        """
+        abc_command = ['write ' + output_design_file] if output_design_file else []
+        if self.save_snapshots:
+            abc_command += ['write ' + snapshot_file]
+        return abc_command
+
+    def _library_commands(self):
+        """
+        ABC commands that load the library, if the mapping uses one
+        """
+        return ['read ' + self._library_file()] if self._library_file() else []
+
+    def _library_file(self):
+        """
+        the library the mapping uses, or None
+        """
+        raise NotImplementedError
+
+    def _mapping_commands(self, output_design_file_mapped=None):
+        """
+        ABC commands that map the optimized design, write it (if a file is given) and print its stats
+        """
+        raise NotImplementedError
+
+    def _get_metrics(self, stats):
+        raise NotImplementedError
+
+    def _get_reward(self, *metrics):
+        raise NotImplementedError
+
+    def _reset_metrics(self):
+        raise NotImplementedError
+
+    def _set_metrics(self, *metrics):
+        raise NotImplementedError
+
+    def _update_best_known(self):
+        raise NotImplementedError
+
+    def _best_result(self):
+        """
+        the best known record meeting the constraint, or the one closest to meeting it, and whether
+        it meets the constraint
+        """
+        raise NotImplementedError
+
+    def _best_known(self):
+        """
+        the best known records in the order of the log columns
+        """
+        raise NotImplementedError
+
+    def _qor(self):
+        """
+        the QoR of the current step, lower is better: meeting the constraint comes first, then the optimized
+        metric if it is met, or the constrained one if not
+        """
+        raise NotImplementedError
+
+    def _store_queries(self):
+        """
+        the queries of the evaluation store for the best results, in order of preference
+        """
+        raise NotImplementedError
+
+    def _metrics_arguments(self, metrics):
+        """
+        the arguments of _set_metrics and _get_reward for metrics in the order of _log_metrics
+        """
+        raise NotImplementedError
+
+    def _restore_best_known(self, records):
+        """
+        sets the best known records, given in the order of _best_known
+        """
+        raise NotImplementedError
+
+    def _log_metrics(self):
+        raise NotImplementedError
@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import yaml
+import argparse
+import numpy as np
+from .features import extract_step_features
+from .executor import Executor
+from .evaluation_store import EvaluationStore
+
+class Surrogate:
+    """
+    A learned model of the effect of each optimization: a ridge regression per command from the features
+    of a design (before the command) to the relative change of its metrics (e.g. area and delay) and the
+    change of its features. All commands are predicted for a batch of designs at once, in NumPy.
+    """
+    def __init__(self, commands, metrics, num_features, regularization=1.0):
+        self.commands = list(commands)
+        self.metrics = list(metrics)
+        self.num_features = num_features
+        self.regularization = regularization
+        # (command, features + bias, metric changes + feature changes)
+        self.weights = np.zeros((len(self.commands), num_features + 1, len(self.metrics) + num_features))
+        self.trained = np.zeros(len(self.commands), dtype=bool)
+        # the features are standardized by the statistics of those trained on
+        self.mean, self.scale = np.zeros(num_features), np.ones(num_features)
+
+    def _inputs(self, features):
+        features = (np.atleast_2d(features) - self.mean) / self.scale
+        return np.hstack([features, np.ones((len(features), 1))])
+
+    def fit(self, features, actions, metric_changes, feature_changes):
+        """
+        fits the regression of every command on the transitions (features before, index of the command,
+        relative changes of the metrics, changes of the features) of that command
+        """
+        self.mean, self.scale = np.mean(features, axis=0), np.std(features, axis=0)
+        self.scale[self.scale == 0] = 1
+        inputs = self._inputs(features)
+        targets = np.hstack([metric_changes, feature_changes])
+        penalty = self.regularization * np.eye(self.num_features + 1)
+        # the bias is not regularized
+        penalty[-1, -1] = 0
+        for action in range(len(self.commands)):
+            rows = actions == action
+            if not rows.any():
+                continue
+            x, y = inputs[rows], targets[rows]
+            self.weights[action] = np.linalg.lstsq(x.T.dot(x) + penalty, x.T.dot(y), rcond=None)[0]
+            self.trained[action] = True
+
+    def predict(self, features):
+        """
+        predicts the effect of every command on every design of a batch of features: the relative changes
+        of the metrics (designs, commands, metrics) and the changes of the features (designs, commands, features)
+        """
+        inputs = self._inputs(features)
+        outputs = np.einsum('nf,cfo->nco', inputs, self.weights)
+        return outputs[:, :, :len(self.metrics)], outputs[:, :, len(self.metrics):]
+
+    def prefilter(self, features, commands, metric, top_m):
+        """
+        the candidate commands worth evaluating on a design: the top_m of lowest predicted change of the metric,
+        and those the surrogate was not trained on. Returns them and the predicted metric changes by command.
+        """
+        changes = self.predict(features)[0][0]
+        predictions, known = {}, []
+        for command in commands:
+            if command in self.commands and self.trained[self.commands.index(command)]:
+                predictions[command] = changes[self.commands.index(command)]
+                known.append(command)
+        column = self.metrics.index(metric)
+        ranked = sorted(known, key=lambda command: predictions[command][column])
+        kept = set(ranked[:top_m]) | set(command for command in commands if command not in predictions)
+        return [command for command in commands if command in kept], predictions
+
+    def for_commands(self, commands):
+        """
+        the surrogate of the given commands, in their order (those it was not trained on predict no change)
+        """
+        surrogate = Surrogate(commands, self.metrics, self.num_features, self.regularization)
+        for action, command in enumerate(commands):
+            if command in self.commands:
+                surrogate.weights[action] = self.weights[self.commands.index(command)]
+                surrogate.trained[action] = self.trained[self.commands.index(command)]
+        surrogate.mean, surrogate.scale = self.mean, self.scale
+        return surrogate
+
+    def evaluate(self, features, actions, metric_changes, parents=None):
+        """
+        the mean absolute error and R^2 of the predicted metric changes of the transitions and, given the
+        parent (design) of each transition, how often the command of the lowest predicted change of the
+        first metric is the best of those evaluated on the parent
+        """
+        predicted = self.predict(features)[0][np.arange(len(actions)), actions]
+        accuracy = {'transitions': len(actions)}
+        for column, metric in enumerate(self.metrics):
+            error = predicted[:, column] - metric_changes[:, column]
+            variance = np.var(metric_changes[:, column])
+            accuracy[metric + '_mae'] = float(np.mean(np.abs(error)))
+            accuracy[metric + '_r2'] = float(1 - np.mean(error ** 2) / variance) if variance > 0 else None
+        if parents is not None:
+            agreements = []
+            for parent in np.unique(parents):
+                rows = np.flatnonzero(parents == parent)
+                if len(rows) > 1:
+                    agreements.append(np.argmin(predicted[rows, 0]) == np.argmin(metric_changes[rows, 0]))
+            accuracy['top1_agreement'] = float(np.mean(agreements)) if agreements else None
+        return accuracy
+
+    def save(self, path):
+        np.savez(path, commands=np.array(self.commands), metrics=np.array(self.metrics), weights=self.weights, \
+            trained=self.trained, mean=self.mean, scale=self.scale, regularization=self.regularization)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        surrogate = cls([str(command) for command in data['commands']], [str(metric) for metric in data['metrics']], data['weights'].shape[1] - 1, \
+            float(data['regularization']))
+        surrogate.weights = data['weights']
+        surrogate.trained = data['trained']
+        surrogate.mean, surrogate.scale = data['mean'], data['scale']
+        return surrogate
+
+def store_transitions(store, commands, metrics, design=None, num_features=None):
+    """
+    the transitions recorded in the evaluation store: a sequence ending with one of the commands and its
+    prefix, evaluated with features on the same design and mapping by the same source. Only the transitions
+    with num_features features are kept (by default, those of the most common number), as the regular and
+    extended features do not mix. Returns the features before, the indices of the commands, the relative
+    changes of the metrics, the changes of the features and the index of the parent of every transition.
+    """
+    evaluations = {}
+    for result in store.evaluations(design, with_features=True):
+        if all(result[metric] is not None for metric in metrics):
+            key = (result['design_hash'], result['library_hash'], result['mapping'], result['source'])
+            evaluations[key + tuple(result['sequence'])] = result
+
+    transitions = []
+    for key, result in evaluations.items():
+        parent = evaluations.get(key[:-1])
+        if parent is None or result['sequence'][-1] not in commands or \
+                len(parent['features']) != len(result['features']):
+            continue
+        transitions.append((key, parent, result))
+    if num_features is None and transitions:
+        lengths = [len(parent['features']) for _, parent, _ in transitions]
+        num_features = max(set(lengths), key=lengths.count)
+
+    features, actions, metric_changes, feature_changes, parents, parent_ids = [], [], [], [], [], {}
+    for key, parent, result in transitions:
+        if len(parent['features']) != num_features:
+            continue
+        before = np.array([parent[metric] for metric in metrics], dtype=float)
+        after = np.array([result[metric] for metric in metrics], dtype=float)
+        if np.any(before <= 0):
+            continue
+        features.append(parent['features'])
+        actions.append(commands.index(result['sequence'][-1]))
+        metric_changes.append(after / before - 1)
+        feature_changes.append(np.array(result['features']) - np.array(parent['features']))
+        parents.append(parent_ids.setdefault(key[:-1], len(parent_ids)))
+    return np.array(features), np.array(actions, dtype=int), np.array(metric_changes), np.array(feature_changes), \
+        np.array(parents, dtype=int)
+
+def design_features(design_file, output_dir, abc_binary='yosys-abc', library_file=None, mapping_commands=(), \
+        executor=None, yosys_binary='yosys'):
+    """
+    the features of a design, as a session's 'yosys' feature extractor computes them (the 'netlist' one without
+    a yosys binary), and the output of the ABC run (ending with that of the mapping commands, run after the
+    features are printed)
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    netlist = os.path.join(output_dir, 'features.v')
+    abc_command = (['read ' + library_file] if library_file else []) + ['read ' + design_file, 'strash', \
+        'write ' + netlist, 'read_verilog ' + netlist, 'print_stats', 'strash'] + list(mapping_commands)
+    abc_output = (executor or Executor()).run([abc_binary, '-c', '; '.join(abc_command) + ';'])
+    return np.array(extract_step_features(netlist, abc_output, yosys_binary, executor)), abc_output
+
+class PrefilterStats:
+    """
+    The ABC calls a surrogate prefilter saved (candidates skipped, less the ABC runs computing the features
+    it predicts from) and the accuracy of its predictions of the candidates it let through
+    """
+    def __init__(self, metrics):
+        self.metrics = list(metrics)
+        self.candidates, self.evaluated, self.feature_runs = 0, 0, 0
+        self.errors, self.agreements = [], []
+
+    def record(self, candidates, evaluated, predictions=None, actual=None, feature_runs=1):
+        """
+        records a prefilter of the candidates that let evaluated of them through; predictions and actual map
+        the evaluated candidates to their predicted and actual metric changes
+        """
+        self.candidates += candidates
+        self.evaluated += evaluated
+        self.feature_runs += feature_runs
+        commands = [command for command in (actual or {}) if command in predictions]
+        for command in commands:
+            self.errors.append(np.abs(np.array(predictions[command]) - np.array(actual[command])))
+        if len(commands) > 1:
+            self.agreements.append(min(commands, key=lambda command: predictions[command][0]) == \
+                min(commands, key=lambda command: actual[command][0]))
+
+    def summary(self):
+        saved = self.candidates - self.evaluated - self.feature_runs
+        message = 'Surrogate: ' + str(self.evaluated) + ' of ' + str(self.candidates) + ' candidates evaluated, ' + \
+            str(saved) + ' ABC calls saved (' + str(self.feature_runs) + ' feature runs included)'
+        if self.errors:
+            errors = np.mean(self.errors, axis=0)
+            message += '; mean absolute error of the relative ' + ', '.join(metric + ' change ' + \
+                str(round(float(error), 4)) for metric, error in zip(self.metrics, errors))
+        if self.agreements:
+            message += '; best candidate predicted in ' + str(round(100 * float(np.mean(self.agreements)), 1)) + '%'
+        return message
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Trains the surrogate QoR model on the evaluation store')
+    parser.add_argument('store', help='Path to the evaluation store')
+    parser.add_argument('output', help='Path of the trained surrogate (.npz)')
+    parser.add_argument('-p', '--params', type=open, default='params.yml', help='The optimizations of the params.yml')
+    parser.add_argument('--fpga', action='store_true', help='Predicts LUTs and levels instead of area and delay')
+    parser.add_argument('-d', '--design', help='Trains on the evaluations of this design only')
+    parser.add_argument('--num_features', type=int, \
+        help='Trains on the evaluations with this many features (9, or 20 extended); the most common by default')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of the networks held out to report accuracy')
+    parser.add_argument('--regularization', type=float, default=1.0)
+    args = parser.parse_args()
+
+    commands = yaml.load(args.params, Loader=yaml.FullLoader)['optimizations']
+    metrics = ['luts', 'levels'] if args.fpga else ['area', 'delay']
+    store = EvaluationStore(args.store)
+    features, actions, metric_changes, feature_changes, parents = store_transitions(store, commands, metrics, \
+        args.design, args.num_features)
+    store.close()
+    if not len(actions):
+        raise SystemExit('No transitions with features in ' + args.store)
+    print(str(len(actions)) + ' transitions from ' + str(len(np.unique(parents))) + ' networks')
+
+    # held out by the network the commands were applied to, so the accuracy is that on networks not seen
+    held_out = np.random.RandomState(0).rand(len(np.unique(parents)))[parents] < args.holdout
+    surrogate = Surrogate(commands, metrics, features.shape[1], args.regularization)
+    if held_out.any() and not held_out.all():
+        surrogate.fit(features[~held_out], actions[~held_out], metric_changes[~held_out], feature_changes[~held_out])
+        print('Held out accuracy: ' + str(surrogate.evaluate(features[held_out], actions[held_out], \
+            metric_changes[held_out], parents[held_out])))
+    surrogate.fit(features, actions, metric_changes, feature_changes)
+    print('Training accuracy: ' + str(surrogate.evaluate(features, actions, metric_changes, parents)))
+    surrogate.save(args.output)
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+from collections import OrderedDict
+
+class TranspositionTable:
+    """
+    Maps the structural hash of an optimized AIG to its mapped QoR (metrics) and features (state),
+    so a state reached again by a different sequence skips mapping and feature extraction.
+    The least recently used entries are dropped beyond max_entries.
+    """
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.table = OrderedDict()
+        self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def get(self, structural_hash):
+        """
+        returns (metrics, state) or None
+        """
+        entry = self.table.get(structural_hash)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.table.move_to_end(structural_hash)
+        metrics, state = entry
+        return metrics, state.copy()
+
+    def put(self, structural_hash, metrics, state):
+        self.table[structural_hash] = (tuple(metrics), state.copy())
+        self.table.move_to_end(structural_hash)
+        if len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.table)}
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import copy
+import pickle
+import traceback
+import numpy as np
+from multiprocessing import Process, Pipe
+
+class _RemoteTraceback(Exception):
+    """
+    the traceback of an exception raised in a worker, chained to it when it is re-raised in the parent
+    """
+    def __init__(self, tb):
+        self.tb = tb
+
+    def __str__(self):
+        return self.tb
+
+class _RemoteError:
+    """
+    an exception raised by the session of a worker, sent back in place of the result
+    """
+    def __init__(self, exception, tb):
+        try:
+            pickle.dumps(exception)
+        except Exception:
+            exception = RuntimeError(repr(exception))
+        self.exception, self.tb = exception, tb
+
+def _worker(remote, session_class, params):
+    """
+    runs a session in its own process and serves the commands sent by VecSession. An exception raised
+    by the session is sent back, to be raised again by VecSession, and the worker keeps serving
+    """
+    session = session_class(params)
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == 'close':
+                break
+            try:
+                if command == 'reset':
+                    result = session.reset()
+                elif command == 'step':
+                    result = session.step(data)
+                elif command == 'getattr':
+                    result = getattr(session, data)
+                elif command == 'call':
+                    name, args = data
+                    result = getattr(session, name)(*args)
+            except Exception as e:
+                result = _RemoteError(e, traceback.format_exc())
+            remote.send(result)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        remote.close()
+        del session
+
+def _receive(remotes):
+    """
+    the results sent by the workers; once all are received (so none is left in a pipe), raises the exception
+    of the first session that failed, with the worker's traceback
+    """
+    results = [remote.recv() for remote in remotes]
+    for result in results:
+        if isinstance(result, _RemoteError):
+            raise result.exception from _RemoteTraceback(result.tb)
+    return results
+
+class VecSession:
+    """
+    A class to step several copies of a session in parallel, one worker process each.
+    Every copy practices in its own subdirectory of the playground, unless the params
+    of each environment are given (env_params), e.g. to run different designs.
+    """
+    def __init__(self, session_class, params, num_envs=None, env_params=None):
+        if env_params is None:
+            env_params = []
+            for i in range(num_envs):
+                env_params.append(copy.deepcopy(params))
+                env_params[i]['playground_dir'] = os.path.join(params['playground_dir'], 'env-' + str(i))
+        self.num_envs = len(env_params)
+        self.remotes, self.processes = [], []
+        for i in range(self.num_envs):
+            remote, worker_remote = Pipe()
+            process = Process(target=_worker, args=(worker_remote, session_class, env_params[i]), daemon=True)
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        self.action_space_length = len(params['optimizations'])
+        self.observation_space_size = self.get_attr('observation_space_size')[0]
+
+    def __del__(self):
+        self.close()
+
+    def reset(self, indices=None):
+        """
+        resets the environments at the given indices (all by default) and returns their states stacked in
+        one array, or as a list with None in place of the state of each environment whose design could not
+        be evaluated
+        """
+        if indices is None:
+            indices = range(self.num_envs)
+        for i in indices:
+            self.remotes[i].send(('reset', None))
+        states = _receive([self.remotes[i] for i in indices])
+        if any(state is None for state in states):
+            return states
+        return np.array(states)
+
+    def step(self, actions, indices=None):
+        """
+        steps the environments at the given indices (all by default) with their actions in parallel
+        and returns a list of (new state, reward, done, info)
+        """
+        if indices is None:
+            indices = range(self.num_envs)
+        for i, action in zip(indices, actions):
+            self.remotes[i].send(('step', action))
+        return _receive([self.remotes[i] for i in indices])
+
+    def call(self, name, *args):
+        """
+        calls a session method in every environment and returns the results
+        """
+        for remote in self.remotes:
+            remote.send(('call', (name, args)))
+        return _receive(self.remotes)
+
+    def call_one(self, index, name, *args):
+        """
+        calls a session method in one environment and returns the result
+        """
+        self.remotes[index].send(('call', (name, args)))
+        return _receive([self.remotes[index]])[0]
+
+    def get_attr(self, name):
+        """
+        returns the value of a session attribute from every environment
+        """
+        for remote in self.remotes:
+            remote.send(('getattr', name))
+        return _receive(self.remotes)
+
+    def close(self):
+        for remote, process in zip(self.remotes, self.processes):
+            if process.is_alive():
+                try:
+                    remote.send(('close', None))
+                except (BrokenPipeError, EOFError):
+                    pass
+            process.join(timeout=5)
+        self.remotes, self.processes = [], []
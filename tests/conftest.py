@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import sys
+import argparse
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from throughput import setup, session_params
+
+def failing_binary(binary, failures):
+    """
+    wraps a binary: a run whose arguments contain a key of failures does what its value says instead
+    ('crash' exits with an error on stderr, 'hang' sleeps for a minute). Returns the path of the wrapper.
+    """
+    wrapper = binary + '-failing'
+    cases = ''.join('  *"{}"*) {};;\n'.format(pattern, \
+        'echo "Segmentation fault" >&2; exit 139' if action == 'crash' else 'sleep 60') \
+        for pattern, action in failures.items())
+    with open(wrapper, 'w') as f:
+        f.write('#!/bin/sh\ncase "$*" in\n' + cases + 'esac\nexec "' + binary + '" "$@"\n')
+    os.chmod(wrapper, 0o755)
+    return wrapper
+
+@pytest.fixture
+def fake_abc(tmp_path, monkeypatch):
+    """
+    the stand-in ABC and yosys of the benchmarks on the PATH; returns a function making the session params
+    """
+    args = argparse.Namespace(design_seed=0, startup_latency=0, latency=0, map_latency=0, iterations=6)
+    work_dir = str(tmp_path)
+    for name, value in setup(work_dir, args).items():
+        monkeypatch.setenv(name, value)
+
+    def params(**configuration):
+        return session_params(work_dir, 'test', configuration, args)
+    return params
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+from drills.abc_engine import ABCEngine, ABCEngineError
+
+def test_batches_are_delimited_and_keep_the_network(fake_abc):
+    params = fake_abc()
+    engine = ABCEngine(params['abc_binary'], ['read ' + params['mapping']['library_file']], timeout=30)
+    try:
+        assert engine.run(['echo first']) == b'first\n'
+        assert engine.run(['read ' + params['design_file'], 'strash', 'echo second']) == b'second\n'
+        # the network read by the previous batch is still loaded
+        stats = engine.run(['print_stats'])
+        assert stats.count(b'\n') == 1 and b'nd =' in stats and b'nd =     0' not in stats
+        assert engine.ping() and engine.restarts == 0
+    finally:
+        engine.close()
+    assert not engine.ping()
+
+def test_prompts_and_terminal_escapes_are_dropped():
+    output = b'abc 01> \x1b[1mread design.v\x1b[0m\r\n\r\nabc 02> top : i/o = 1/ 1\r\n'
+    assert ABCEngine._clean(ABCEngine, output) == b'read design.v\ntop : i/o = 1/ 1\n'
+
+def test_a_hanging_batch_times_out_and_restarts_the_engine(fake_abc, monkeypatch):
+    params = fake_abc()
+    # every optimization of the design then takes minutes
+    monkeypatch.setenv('FAKE_ABC_LATENCY', '100')
+    engine = ABCEngine(params['abc_binary'], timeout=30)
+    try:
+        with pytest.raises(ABCEngineError, match='timed out'):
+            engine.run(['read ' + params['design_file'], 'strash', 'rewrite'], timeout=0.5)
+        assert engine.restarts == 1 and engine.is_alive()
+        assert engine.run(['echo alive']) == b'alive\n'
+    finally:
+        engine.close()
+
+def test_a_crashed_engine_is_restarted(fake_abc):
+    engine = ABCEngine(fake_abc()['abc_binary'], timeout=30)
+    try:
+        # ABC exits before the sentinel is echoed
+        with pytest.raises(ABCEngineError, match='exited'):
+            engine.run(['quit'])
+        assert engine.restarts == 1
+        # and dies between two batches
+        engine.proc.kill()
+        engine.proc.wait()
+        assert engine.run(['echo back']) == b'back\n'
+        assert engine.restarts == 2
+    finally:
+        engine.close()
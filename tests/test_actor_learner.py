@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import shutil
+import numpy as np
+from types import SimpleNamespace
+from conftest import failing_binary
+from drills.scl_session import SCLSession
+from drills.normalizer import Normalizer
+from drills.profiler import Profiler
+from drills.actor_learner import ActorLearner, actor_probabilities
+from throughput import OPTIMIZATIONS
+
+def numpy_agent():
+    """
+    the parts of the A2C agent the learner uses, with a one-layer policy in NumPy and updates recorded
+    """
+    weights = [np.zeros((9, len(OPTIMIZATIONS))), np.zeros(len(OPTIMIZATIONS))]
+    agent = SimpleNamespace(game_class=SCLSession, session_states=[], normalizer=Normalizer(9), profiler=Profiler(), \
+        profile_writer=None, num_actions=len(OPTIMIZATIONS), episode=0, updates=[])
+    agent.actor_weights = lambda: weights
+    agent.action_probabilities = lambda states: actor_probabilities(weights, states)
+    agent.discount_and_normalize_rewards = lambda rewards: np.asarray(rewards, dtype=float)
+    agent.update = lambda states, actions, discounted, importance_weights: agent.updates.append(states)
+    agent.checkpoint = lambda reward: None
+    return agent
+
+def test_a_design_that_fails_to_evaluate_is_dropped(fake_abc):
+    params = fake_abc(iterations=3)
+    broken_design = os.path.join(os.path.dirname(params['design_file']), 'broken.v')
+    shutil.copy(params['design_file'], broken_design)
+    params['abc_binary'] = failing_binary(params['abc_binary'], {'broken.v': 'crash'})
+    params['designs'] = [params['design_file'], broken_design]
+    params['actor_learner'] = {'actors': 2}
+
+    agent = numpy_agent()
+    learner = ActorLearner(agent, params)
+    # both actors keep playing the design that can be evaluated
+    rewards = learner.train(6)
+    assert len(rewards) == 6 and len(agent.updates) == 6
+    assert list(learner.scheduler.failed) == [0, 1]
+    assert [len(rewards) for rewards in learner.design_rewards] == [6, 0]
+
+def test_the_learner_keeps_the_normalizer_of_the_actors(fake_abc):
+    params = fake_abc(iterations=3, keep_normalizer_statistics=True)
+    params['actor_learner'] = {'actors': 1}
+    agent = numpy_agent()
+    # the statistics of a resumed model, which the actor continues from
+    for state in np.random.RandomState(0).rand(5, 9):
+        agent.normalizer.observe(state)
+
+    learner = ActorLearner(agent, params)
+    learner.train(3)
+    # every state the actor observed, including the last one of each episode that is not trained on
+    assert agent.normalizer.n == 5 + sum(len(states) + 1 for states in agent.updates)
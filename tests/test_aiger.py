@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+import pytest
+from drills.aiger import read_aiger, _decode
+
+# out = ~(a & b & ~a), written as and gates 6 = 4 & 2 and 8 = 6 & ~2
+AAG = b'aag 4 2 0 1 2\n2\n4\n9\n6 4 2\n8 6 3\n'
+# the same circuit in binary AIGER: the inputs are implicit, each gate is two deltas (6-4, 4-2, 8-6, 6-3)
+AIG = b'aig 4 2 0 1 2\n9\n' + bytes([2, 2, 2, 3])
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+def test_decode_variable_length_integers():
+    # 300 takes two bytes: its low 7 bits with the continuation bit set, then 300 >> 7
+    assert _decode(np.array([0xAC, 0x02, 0x05, 0x7F], dtype=np.uint8), 3).tolist() == [300, 5, 127]
+    assert _decode(np.array([0x05], dtype=np.uint8), 0).tolist() == []
+    with pytest.raises(ValueError):
+        _decode(np.array([0x05, 0x80], dtype=np.uint8), 2)
+
+def test_ascii_and_binary_files_read_the_same(tmp_path):
+    ascii_aig = read_aiger(write(tmp_path, 'design.aag', AAG))
+    binary_aig = read_aiger(write(tmp_path, 'design.aig', AIG))
+    for aig in [ascii_aig, binary_aig]:
+        assert (aig.num_inputs, aig.num_latches, aig.num_outputs, aig.num_ands) == (2, 0, 1, 2)
+        assert aig.fanin0.tolist() == [4, 6]
+        assert aig.fanin1.tolist() == [2, 3]
+        assert aig.depth() == 2
+        assert aig.complemented_edges() == 2
+        assert aig.fanouts().tolist() == [0, 2, 1, 1, 1]
+    assert ascii_aig.structural_hash() == binary_aig.structural_hash()
+
+def test_structural_hash_ignores_the_gate_numbering(tmp_path):
+    # two gates on the same inputs, listed in either order
+    first = read_aiger(write(tmp_path, 'first.aag', b'aag 4 2 0 2 2\n2\n4\n6\n8\n6 4 2\n8 5 2\n'))
+    second = read_aiger(write(tmp_path, 'second.aag', b'aag 4 2 0 2 2\n2\n4\n8\n6\n6 5 2\n8 4 2\n'))
+    other = read_aiger(write(tmp_path, 'other.aag', b'aag 4 2 0 2 2\n2\n4\n6\n8\n6 4 2\n8 4 3\n'))
+    assert first.structural_hash() == second.structural_hash()
+    assert first.structural_hash() != other.structural_hash()
+
+def test_malformed_headers_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        read_aiger(write(tmp_path, 'bad.aag', b'aag 5 2 0 1 2\n2\n4\n9\n6 4 2\n8 6 3\n'))
+    with pytest.raises(ValueError):
+        read_aiger(write(tmp_path, 'bad.blif', b'.model design\n'))
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import csv
+import sys
+import json
+import argparse
+import subprocess
+from conftest import ROOT
+from throughput import OPTIMIZATIONS, baseline_data
+from drills.evaluation_store import EvaluationStore
+
+def beam_search(data, run_dir):
+    """
+    runs the beam search on the data in run_dir and returns its log, and its results as
+    (level, rank, sequence, delay, area) rows
+    """
+    os.makedirs(run_dir)
+    data = dict(data, output_dir=os.path.join(run_dir, 'result'))
+    data_file = os.path.join(run_dir, 'data.yml')
+    with open(data_file, 'w') as f:
+        json.dump(data, f)
+    subprocess.check_output([sys.executable, os.path.join(ROOT, 'baseline', 'beam-search', 'beam-search.py'), \
+        data_file], cwd=run_dir, stderr=subprocess.STDOUT)
+    with open(os.path.join(data['output_dir'], 'beam-search.log')) as f:
+        text_log = f.read()
+    with open(os.path.join(data['output_dir'], 'results.csv')) as f:
+        rows = [(int(level), int(rank), sequence.strip().split('; '), float(delay), float(area)) \
+            for level, rank, sequence, delay, area in csv.reader(f)]
+    return text_log, rows
+
+def test_beam_search_keeps_the_best_sequences_of_every_level(fake_abc, tmp_path):
+    work_dir = os.path.dirname(fake_abc()['design_file'])
+    data = baseline_data(work_dir, argparse.Namespace(iterations=3))
+    data.update({'beam_width': 2, 'objective': 'area', 'jobs': 2, 'executor': {'timeout': 60, 'retries': 0}, \
+        'result_cache': str(tmp_path / 'result_cache.db'), 'evaluation_store': str(tmp_path / 'evaluations.db')})
+    text_log, rows = beam_search(data, str(tmp_path / 'first'))
+
+    assert [(level, rank) for level, rank, _, _, _ in rows] == [(0, 0), (0, 1), (1, 0), (1, 1), (2, 0), (2, 1)]
+    for level, rank, sequence, delay, area in rows:
+        assert len(sequence) == level + 1 and set(sequence) <= set(OPTIMIZATIONS)
+    for level in range(3):
+        ranked = [(area, delay) for row_level, _, _, delay, area in rows if row_level == level]
+        assert ranked == sorted(ranked)
+    # every level expands the beam of the previous one
+    for level in range(1, 3):
+        parents = [sequence for row_level, _, sequence, _, _ in rows if row_level == level - 1]
+        assert all(sequence[:-1] in parents for row_level, _, sequence, _, _ in rows if row_level == level)
+    best = min(rows, key=lambda row: (row[4], row[3]))
+    assert 'Best sequence: ' + '; '.join(best[2]) + ' -> delay: ' + str(best[3]) + ', area: ' + str(best[4]) in text_log
+    # the initial design, then every optimization on each entry of the beam
+    assert 'ABC runs: ' + str(1 + len(OPTIMIZATIONS) * (1 + 2 + 2)) in text_log
+
+    # the candidates are recorded, not the initial design
+    store = EvaluationStore(data['evaluation_store'])
+    assert store.stats() == {'beam search': len(OPTIMIZATIONS) * (1 + 2 + 2)}
+    store.close()
+
+    # a second run finds every candidate in the result cache
+    text_log, second_rows = beam_search(data, str(tmp_path / 'second'))
+    assert second_rows == rows
+    assert 'ABC runs: 1\n' in text_log
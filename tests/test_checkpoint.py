@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import glob
+import json
+import time
+import pytest
+import numpy as np
+
+tf = pytest.importorskip('tensorflow', exc_type=ImportError)
+from drills.checkpoint import Checkpointer, latest_checkpoint
+
+@pytest.fixture
+def variable():
+    tf.reset_default_graph()
+    variable = tf.Variable(0.0)
+    session = tf.Session()
+    session.run(tf.global_variables_initializer())
+    yield session, variable
+    session.close()
+
+def test_checkpoint_policy(variable, tmp_path):
+    session, _ = variable
+    checkpointer = Checkpointer(session, str(tmp_path / 'model.ckpt'), \
+        {'every_episodes': 2, 'every_minutes': 1, 'on_best_reward': True})
+    try:
+        assert not checkpointer.should_save(1)
+        assert checkpointer.should_save(1, 1.0)
+        assert not checkpointer.should_save(1, 0.5)
+        assert checkpointer.best_reward == 1.0
+        assert checkpointer.should_save(2)
+        checkpointer.save(2, wait=True)
+        assert not checkpointer.should_save(3)
+        assert checkpointer.should_save(4)
+        checkpointer.last_time = time.time() - 61
+        assert checkpointer.should_save(3)
+    finally:
+        checkpointer.close()
+
+def test_checkpoints_rotate_with_their_sidecars(variable, tmp_path):
+    session, weight = variable
+    model_dir = str(tmp_path / 'model.ckpt')
+
+    def sidecar(episode):
+        def write(path):
+            with open(path, 'w') as f:
+                f.write(str(episode))
+        return [('.txt', write)]
+
+    checkpointer = Checkpointer(session, model_dir, {'keep': 2})
+    for episode in range(1, 4):
+        session.run(weight.assign(float(episode)))
+        checkpointer.save(episode, sidecar(episode), wait=episode < 3)
+    # the values are snapshot when saving: training goes on while they are written
+    session.run(weight.assign(99.0))
+    checkpointer.close()
+
+    assert latest_checkpoint(model_dir) == model_dir + '-3'
+    assert sorted(glob.glob(model_dir + '-*.txt')) == [model_dir + '-2.txt', model_dir + '-3.txt']
+    assert not glob.glob(model_dir + '-1.*')
+    tf.train.Saver().restore(session, latest_checkpoint(model_dir))
+    assert session.run(weight) == 3.0
+
+    # a resumed run keeps rotating the checkpoints of the previous one
+    checkpointer = Checkpointer(session, model_dir, {'keep': 2})
+    for episode in range(4, 6):
+        checkpointer.save(episode, sidecar(episode), wait=True)
+    checkpointer.close()
+    assert sorted(glob.glob(model_dir + '-*.txt')) == [model_dir + '-4.txt', model_dir + '-5.txt']
+    assert not glob.glob(model_dir + '-3.*')
+
+def test_training_resumes_from_the_latest_checkpoint(fake_abc, tmp_path):
+    from drills.model import A2C
+    params = fake_abc(iterations=3, profile=False, model_dir=str(tmp_path / 'model.ckpt'), \
+        checkpoint={'every_episodes': 1, 'keep': 2})
+
+    tf.reset_default_graph()
+    agent = A2C(params)
+    for _ in range(2):
+        agent.train_episode()
+    agent.close()
+    with open(latest_checkpoint(params['model_dir']) + '.state.json') as f:
+        state = json.load(f)
+    weights = agent.actor_weights()
+    statistics = agent.normalizer.statistics()
+
+    tf.reset_default_graph()
+    resumed = A2C(params, load_model=True)
+    try:
+        assert latest_checkpoint(params['model_dir']) == params['model_dir'] + '-2'
+        assert resumed.episode == 2
+        assert resumed.checkpointer.last_episode == 2
+        assert resumed.checkpointer.best_reward == state['best_reward']
+        assert resumed.game.training_state() == state['sessions'][0]
+        assert np.random.get_state()[1].tolist() == state['rng'][1]
+        assert resumed.normalizer.n == statistics['n']
+        assert np.array_equal(resumed.normalizer.mean, statistics['mean'])
+        for restored, trained in zip(resumed.actor_weights(), weights):
+            assert np.array_equal(restored, trained)
+    finally:
+        resumed.close()
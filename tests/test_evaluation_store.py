@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+from drills.evaluation_store import EvaluationStore
+
+def design(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+def test_store_round_trip_and_best(tmp_path):
+    design_file = design(tmp_path, 'adder.v', 'module adder; endmodule\n')
+    library_file = design(tmp_path, 'tech.lib', 'library (tech) { }\n')
+    path = str(tmp_path / 'evaluations.db')
+    store = EvaluationStore(path, 'greedy')
+    store.record(design_file, library_file, 'map', ['strash', 'rewrite'], {'delay': 100, 'area': 50}, [1, 2], 0.5)
+    store.record(design_file, library_file, 'map', ['strash', 'balance'], {'delay': 200, 'area': 40})
+    # a sequence is recorded once per source
+    store.record(design_file, library_file, 'map', ['strash', 'balance'], {'delay': 300, 'area': 30})
+    store.close()
+
+    store = EvaluationStore(path, 'drills')
+    store.record(design_file, library_file, 'map', ['strash', 'resub'], {'delay': 150, 'area': 45})
+    assert store.stats() == {'greedy': 2, 'drills': 1}
+
+    best = store.best(design_file, 'area')
+    assert [result['sequence'] for result in best] == [['strash', 'balance']]
+    assert best[0]['area'] == 40 and best[0]['source'] == 'greedy'
+    # by design name, under a delay constraint, from one source
+    assert [result['sequence'][-1] for result in store.best('adder', 'area', max_delay=160, limit=3)] == \
+        ['resub', 'rewrite']
+    assert [result['sequence'][-1] for result in store.best(design_file, 'delay', source='drills')] == ['resub']
+    assert store.best('multiplier') == []
+
+    with_features = list(store.evaluations(design_file, with_features=True))
+    assert [(result['sequence'], result['features'], result['seconds']) for result in with_features] == \
+        [(['strash', 'rewrite'], [1.0, 2.0], 0.5)]
+    store.close()
+
+def test_best_filters_by_library_and_mapping(tmp_path):
+    design_file = design(tmp_path, 'adder.v', 'module adder; endmodule\n')
+    library_file = design(tmp_path, 'tech.lib', 'library (tech) { }\n')
+    other_library = design(tmp_path, 'other.lib', 'library (other) { }\n')
+    store = EvaluationStore(str(tmp_path / 'evaluations.db'), 'beam search')
+    store.record(design_file, library_file, 'map -D 150; topo; stime', ['strash', 'rewrite'], {'delay': 100, 'area': 50})
+    store.record(design_file, library_file, 'map -D 100; topo; stime', ['strash', 'balance'], {'delay': 90, 'area': 40})
+    store.record(design_file, other_library, 'map -D 150; topo; stime', ['strash', 'resub'], {'delay': 80, 'area': 30})
+
+    assert store.best(design_file)[0]['sequence'][-1] == 'resub'
+    best = store.best(design_file, limit=3, library_file=library_file, mapping='map -D 150; topo; stime')
+    assert [result['sequence'][-1] for result in best] == ['rewrite']
+    assert [result['sequence'][-1] for result in store.best(design_file, limit=3, library_file=library_file)] == \
+        ['balance', 'rewrite']
+    store.close()
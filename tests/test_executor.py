@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import time
+import pickle
+import pytest
+from drills import executor as executor_module
+from drills.executor import Executor, ExecutionError
+
+def is_running(pid):
+    try:
+        with open('/proc/' + str(pid) + '/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+def test_timeout_kills_the_process_group(tmp_path):
+    pid_file = str(tmp_path / 'pid')
+    executor = Executor(timeout=0.5)
+    start = time.time()
+    with pytest.raises(ExecutionError) as error:
+        executor.run(['sh', '-c', 'sleep 30 & echo $! > ' + pid_file + '; wait'])
+    assert time.time() - start < 10
+    assert error.value.reason == 'timed out after 0.5s'
+    with open(pid_file) as f:
+        child = int(f.read())
+    # the child of the shell, in the same process group, is killed with it
+    for _ in range(50):
+        if not is_running(child):
+            break
+        time.sleep(0.1)
+    assert not is_running(child)
+    assert executor.stats() == {'calls': 1, 'retried': 0, 'timeouts': 1, 'failures': 1}
+
+def test_retries_back_off(monkeypatch):
+    delays = []
+    monkeypatch.setattr(executor_module.time, 'sleep', delays.append)
+    executor = Executor(retries=3, retry_delay=0.5)
+    with pytest.raises(ExecutionError) as error:
+        executor.run(['sh', '-c', 'echo failing >&2; exit 3'])
+    assert delays == [0.5, 1.0, 2.0]
+    assert error.value.attempts == 4
+    assert error.value.reason == 'exited with 3'
+    assert error.value.stderr.strip() == b'failing'
+    assert executor.stats() == {'calls': 1, 'retried': 3, 'timeouts': 0, 'failures': 1}
+
+def test_retry_succeeds_after_a_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor_module.time, 'sleep', lambda seconds: None)
+    marker = str(tmp_path / 'marker')
+    # fails the first time only, leaving the marker for the retry
+    command = ['sh', '-c', 'if [ -e ' + marker + ' ]; then echo done; else touch ' + marker + '; exit 1; fi']
+    assert Executor(retries=1).run(command) == b'done\n'
+
+def test_rejected_output_is_retried(monkeypatch):
+    monkeypatch.setattr(executor_module.time, 'sleep', lambda seconds: None)
+    def check(stdout):
+        if b'Delay' not in stdout:
+            raise ValueError('no delay')
+    with pytest.raises(ExecutionError) as error:
+        Executor(retries=1).run(['echo', 'area'], check)
+    assert error.value.reason == 'printed unexpected output (ValueError: no delay)'
+    assert error.value.stdout == b'area\n'
+
+def test_execution_error_survives_pickling():
+    error = ExecutionError(['yosys-abc', '-c', 'strash'], 'exited with 139', 3, b'Segmentation fault\n', b'abc 01>')
+    copy = pickle.loads(pickle.dumps(error))
+    assert isinstance(copy, ExecutionError)
+    assert (copy.command, copy.reason, copy.attempts, copy.stderr, copy.stdout) == \
+        (error.command, error.reason, error.attempts, error.stderr, error.stdout)
+    assert str(copy) == str(error)
+
+def test_from_params():
+    executor = Executor.from_params({'executor': {'timeout': 10, 'retries': 2}})
+    assert (executor.timeout, executor.retries, executor.retry_delay) == (10, 2, 1.0)
+    executor = Executor.from_params({})
+    assert (executor.timeout, executor.retries) == (None, 0)
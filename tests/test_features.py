@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+from conftest import failing_binary
+from drills.scl_session import SCLSession
+from throughput import OPTIMIZATIONS
+
+def states(params, opts):
+    session = SCLSession(params)
+    session.reset()
+    return [session.step(OPTIMIZATIONS.index(opt)) for opt in opts]
+
+def test_yosys_is_the_default_feature_extractor(fake_abc, tmp_path):
+    params = fake_abc()
+    assert 'feature_extractor' not in params
+    # a wrapper recording the netlist of each yosys run
+    runs = tmp_path / 'yosys-runs'
+    wrapper = tmp_path / 'yosys'
+    wrapper.write_text('#!/bin/sh\necho "$*" >> "' + str(runs) + '"\nexec "' + params['yosys_binary'] + '" "$@"\n')
+    wrapper.chmod(0o755)
+    params['yosys_binary'] = str(wrapper)
+
+    session = SCLSession(params)
+    assert session.feature_extractor == 'yosys'
+    session.reset()
+    for opt in ['rewrite', 'balance']:
+        _, _, _, info = session.step(OPTIMIZATIONS.index(opt))
+        assert info is None
+    launches = runs.read_text().splitlines()
+    assert len(launches) == 3
+    assert all(os.path.join(session.network_dir, str(iteration) + '.v') in launch \
+        for iteration, launch in enumerate(launches, 1))
+
+def test_failing_yosys_fails_the_step_under_the_default_extractor(fake_abc):
+    params = fake_abc()
+    params['yosys_binary'] = failing_binary(params['yosys_binary'], {'stat': 'crash'})
+    assert SCLSession(params).reset() is None
+
+def test_netlist_features_agree_with_the_stand_in_yosys(fake_abc):
+    # the stand-in yosys of the benchmarks counts the operators of the netlist as netlist_stats does, so this
+    # checks the feature plumbing only: against a real yosys, whose passes merge and rewrite the expressions,
+    # the 'netlist' gate counts are an approximation
+    yosys = states(fake_abc(feature_extractor='yosys'), ['rewrite', 'balance', 'resub'])
+    netlist = states(fake_abc(feature_extractor='netlist', playground_dir=fake_abc()['playground_dir'] + '-netlist'), \
+        ['rewrite', 'balance', 'resub'])
+    for (yosys_state, _, _, yosys_info), (netlist_state, _, _, netlist_info) in zip(yosys, netlist):
+        assert yosys_info is None and netlist_info is None
+        assert (yosys_state == netlist_state).all()
@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import shutil
+import numpy as np
+from types import SimpleNamespace
+from conftest import failing_binary
+from drills.scl_session import SCLSession
+from drills.inference import optimize_designs
+from throughput import OPTIMIZATIONS
+
+def uniform_agent():
+    """
+    an agent whose policy picks every optimization with the same probability
+    """
+    return SimpleNamespace(game_class=SCLSession, state_size=9, keep_normalizer_statistics=False, \
+        action_probabilities=lambda states: np.full((len(states), len(OPTIMIZATIONS)), 1.0 / len(OPTIMIZATIONS)))
+
+def test_designs_that_fail_to_evaluate_are_skipped(fake_abc, tmp_path):
+    params = fake_abc(iterations=3)
+    broken_design = os.path.join(os.path.dirname(params['design_file']), 'broken.v')
+    shutil.copy(params['design_file'], broken_design)
+    params['abc_binary'] = failing_binary(params['abc_binary'], {'broken.v': 'crash'})
+
+    output_dir = str(tmp_path / 'optimized')
+    best = optimize_designs(uniform_agent(), params, [params['design_file'], broken_design], top_k=2, jobs=2, \
+        output_dir=output_dir)
+    assert list(best) == [params['design_file']]
+    assert os.listdir(output_dir) == ['design_drills.tcl']
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import gzip
+import json
+import time
+import pytest
+
+from drills.log_writer import LogWriter, log_path
+
+COLUMNS = ['iteration', 'optimization', 'area']
+
+def read(path):
+    with (gzip.open(path, 'rt') if path.endswith('.gz') else open(path)) as f:
+        return f.read()
+
+def test_log_path():
+    assert log_path('playground/1/log') == 'playground/1/log.csv'
+    assert log_path('playground/1/log', 'jsonl.gz') == 'playground/1/log.jsonl.gz'
+    with pytest.raises(ValueError):
+        log_path('playground/1/log', 'xml')
+
+def test_records_are_written_in_batches(tmp_path):
+    path = str(tmp_path / 'logs' / 'log.csv')
+    writer = LogWriter(path, COLUMNS, buffer_size=3, flush_seconds=60)
+    writer.write([1, 'rewrite', 10.5])
+    assert read(path) == ''
+    writer.write([2, 'balance', 9.0])
+    assert read(path) == ''
+    writer.write([3, 'refactor', 8.0])
+    assert read(path) == 'iteration, optimization, area\n1, rewrite, 10.5\n2, balance, 9.0\n3, refactor, 8.0\n'
+
+    writer.write([4, 'resub', 7.5])
+    writer.last_flush = time.time() - 61
+    writer.write([5, 'resub', 7.0])
+    assert read(path).endswith('4, resub, 7.5\n5, resub, 7.0\n')
+
+    writer.write([6, 'rewrite', 6.5])
+    writer.close()
+    assert read(path).endswith('6, rewrite, 6.5\n')
+    writer.close()
+
+def test_gzipped_json_lines_are_complete_once_closed(tmp_path):
+    path = log_path(str(tmp_path / 'log'), 'jsonl.gz')
+    writer = LogWriter(path, COLUMNS, flush_seconds=60)
+    records = [[i, 'rewrite', float(i)] for i in range(5)]
+    for record in records:
+        writer.write(record)
+    writer.flush()
+    writer.write([5, 'balance', 5.0])
+    writer.close()
+
+    # appending adds a gzip member of its own, read on as one stream
+    writer = LogWriter(path, COLUMNS, mode='a')
+    writer.write([6, 'refactor', 6.0])
+    writer.close()
+
+    lines = read(path).splitlines()
+    assert [json.loads(line) for line in lines] == \
+        [dict(zip(COLUMNS, record)) for record in records + [[5, 'balance', 5.0], [6, 'refactor', 6.0]]]
+
+def test_appended_csv_has_one_header(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    for i in range(2):
+        writer = LogWriter(path, COLUMNS, mode='a')
+        writer.write([i, 'rewrite', 1.0])
+        writer.close()
+    assert read(path) == 'iteration, optimization, area\n0, rewrite, 1.0\n1, rewrite, 1.0\n'
+
+def test_text_log(tmp_path):
+    path = str(tmp_path / 'run.log')
+    writer = LogWriter(path, mode='a')
+    writer.write('Iteration: 1')
+    writer.close()
+    assert read(path) == 'Iteration: 1\n'
@@ -0,0 +1,28 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+from drills import mcts
+from drills.mcts import MCTS
+from drills.scl_session import SCLSession
+from drills.vec_session import VecSession
+
+def test_only_the_environments_assigned_a_leaf_are_reset(fake_abc, tmp_path, monkeypatch):
+    resets = []
+    class RecordingVecSession(VecSession):
+        def reset(self, indices=None):
+            resets.append(None if indices is None else list(indices))
+            return super().reset(indices)
+    monkeypatch.setattr(mcts, 'VecSession', RecordingVecSession)
+
+    params = fake_abc(iterations=4, failed_step_reward=-7, mcts={'rollout_depth': 2})
+    search = MCTS(SCLSession, params, jobs=3)
+    assert search.failed_step_reward == -7
+    record, sequence = search.search(4, output_dir=str(tmp_path / 'optimized'))
+    assert sequence[0] == 'strash'
+    # the root is evaluated on every environment, then 3 leaves are simulated and 1 more
+    assert resets == [None, [0, 1, 2], [0]]
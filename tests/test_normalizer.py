@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+from drills.normalizer import Normalizer
+
+def observed(states):
+    normalizer = Normalizer(states.shape[1])
+    for state in states:
+        normalizer.observe(state)
+    return normalizer
+
+def test_running_statistics_match_numpy():
+    states = np.random.RandomState(0).normal([10, -5, 1000], [1, 3, 200], size=(200, 3))
+    normalizer = observed(states)
+    assert normalizer.n == 200
+    assert np.allclose(normalizer.mean, np.mean(states, axis=0))
+    assert np.allclose(np.sqrt(normalizer.var), np.std(states, axis=0))
+    assert np.allclose(normalizer.normalize(states), (states - np.mean(states, axis=0)) / np.std(states, axis=0))
+
+def test_variance_is_clipped():
+    # a constant feature would divide by zero
+    normalizer = observed(np.array([[1.0, 2.0], [1.0, 4.0]]))
+    assert normalizer.var.tolist() == [1e-2, 1.0]
+    assert np.allclose(normalizer.normalize(np.array([1.0, 3.0])), [0.0, 0.0])
+
+def test_save_and_restore(tmp_path):
+    normalizer = observed(np.random.RandomState(1).uniform(0, 10, size=(20, 4)))
+    path = str(tmp_path / 'normalizer.npz')
+    normalizer.save(path)
+
+    restored = Normalizer(4)
+    restored.restore(path)
+    assert restored.n == normalizer.n
+    for name in ['mean', 'mean_diff', 'var']:
+        assert np.array_equal(getattr(restored, name), getattr(normalizer, name))
+    # observing continues from the restored statistics
+    state = np.arange(4.0)
+    normalizer.observe(state)
+    restored.observe(state)
+    assert np.allclose(restored.normalize(state), normalizer.normalize(state))
+
+    restored.reset()
+    assert restored.n == 0 and not restored.mean.any()
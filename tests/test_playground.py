@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import gzip
+import pytest
+from drills.playground import Playground
+
+def write_step(directory, iteration, size=10):
+    path = os.path.join(directory, str(iteration) + '.aig')
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    return path
+
+def run_episode(playground, episode_dir, qors, best_steps=()):
+    """
+    adds a step of each QoR to a new episode and returns the files they wrote
+    """
+    os.makedirs(episode_dir)
+    network_dir = playground.start_episode(episode_dir)
+    files = []
+    for iteration, qor in enumerate(qors):
+        files.append(write_step(network_dir, iteration))
+        playground.add((1, iteration), [files[-1], None], qor, best_steps)
+    return files
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        Playground('latest')
+
+def test_all_keeps_every_network(tmp_path):
+    playground = Playground('all')
+    files = run_episode(playground, str(tmp_path / '1'), [3, 2, 1])
+    assert playground.finish_episode() == (30, 30)
+    assert all(os.path.exists(path) for path in files)
+
+def test_compress_gzips_the_networks_at_the_end_of_the_episode(tmp_path):
+    playground = Playground('compress')
+    files = run_episode(playground, str(tmp_path / '1'), [3, 2])
+    assert all(os.path.exists(path) for path in files)
+    playground.finish_episode()
+    for path in files:
+        assert not os.path.exists(path)
+        with gzip.open(path + '.gz') as f:
+            assert f.read() == b'x' * 10
+
+def test_best_keeps_the_current_and_best_known_steps(tmp_path):
+    playground = Playground('best')
+    files = run_episode(playground, str(tmp_path / '1'), [3, 2, 1, 4], best_steps=[(1, 1)])
+    assert [os.path.exists(path) for path in files] == [False, True, False, True]
+
+def test_top_k_keeps_the_current_and_best_qor_steps(tmp_path):
+    playground = Playground('top_k', top_k=2)
+    files = run_episode(playground, str(tmp_path / '1'), [3, 1, 4, 2, 5])
+    assert [os.path.exists(path) for path in files] == [False, True, False, True, True]
+
+def test_scratch_networks_are_moved_to_the_episode(tmp_path):
+    playground = Playground('top_k', top_k=1, scratch_dir=str(tmp_path / 'scratch'))
+    episode_dir = str(tmp_path / 'playground' / '1')
+    files = run_episode(playground, episode_dir, [2, 1, 3])
+    assert all(path.startswith(str(tmp_path / 'scratch')) for path in files)
+    assert playground.finish_episode() == (30, 20)
+    assert sorted(os.listdir(episode_dir)) == ['1.aig', '2.aig']
+    assert not os.path.exists(os.path.dirname(files[0]))
+
+    # the kept networks of the episode are deleted from their new place once outranked
+    files = run_episode(playground, str(tmp_path / 'playground' / '2'), [0])
+    assert sorted(os.listdir(episode_dir)) == []
+    playground.close()
+    assert not os.path.exists(os.path.dirname(os.path.dirname(files[0])))
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+from drills.profiler import Profiler, ProfileWriter, PHASES
+from drills.scl_session import SCLSession
+from throughput import OPTIMIZATIONS
+
+def test_phases_accumulate_seconds_and_calls():
+    profiler = Profiler()
+    for _ in range(2):
+        with profiler.phase('policy'):
+            pass
+    profiler.add('train', 1.5)
+    profiler.merge({'train': (0.5, 2), 'env_step': (3.0, 4)})
+    assert profiler.times['policy'][1] == 2
+    assert profiler.times['train'] == [2.0, 3] and profiler.times['env_step'] == [3.0, 4]
+
+    disabled = Profiler(enabled=False)
+    with disabled.phase('policy'):
+        pass
+    disabled.add('train', 1.0)
+    disabled.add_abc_phases(['abc_optimize'], b'elapse: 1.00 seconds, total: 1.00 seconds\n')
+    assert not disabled.times
+
+def test_abc_phases_are_read_from_its_time_output():
+    profiler = Profiler()
+    output = b'elapse: 0.25 seconds, total: 0.25 seconds\nDelay = 10\nelapse: 0.50 seconds, total: 0.75 seconds\n'
+    profiler.add_abc_phases(['abc_optimize', 'abc_mapping'], output)
+    assert profiler.times == {'abc_optimize': [0.25, 1], 'abc_mapping': [0.5, 1]}
+    # not one time per phase (e.g. ABC failed midway): left out
+    profiler.add_abc_phases(['abc_optimize', 'abc_write', 'abc_mapping'], output)
+    assert profiler.times['abc_optimize'] == [0.25, 1]
+
+def test_profile_writer_formats(tmp_path):
+    times = {'abc_process': (1.25, 2), 'train': (0.5, 1)}
+    csv_file = str(tmp_path / 'profile' / 'profile.csv')
+    writer = ProfileWriter(csv_file)
+    writer.write(1, 2.0, times)
+    writer.close()
+    with open(csv_file) as f:
+        header, row = [line.strip().split(', ') for line in f]
+    assert header[:2] == ['episode', 'wall_time'] and len(header) == 2 + 2 * len(PHASES)
+    values = dict(zip(header, row))
+    assert float(values['abc_process']) == 1.25 and values['abc_process_calls'] == '2'
+    assert values['policy_calls'] == '0'
+
+    jsonl_file = str(tmp_path / 'profile.jsonl')
+    writer = ProfileWriter(jsonl_file)
+    writer.write(1, 2.0, times)
+    writer.close()
+    with open(jsonl_file) as f:
+        record = json.loads(f.readline())
+    assert record['phases']['train'] == {'seconds': 0.5, 'calls': 1}
+
+def test_session_steps_are_profiled(fake_abc):
+    session = SCLSession(fake_abc(profile=True))
+    session.reset()
+    session.step(OPTIMIZATIONS.index('rewrite'))
+    times = session.profiler.times
+    # the runs of the reset and the step, each timed inside ABC too
+    assert times['abc_process'][1] == 2
+    for phase in ['abc_optimize', 'abc_write', 'abc_mapping', 'abc_features']:
+        assert times[phase][1] == 2
+    assert set(times) <= set(PHASES)
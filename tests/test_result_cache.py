@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import shutil
+import itertools
+from drills import result_cache
+from drills.result_cache import ResultCache
+from drills.executor import Executor
+from baseline.common import ABCRunner
+
+def design(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+def test_key_depends_on_the_contents(tmp_path):
+    design_file = design(tmp_path, 'design.v', 'module design; endmodule\n')
+    library_file = design(tmp_path, 'tech.lib', 'library (tech) { }\n')
+    copy = str(tmp_path / 'copy.v')
+    shutil.copy(design_file, copy)
+    key = ResultCache.key(design_file, library_file, 'map', ['strash', 'rewrite'])
+    assert ResultCache.key(copy, library_file, 'map', ['strash', 'rewrite']) == key
+    assert ResultCache.key(design_file, library_file, 'map', ['strash', 'balance']) != key
+    assert ResultCache.key(design_file, library_file, 'if', ['strash', 'rewrite']) != key
+    other = design(tmp_path, 'other.v', 'module other; endmodule\n')
+    assert ResultCache.key(other, library_file, 'map', ['strash', 'rewrite']) != key
+
+def test_cache_round_trip(tmp_path):
+    path = str(tmp_path / 'cache' / 'results.db')
+    cache = ResultCache(path)
+    cache.put('a', {'delay': 1.5, 'area': 20.0}, b'netlist', '.blif')
+    cache.put('b', {'delay': 2.0, 'area': 10.0})
+    cache.close()
+
+    cache = ResultCache(path)
+    assert cache.get('a', '.blif') == ({'delay': 1.5, 'area': 20.0}, b'netlist')
+    assert cache.get('b') == ({'delay': 2.0, 'area': 10.0}, None)
+    # an entry without a netlist in the asked format is a miss
+    assert cache.get('a', '.aig') is None
+    assert cache.get('b', '.blif') is None
+    assert cache.get('c') is None
+    assert cache.stats() == {'hits': 2, 'misses': 3, 'entries': 2}
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(result_cache.time, 'time', lambda: float(next(clock)))
+    cache = ResultCache(str(tmp_path / 'results.db'), max_entries=2)
+    cache.put('a', {'area': 1})
+    cache.put('b', {'area': 2})
+    cache.get('a')
+    cache.put('c', {'area': 3})
+    cache.evict()
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+
+def test_baseline_keys_ignore_the_header_abc_writes(tmp_path):
+    library_file = design(tmp_path, 'tech.lib', 'library (tech) { }\n')
+    body = '.model top\n.inputs a b\n.outputs y\n.names a b y\n11 1\n.end\n'
+    first = design(tmp_path, 'first.blif', '# Benchmark "top" written by ABC on Mon Oct 19 10:00:00 2026\n' + body)
+    second = design(tmp_path, 'second.blif', '# Benchmark "top" written by ABC on Mon Oct 19 10:05:00 2026\n' + body)
+    other = design(tmp_path, 'other.blif', body.replace('11 1', '10 1'))
+    runner = ABCRunner(Executor(), library_file, 150)
+    assert ResultCache.key(first, library_file, runner.mapping, ['strash', 'rewrite']) != \
+        ResultCache.key(second, library_file, runner.mapping, ['strash', 'rewrite'])
+    assert runner.cache_key(first, 'rewrite') == runner.cache_key(second, 'rewrite')
+    assert runner.cache_key(first, 'rewrite') != runner.cache_key(other, 'rewrite')
+    assert runner.cache_key(first, 'rewrite') != runner.cache_key(first, 'balance')
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+model = pytest.importorskip('drills.model', exc_type=ImportError)
+
+def discounted(rewards, gamma=0.5):
+    return model.A2C.discount_and_normalize_rewards(SimpleNamespace(gamma=gamma), rewards)
+
+def test_empty_episode():
+    assert discounted([]).shape == (0,)
+
+def test_rewards_are_discounted_and_normalized():
+    # discounted: 1 + 0.5 * (2 + 0.5 * 4) = 3, 2 + 0.5 * 4 = 4, 4
+    expected = np.array([3.0, 4.0, 4.0])
+    assert np.allclose(discounted([1, 2, 4]), (expected - expected.mean()) / expected.std())
+
+def test_constant_returns_are_only_centered():
+    # one step, or discounted rewards of zero standard deviation, are not divided by it
+    assert discounted([5]).tolist() == [0.0]
+    assert discounted([2, 2], gamma=0.0).tolist() == [0.0, 0.0]
+
+def test_episodes_of_mixed_lengths():
+    # episodes ended early are normalized on their own, as the vectorized training does
+    episodes = [[1, -1, 2, 0, 3], [2, 1], [-3]]
+    normalized = [discounted(rewards) for rewards in episodes]
+    assert [len(rewards) for rewards in normalized] == [5, 2, 1]
+    for rewards in normalized:
+        assert abs(rewards.mean()) < 1e-9
+        assert len(rewards) == 1 or np.isclose(rewards.std(), 1.0)
+    assert np.concatenate(normalized).shape == (8,)
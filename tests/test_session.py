@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import json
+from conftest import failing_binary
+from drills.scl_session import SCLSession
+from drills.evaluation_store import EvaluationStore
+from throughput import OPTIMIZATIONS
+
+def test_failed_step_keeps_the_snapshot_under_best_retention(fake_abc):
+    params = fake_abc(incremental=True, playground_retention='best')
+    params['abc_binary'] = failing_binary(params['abc_binary'], {'refactor -z': 'crash'})
+    session = SCLSession(params)
+    session.reset()
+    state, _, _, info = session.step(OPTIMIZATIONS.index('rewrite'))
+    assert info is None
+    # best known records of another run, so the policy keeps no step of this episode but the current one
+    session._restore_best_known([(0, 0, 0, 0)] * 3)
+
+    failed_state, reward, _, info = session.step(OPTIMIZATIONS.index('refactor -z'))
+    assert info == {'failed': 'refactor -z'}
+    assert reward == session.failed_step_reward
+    assert (failed_state == state).all()
+    assert os.path.exists(session.snapshot_file)
+
+    _, _, _, info = session.step(OPTIMIZATIONS.index('balance'))
+    assert info is None
+    assert session._applied_sequence() == ['strash', 'rewrite', 'balance']
+
+def test_missing_snapshot_replays_the_sequence(fake_abc):
+    session = SCLSession(fake_abc(incremental=True))
+    commands = []
+    optimize_commands = session._optimize_commands
+    session._optimize_commands = lambda incremental_step: commands.append(optimize_commands(incremental_step)) or \
+        commands[-1]
+    session.reset()
+    snapshot_file = session.snapshot_file
+    session.step(OPTIMIZATIONS.index('rewrite'))
+    assert commands[-1] == session._read_commands(snapshot_file) + ['rewrite']
+
+    os.remove(session.snapshot_file)
+    _, _, _, info = session.step(OPTIMIZATIONS.index('balance'))
+    assert info is None
+    # the whole sequence, from the design
+    assert commands[-1] == session._read_commands(session.params['design_file']) + ['strash', 'rewrite', 'balance']
+    snapshot_file = session.snapshot_file
+    assert os.path.exists(snapshot_file)
+    # and incremental again from the snapshot it wrote
+    session.step(OPTIMIZATIONS.index('resub'))
+    assert commands[-1] == session._read_commands(snapshot_file) + ['resub']
+
+def test_stored_sequences_of_another_library_or_mapping_are_not_replayed(fake_abc, tmp_path):
+    store_file = str(tmp_path / 'evaluations.db')
+    session = SCLSession(fake_abc(evaluation_store=store_file))
+    session.reset()
+    session.step(OPTIMIZATIONS.index('rewrite'))
+    session.step(OPTIMIZATIONS.index('balance'))
+    recorded = session.stored_sequences()
+    assert sorted(recorded) == [['strash'], ['strash', 'rewrite'], ['strash', 'rewrite', 'balance']]
+
+    other_library = tmp_path / 'other.lib'
+    other_library.write_text('library (other) { }\n')
+    metrics = {'delay': 1, 'area': 1}
+    store = EvaluationStore(store_file, 'greedy')
+    store.record(session.params['design_file'], str(other_library), session._mapping_description(), \
+        ['strash', 'resub'], metrics)
+    store.record(session.params['design_file'], session._library_file(), 'map -D 1000; topo; stime', \
+        ['strash', 'refactor'], metrics)
+    store.close()
+    assert session.stored_sequences() == recorded
+
+def test_training_state_resumes_the_episodes_and_best_known(fake_abc):
+    params = fake_abc()
+    session = SCLSession(params)
+    for _ in range(2):
+        session.reset()
+        for opt in ['rewrite', 'balance']:
+            session.step(OPTIMIZATIONS.index(opt))
+    # saved as JSON with the checkpoint
+    state = json.loads(json.dumps(session.training_state()))
+    assert state['episode'] == 2
+
+    resumed = SCLSession(params)
+    resumed.restore_training_state(state)
+    assert resumed._best_known() == session._best_known()
+    resumed.reset()
+    # the next episode, in a playground directory of its own
+    assert resumed.episode == 3
+    assert resumed.episode_dir == os.path.join(params['playground_dir'], '3')
+    # the first step of the episode does not beat the best known results of the resumed training,
+    # as it does those of a new one
+    resumed.step(OPTIMIZATIONS.index('rewrite'))
+    assert resumed._best_known() == session._best_known()
+    fresh = SCLSession(dict(params, playground_dir=params['playground_dir'] + '-fresh'))
+    fresh.reset()
+    fresh.step(OPTIMIZATIONS.index('rewrite'))
+    assert fresh._best_known() != session._best_known()
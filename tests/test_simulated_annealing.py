@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import csv
+import sys
+import json
+import argparse
+import subprocess
+from conftest import ROOT
+from throughput import OPTIMIZATIONS, baseline_data
+
+def test_tempering_chains_log_apart_and_exchange_designs(fake_abc, tmp_path):
+    work_dir = os.path.dirname(fake_abc()['design_file'])
+    data = baseline_data(work_dir, argparse.Namespace(iterations=3))
+    # at the same temperature, neighbouring chains always swap; at 0.1 each chain stops after one level (100 trials)
+    data['output_dir'] = str(tmp_path / 'result')
+    data['simulated_annealing'] = {'initial_temp': 0.1, 'max_temp': 0.1, 'cooling_rate': 0.5, 'chains': 2, \
+        'mode': 'tempering', 'exchange_interval': 5, 'seed': 0}
+    data_file = str(tmp_path / 'data.yml')
+    with open(data_file, 'w') as f:
+        json.dump(data, f)
+    subprocess.check_output([sys.executable, os.path.join(ROOT, 'baseline', 'simulated-annealing', \
+        'simulated-annealing.py'), data_file], cwd=str(tmp_path), stderr=subprocess.STDOUT)
+
+    with open(os.path.join(data['output_dir'], 'chains.csv')) as f:
+        chains = list(csv.DictReader(f, skipinitialspace=True))
+    assert [chain['chain'] for chain in chains] == ['0', '1']
+    exchanges = [int(chain['exchanges']) for chain in chains]
+    assert exchanges[0] > 0 and exchanges[0] == exchanges[1]
+    for index, chain in enumerate(chains):
+        chain_dir = os.path.join(data['output_dir'], 'chain-' + str(index))
+        with open(os.path.join(chain_dir, 'greedy.log')) as f:
+            text_log = f.read()
+        assert text_log.count('Iteration: ') == int(chain['trials'])
+        assert text_log.count('Exchanged designs with chain ' + str(1 - index)) == exchanges[index]
+        # the swaps are not optimizations: the results hold the accepted trials only
+        with open(os.path.join(chain_dir, 'results.csv')) as f:
+            results = [row[1].strip() for row in csv.reader(f)]
+        assert results[0] == 'strash' and set(results[1:]) <= set(OPTIMIZATIONS)
+        assert len(results) == int(chain['accepted']) + 1
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+from drills.surrogate import Surrogate, store_transitions
+from drills.evaluation_store import EvaluationStore
+
+def test_fit_predict_and_prefilter(tmp_path):
+    rng = np.random.RandomState(0)
+    features = rng.rand(200, 3)
+    actions = rng.randint(2, size=200)
+    # rewrite shrinks the area with the first feature, balance the delay with the second
+    metric_changes = np.where(actions[:, None] == 0, np.stack([-features[:, 0], 0 * features[:, 0]], axis=1), \
+        np.stack([0 * features[:, 1], -features[:, 1]], axis=1))
+    feature_changes = -0.1 * features
+    surrogate = Surrogate(['rewrite', 'balance'], ['area', 'delay'], 3, regularization=1e-6)
+    surrogate.fit(features, actions, metric_changes, feature_changes)
+
+    predicted_metrics, predicted_features = surrogate.predict(features[:5])
+    assert predicted_metrics.shape == (5, 2, 2) and predicted_features.shape == (5, 2, 3)
+    assert np.allclose(predicted_metrics[np.arange(5), actions[:5]], metric_changes[:5], atol=1e-4)
+    assert np.allclose(predicted_features[:, 0], -0.1 * features[:5], atol=1e-4)
+
+    design = np.array([0.9, 0.1, 0.5])
+    assert surrogate.prefilter(design, ['rewrite', 'balance', 'resub'], 'area', 1)[0] == ['rewrite', 'resub']
+    assert surrogate.prefilter(design, ['rewrite', 'balance'], 'delay', 1)[0] == ['balance']
+    accuracy = surrogate.evaluate(features, actions, metric_changes)
+    assert accuracy['transitions'] == 200 and accuracy['area_mae'] < 1e-4
+
+    path = str(tmp_path / 'surrogate.npz')
+    surrogate.save(path)
+    loaded = Surrogate.load(path)
+    assert loaded.commands == surrogate.commands and loaded.metrics == surrogate.metrics
+    assert np.allclose(loaded.predict(features[:5])[0], predicted_metrics)
+
+def test_store_transitions_keep_one_feature_length(tmp_path):
+    design_file = tmp_path / 'adder.v'
+    design_file.write_text('module adder; endmodule\n')
+    library_file = tmp_path / 'tech.lib'
+    library_file.write_text('library (tech) { }\n')
+    store = EvaluationStore(str(tmp_path / 'evaluations.db'), 'drills')
+
+    def record(mapping, sequence, area, features):
+        store.record(str(design_file), str(library_file), mapping, sequence, {'area': area, 'delay': 100}, features)
+    # regular features (9) under one mapping, extended ones (20) under another
+    record('map; features: yosys', ['strash'], 100, [1.0] * 9)
+    record('map; features: yosys', ['strash', 'rewrite'], 90, [2.0] * 9)
+    record('map; features: aiger extended', ['strash'], 100, [1.0] * 20)
+    record('map; features: aiger extended', ['strash', 'rewrite'], 80, [3.0] * 20)
+    record('map; features: aiger extended', ['strash', 'balance'], 110, [4.0] * 20)
+    # not a transition: its parent has no features
+    record('map; features: aiger extended', ['strash', 'rewrite', 'balance'], 70, None)
+
+    commands = ['rewrite', 'balance']
+    features, actions, metric_changes, feature_changes, parents = store_transitions(store, commands, ['area', 'delay'])
+    assert features.shape == (2, 20) and feature_changes.shape == (2, 20)
+    assert sorted(actions) == [0, 1] and list(parents) == [0, 0]
+    assert np.allclose(sorted(metric_changes[:, 0]), [-0.2, 0.1])
+
+    features, actions, metric_changes, _, _ = store_transitions(store, commands, ['area', 'delay'], num_features=9)
+    assert features.shape == (1, 9) and list(actions) == [0]
+    assert np.allclose(metric_changes, [[-0.1, 0]])
+    store.close()
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+from drills.scl_session import SCLSession
+from throughput import OPTIMIZATIONS
+
+SEQUENCE = ['rewrite', 'balance', 'refactor', 'resub', 'rewrite -z', 'balance', 'rewrite', 'refactor -z', \
+    'resub', 'balance', 'rewrite', 'balance', 'rewrite', 'balance']
+
+def play(session):
+    """
+    plays SEQUENCE until the episode ends; returns the QoR of the steps and the number of steps played
+    """
+    session.reset()
+    qors = [session._qor()]
+    for optimization in SEQUENCE:
+        _, _, done, _ = session.step(OPTIMIZATIONS.index(optimization))
+        qors.append(session._qor())
+        if done:
+            break
+    return qors, len(qors) - 1
+
+def test_patience_ends_an_episode_without_improvement(fake_abc):
+    qors, steps = play(SCLSession(fake_abc(iterations=len(SEQUENCE) + 1)))
+    assert steps == len(SEQUENCE)
+
+    # the first step after which the QoR of the episode did not improve for patience steps
+    patience, best, without_improvement, expected = 3, qors[0], 0, None
+    for step, qor in enumerate(qors[1:], 1):
+        if qor < best:
+            best, without_improvement = qor, 0
+        else:
+            without_improvement += 1
+        if without_improvement == patience:
+            expected = step
+            break
+    assert expected is not None and expected < len(SEQUENCE)
+
+    session = SCLSession(fake_abc(iterations=len(SEQUENCE) + 1, termination={'patience': patience}))
+    assert play(session) == (qors[:expected + 1], expected)
+    assert session.termination == 'no improvement in 3 steps'
+
+    # the next episode starts over
+    session.reset()
+    assert session.termination is None and session.steps_without_improvement == 0
+
+def test_near_best_ends_an_episode_close_to_the_best_known(fake_abc):
+    params = fake_abc(iterations=len(SEQUENCE) + 1, termination={'near_best_epsilon': 0})
+    session = SCLSession(params)
+    # nothing is known to meet the constraint in the first episode
+    qors, steps = play(session)
+    assert steps == len(SEQUENCE) and session.termination == 'iterations'
+    best_area = min(qor[1] for qor in qors if qor[0] == 0)
+
+    # the second episode ends once it meets the constraint with the best area of the first
+    qors, steps = play(session)
+    assert qors[-1] == (0, best_area, qors[-1][2])
+    assert all(qor[0] == 1 or qor[1] > best_area for qor in qors[:-1])
+    assert session.termination.startswith('constraint met within 0 of the best known')
+
+    # and sooner within a tolerance
+    session.near_best_epsilon = 0.1
+    tolerant_qors, tolerant_steps = play(session)
+    assert tolerant_steps < steps
+    assert tolerant_qors[-1][0] == 0 and tolerant_qors[-1][1] <= best_area * 1.1
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import numpy as np
+from drills.scl_session import SCLSession
+from drills.transposition import TranspositionTable
+
+# strash leaves an AIG unchanged
+OPTIMIZATIONS = ['rewrite', 'strash', 'balance']
+
+def test_least_recently_used_entries_are_dropped():
+    table = TranspositionTable(max_entries=2)
+    table.put('a', [1, 2], np.zeros(3))
+    table.put('b', [3, 4], np.ones(3))
+    assert table.get('a')[0] == (1, 2)
+    table.put('c', [5, 6], np.ones(3))
+    assert table.get('b') is None
+    metrics, state = table.get('c')
+    # a copy, which the caller may change
+    state[0] = 7
+    assert table.get('c')[1][0] == 1
+    assert table.stats() == {'hits': 3, 'misses': 1, 'entries': 2}
+
+def test_a_state_seen_before_skips_the_mapping(fake_abc):
+    session = SCLSession(fake_abc(transposition_table=True, optimizations=OPTIMIZATIONS))
+    session.reset()
+    state, _, _, _ = session.step(OPTIMIZATIONS.index('rewrite'))
+    unchanged, _, _, info = session.step(OPTIMIZATIONS.index('strash'))
+    assert info is None
+    assert (unchanged == state).all()
+    assert session.noop_steps == 1
+    assert session.transpositions.stats() == {'hits': 1, 'misses': 2, 'entries': 2}
+    # mapped for the new state only
+    assert os.path.exists(os.path.join(session.network_dir, '2-mapped.v'))
+    assert not os.path.exists(os.path.join(session.network_dir, '3-mapped.v'))
+
+    # the table outlives the episode, the count of unchanged steps does not
+    session.reset()
+    assert session.noop_steps == 0
+    replayed, _, _, _ = session.step(OPTIMIZATIONS.index('rewrite'))
+    assert (replayed == state).all()
+    assert session.transpositions.stats() == {'hits': 3, 'misses': 2, 'entries': 2}
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2019, SCALE Lab, Brown University
+# All rights reserved.
+
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+from drills.scl_session import SCLSession
+from drills.vec_session import VecSession
+from throughput import OPTIMIZATIONS
+
+def test_session_errors_are_raised_in_the_parent(fake_abc):
+    games = VecSession(SCLSession, fake_abc(iterations=3), num_envs=2)
+    try:
+        games.reset()
+        with pytest.raises(IndexError) as error:
+            games.step([OPTIMIZATIONS.index('rewrite'), len(OPTIMIZATIONS)])
+        # chained to the traceback of the worker
+        assert 'Traceback' in str(error.value.__cause__) and 'in step' in str(error.value.__cause__)
+        with pytest.raises(AttributeError):
+            games.call_one(1, 'no_such_method')
+
+        # both workers are still serving, and the other environment's step was not left in its pipe
+        results = games.step([OPTIMIZATIONS.index('balance')] * 2)
+        assert [info for _, _, _, info in results] == [None, None]
+        assert games.get_attr('iteration') == [3, 2]
+    finally:
+        games.close()